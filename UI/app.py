@@ -13,6 +13,10 @@ st.set_page_config(page_title="NLP - IUH Law Advisor 2026", layout="wide")
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
 
+# Warm-up model + VectorDB chạy nền ngay khi app khởi động (1 lần / process)
+from core.warmup import start_warmup
+start_warmup()
+
 
 
 # Load CSS
@@ -0,0 +1,188 @@
+# UI/core/aliases.py
+"""
+Alias collection cho build blue/green.
+
+Mỗi run embedding ghi vào collection riêng `<alias>__v<run_id>`; xong thì
+activate_version() đổi alias sang collection mới bằng os.replace (atomic),
+giữ lại keep bản trước để rollback ngay. ChromaStore resolve alias mỗi lần
+query (chỉ os.stat, đọc lại file khi file đổi).
+
+Bản ghi nằm trong <CHROMA_DIR>/aliases.json:
+{
+  "<alias>": {
+    "collection": "<alias>__v12", "version": "12", "activated_at": ...,
+    "history": [{"collection": "<alias>__v9", "version": "9", "activated_at": ...}, ...]
+  }
+}
+Chưa có bản ghi cho alias => dùng collection tên đúng bằng alias (bản cũ, version "legacy").
+Run ghi thẳng vào collection (không blue/green) gọi touch_alias() => "updated_at"
+đổi, generation đổi theo => cache kết quả (core/rag.py) tự vô hiệu.
+
+Ghi (touch / activate / rollback) đọc-sửa-ghi dưới lock file aliases.json.lock (flock),
+vì worker embedding (process riêng) activate trong khi page Streamlit có thể rollback.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import abs_path
+
+LEGACY_VERSION = "legacy"
+_FILE_NAME = "aliases.json"
+_lock = threading.Lock()
+
+
+def versioned_name(alias: str, version: Any) -> str:
+    return f"{alias}__v{version}"
+
+
+def _alias_file(chroma_dir: str | Path) -> Path:
+    return abs_path(chroma_dir) / _FILE_NAME
+
+
+@contextmanager
+def _locked(chroma_dir: str | Path) -> Iterator[None]:
+    """Lock giữa các thread (threading.Lock) và giữa các process (lock file cạnh aliases.json)."""
+    path = _alias_file(chroma_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock, open(path.with_name(f"{path.name}.lock"), "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        # đóng file => nhả lock
+        yield
+
+
+def read_aliases(chroma_dir: str | Path) -> Dict[str, Dict[str, Any]]:
+    try:
+        return json.loads(_alias_file(chroma_dir).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def alias_file_stamp(chroma_dir: str | Path) -> Optional[Tuple[int, int, int]]:
+    """Dấu (mtime_ns, inode, size) của file alias, None nếu chưa có — dùng để biết file đã đổi."""
+    try:
+        st = os.stat(_alias_file(chroma_dir))
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+def resolve_alias(chroma_dir: str | Path, alias: str) -> Tuple[str, str]:
+    """(tên collection thật, version) mà alias đang trỏ tới."""
+    rec = read_aliases(chroma_dir).get(alias)
+    if not rec:
+        return alias, LEGACY_VERSION
+    return str(rec.get("collection") or alias), str(rec.get("version") or LEGACY_VERSION)
+
+
+def active_version(chroma_dir: str | Path, alias: str) -> str:
+    return resolve_alias(chroma_dir, alias)[1]
+
+
+def alias_generation(chroma_dir: str | Path, alias: str) -> str:
+    """Đổi mỗi khi dữ liệu sau alias đổi (swap version / rollback / run ghi thẳng)."""
+    rec = read_aliases(chroma_dir).get(alias) or {}
+    stamp = max(float(rec.get("activated_at") or 0), float(rec.get("updated_at") or 0))
+    return f"{rec.get('version') or LEGACY_VERSION}@{stamp:.6f}"
+
+
+def touch_alias(chroma_dir: str | Path, alias: str) -> None:
+    """Collection sau alias vừa bị ghi trực tiếp (không đổi version) => bump updated_at."""
+    with _locked(chroma_dir):
+        data = read_aliases(chroma_dir)
+        rec = data.setdefault(alias, {})
+        rec["updated_at"] = time.time()
+        _write(chroma_dir, data)
+
+
+def _write(chroma_dir: str | Path, data: Dict[str, Any]) -> None:
+    path = _alias_file(chroma_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)  # atomic: reader thấy bản cũ hoặc bản mới, không bao giờ nửa chừng
+
+
+def activate_version(
+    chroma_dir: str | Path,
+    alias: str,
+    collection: str,
+    version: Any,
+    keep: int = 2,
+) -> List[str]:
+    """
+    Trỏ alias sang collection, đẩy bản đang active vào history (giữ keep bản).
+    Trả về tên các collection vừa rơi khỏi history (caller xoá khỏi Chroma).
+    """
+    with _locked(chroma_dir):
+        data = read_aliases(chroma_dir)
+        rec = data.get(alias)
+        history: List[Dict[str, Any]] = list(rec.get("history") or []) if rec else []
+        if rec and rec.get("collection"):
+            prev = {k: rec[k] for k in ("collection", "version", "activated_at") if k in rec}
+        else:
+            # lần đầu bật blue/green: collection cũ cùng tên alias vẫn rollback được
+            prev = {"collection": alias, "version": LEGACY_VERSION, "activated_at": None}
+        if prev.get("collection") != collection:
+            history.insert(0, prev)
+        history = [h for h in history if h.get("collection") != collection]
+
+        keep = max(int(keep), 0)
+        dropped = [h["collection"] for h in history[keep:]]
+        data[alias] = {
+            "collection": collection,
+            "version": str(version),
+            "activated_at": time.time(),
+            "history": history[:keep],
+        }
+        _write(chroma_dir, data)
+        return dropped
+
+
+def rollback(chroma_dir: str | Path, alias: str, version: Optional[str] = None) -> Tuple[str, str]:
+    """Quay alias về 1 bản trong history (mặc định bản ngay trước). Trả về (collection, version)."""
+    with _locked(chroma_dir):
+        data = read_aliases(chroma_dir)
+        rec = data.get(alias)
+        history: List[Dict[str, Any]] = list((rec or {}).get("history") or [])
+        if not history:
+            raise ValueError(f"Alias {alias} không có bản nào để rollback")
+        idx = 0
+        if version is not None:
+            idx = next((i for i, h in enumerate(history) if str(h.get("version")) == str(version)), -1)
+            if idx < 0:
+                raise ValueError(f"Không có version {version} trong history của {alias}")
+        target = history.pop(idx)
+        history.insert(0, {k: rec[k] for k in ("collection", "version", "activated_at") if k in rec})
+        data[alias] = {
+            "collection": target["collection"],
+            "version": str(target.get("version") or LEGACY_VERSION),
+            "activated_at": time.time(),
+            "history": history,
+        }
+        _write(chroma_dir, data)
+        return data[alias]["collection"], data[alias]["version"]
+
+
+def list_versions(chroma_dir: str | Path, alias: str) -> List[Dict[str, Any]]:
+    """Bản active + history, active đứng đầu (để hiện trên UI)."""
+    rec = read_aliases(chroma_dir).get(alias)
+    if not rec or not rec.get("collection"):
+        return [{"collection": alias, "version": LEGACY_VERSION, "activated_at": None, "active": True}]
+    out = [{"collection": rec["collection"], "version": rec.get("version"), "activated_at": rec.get("activated_at"), "active": True}]
+    for h in rec.get("history") or []:
+        out.append({**h, "active": False})
+    return out
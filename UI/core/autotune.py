@@ -0,0 +1,182 @@
+# UI/core/autotune.py
+"""
+Tự chọn batch_size (+ số torch thread trên CPU) cho máy đang chạy.
+
+calibrate(): encode 1 mẫu chunk thật của corpus với từng cặp (threads, batch_size),
+đo chunks/s và bộ nhớ đỉnh (CUDA: max_memory_allocated, CPU: RSS lấy mẫu trong
+lúc encode), chọn cặp nhanh nhất mà bộ nhớ <= mem_budget_mb, lưu vào SQLite theo
+(model_id, device, host). run_embedding(batch_size=0) dùng lại kết quả đã lưu.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .db import get_batch_tuning, save_batch_tuning
+
+DEFAULT_BATCH_SIZES = (8, 16, 32, 64, 128, 256, 512)
+FALLBACK_BATCH_SIZE = 128
+
+
+def host_id() -> str:
+    return socket.gethostname() or "localhost"
+
+
+def rss_mb() -> Optional[float]:
+    """RSS hiện tại của process (MB), None nếu không đo được."""
+    try:
+        import psutil  # type: ignore
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+
+class _PeakSampler(threading.Thread):
+    """Lấy mẫu RSS mỗi interval giây trong lúc encode (CPU)."""
+
+    def __init__(self, interval: float = 0.02):
+        super().__init__(name="autotune-rss", daemon=True)
+        self.interval = interval
+        self.peak: Optional[float] = rss_mb()
+        self._stop_evt = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_evt.wait(self.interval):
+            v = rss_mb()
+            if v is not None and (self.peak is None or v > self.peak):
+                self.peak = v
+
+    def stop(self) -> Optional[float]:
+        self._stop_evt.set()
+        self.join(timeout=1)
+        return self.peak
+
+
+def default_thread_counts() -> List[int]:
+    n = os.cpu_count() or 1
+    return sorted({max(n // 4, 1), max(n // 2, 1), n})
+
+
+def _measure(model, texts: Sequence[str], batch_size: int, device: str) -> Tuple[float, Optional[float]]:
+    """(chunks/s, bộ nhớ đỉnh MB) khi encode texts với batch_size."""
+    import torch  # type: ignore
+
+    if device == "cuda":
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+        sampler = None
+    else:
+        sampler = _PeakSampler()
+        sampler.start()
+
+    t = time.perf_counter()
+    model.encode(list(texts), batch_size=batch_size, show_progress_bar=False, normalize_embeddings=True)
+    if device == "cuda":
+        torch.cuda.synchronize()
+    elapsed = time.perf_counter() - t
+
+    if sampler is not None:
+        peak = sampler.stop()
+    else:
+        peak = torch.cuda.max_memory_allocated() / (1024 * 1024)
+    return (len(texts) / elapsed if elapsed > 0 else 0.0), peak
+
+
+def calibrate(
+    texts: Sequence[str],
+    model_id: str,
+    device: str,
+    mem_budget_mb: float = 0.0,
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    thread_counts: Optional[Sequence[int]] = None,
+    save: bool = True,
+) -> Dict[str, Any]:
+    """
+    Quét (threads x batch_size) trên texts (nên >= batch_size lớn nhất).
+    mem_budget_mb <= 0 => không giới hạn bộ nhớ.
+    Với mỗi threads: dừng tăng batch_size khi vượt budget hoặc chunks/s giảm 2 lần liên tiếp.
+    Không cấu hình nào vừa budget => trả batch nhỏ nhất với fits=False và không lưu.
+    """
+    import torch  # type: ignore
+
+    from .resources import get_embedder
+
+    texts = list(texts)
+    if not texts:
+        raise ValueError("Cần mẫu chunk để calibrate")
+    model = get_embedder(model_id, device)
+    if thread_counts is None:
+        thread_counts = default_thread_counts() if device == "cpu" else [0]
+
+    results: List[Dict[str, Any]] = []
+    prev_threads = torch.get_num_threads()
+    try:
+        model.encode(texts[:8], batch_size=8, show_progress_bar=False)  # warm
+        for threads in thread_counts:
+            if threads > 0:
+                torch.set_num_threads(int(threads))
+            best_here, drops, last_bs = 0.0, 0, 0
+            for bs in batch_sizes:
+                if bs > len(texts) and last_bs >= len(texts):
+                    break  # mẫu không đủ lớn để phân biệt batch lớn hơn
+                last_bs = int(bs)
+                cps, peak = _measure(model, texts, int(bs), device)
+                fits = mem_budget_mb <= 0 or peak is None or peak <= mem_budget_mb
+                results.append(
+                    {
+                        "threads": int(threads),
+                        "batch_size": int(bs),
+                        "chunks_per_s": round(cps, 2),
+                        "peak_mem_mb": round(peak, 1) if peak is not None else None,
+                        "fits": fits,
+                    }
+                )
+                if not fits:
+                    break
+                drops = drops + 1 if cps < best_here else 0
+                best_here = max(best_here, cps)
+                if drops >= 2:
+                    break
+    finally:
+        torch.set_num_threads(prev_threads)
+
+    candidates = [r for r in results if r["fits"]]
+    if candidates:
+        best = max(candidates, key=lambda r: r["chunks_per_s"])
+    else:
+        # không cấu hình nào vừa budget => batch nhỏ nhất đã đo (ít tốn bộ nhớ nhất), không lưu
+        best = min(results, key=lambda r: (r["batch_size"], r["peak_mem_mb"] or 0.0))
+    out = {
+        "model_id": model_id,
+        "device": device,
+        "host": host_id(),
+        "batch_size": best["batch_size"],
+        "threads": best["threads"],
+        "chunks_per_s": best["chunks_per_s"],
+        "peak_mem_mb": best["peak_mem_mb"],
+        "mem_budget_mb": float(mem_budget_mb),
+        "fits": bool(best["fits"]),
+        "n_texts": len(texts),
+        "results": results,
+    }
+    if save and out["fits"]:
+        save_batch_tuning(out)
+    return out
+
+
+def tuned_batch(model_id: str, device: str) -> Tuple[int, int, bool]:
+    """(batch_size, threads, có kết quả calibrate không) cho máy hiện tại."""
+    t = get_batch_tuning(model_id, device, host_id())
+    if not t:
+        return FALLBACK_BATCH_SIZE, 0, False
+    return int(t["batch_size"]), int(t.get("threads") or 0), True
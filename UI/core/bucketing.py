@@ -0,0 +1,76 @@
+# UI/core/bucketing.py
+"""
+Gom batch theo độ dài token để giảm padding khi encode.
+
+Transformer pad mọi câu trong batch lên độ dài câu dài nhất, nên batch trộn
+điều ngắn 100 ký tự với chunk 1200 ký tự sẽ tốn phần lớn compute vào padding.
+Ở đây: sắp chunk theo số token, cắt batch theo "token budget"
+(số câu x độ dài câu dài nhất trong batch <= budget) thay vì batch_size cố định,
+encode xong thì trả vector về đúng thứ tự ban đầu.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, List, Sequence
+
+import numpy as np
+
+
+def token_lengths(texts: Sequence[str], tokenizer: Any, max_len: int) -> List[int]:
+    """Số token (gồm special tokens) của từng text, đã cắt ở max_len như lúc encode."""
+    if not texts:
+        return []
+    enc = tokenizer(
+        list(texts),
+        add_special_tokens=True,
+        truncation=True,
+        max_length=max_len,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )
+    return [len(x) for x in enc["input_ids"]]
+
+
+def plan_batches(lengths: Sequence[int], token_budget: int, max_batch: int = 256) -> List[List[int]]:
+    """
+    Chia index thành các batch (theo thứ tự dài -> ngắn) sao cho
+    len(batch) * max(lengths trong batch) <= token_budget.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_max = 0
+    for i in order:
+        L = max(int(lengths[i]), 1)
+        new_max = max(cur_max, L)
+        if cur and (new_max * (len(cur) + 1) > token_budget or len(cur) >= max_batch):
+            batches.append(cur)
+            cur, new_max = [], L
+        cur.append(i)
+        cur_max = new_max
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def padded_tokens(lengths: Sequence[int], batches: Sequence[Sequence[int]]) -> int:
+    """Tổng token sau khi pad theo từng batch (để so padding trước/sau bucketing)."""
+    return sum(max(lengths[i] for i in b) * len(b) for b in batches if b)
+
+
+def encode_bucketed(
+    texts: Sequence[str],
+    encode_fn: Callable[[List[str]], np.ndarray],
+    lengths: Sequence[int],
+    token_budget: int,
+    max_batch: int = 256,
+) -> np.ndarray:
+    """Encode theo batch đã bucket, trả ma trận float32 đúng thứ tự texts."""
+    out: np.ndarray | None = None
+    for b in plan_batches(lengths, token_budget, max_batch):
+        emb = np.asarray(encode_fn([texts[i] for i in b]), dtype=np.float32)
+        if out is None:
+            out = np.empty((len(texts), emb.shape[1]), dtype=np.float32)
+        out[b] = emb
+    if out is None:
+        return np.zeros((0, 0), dtype=np.float32)
+    return out
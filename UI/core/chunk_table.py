@@ -0,0 +1,81 @@
+# UI/core/chunk_table.py
+"""
+Bảng chunk gọn cho run_embedding: không giữ bản sao text / metadata của từng chunk.
+
+- Mỗi dòng CSV: 1 text gốc (buffer dùng chung) + 1 dict meta dùng chung
+  (tham chiếu, không copy) + (base_id, row_index, row_hash).
+- Mỗi chunk: (row, start, end, chunk_index) trong array.array + chunk_hash,
+  hierarchy (chuỗi ngắn, path giống nhau dùng chung 1 object).
+- Text chunk chỉ được cắt ra khi encode (texts()) và khi ghi store
+  (texts() / metadatas()); phần overlap không bị nhân bản trong RAM.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, List, Tuple
+
+
+class ChunkTable:
+    def __init__(self) -> None:
+        # theo dòng
+        self.row_texts: List[str] = []
+        self.row_metas: List[Dict[str, Any]] = []
+        self.row_keys: List[Tuple[str, int, str]] = []  # (base_id, row_index, row_hash)
+        # theo chunk
+        self.row = array("i")
+        self.start = array("l")
+        self.end = array("l")
+        self.index = array("i")
+        self.hashes: List[str] = []
+        self.paths: List[str] = []
+        # ghi xong bảng này => rows_done dòng CSV đầu đã ghi trọn (checkpoint resume)
+        self.rows_done = 0
+        # số liệu của batch này (load/chunk/tokenize/encode/upsert giây, số token)
+        self.timings: Dict[str, float] = {}
+        self.tokens = 0
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    def add_row(self, text: str, meta: Dict[str, Any], base_id: str, row_index: int, row_hash: str) -> int:
+        self.row_texts.append(text)
+        self.row_metas.append(meta)
+        self.row_keys.append((base_id, row_index, row_hash))
+        return len(self.row_texts) - 1
+
+    def add_chunk(self, row: int, start: int, end: int, chunk_index: int, chunk_hash: str, path: str = "") -> None:
+        self.row.append(row)
+        self.start.append(start)
+        self.end.append(end)
+        self.index.append(chunk_index)
+        self.hashes.append(chunk_hash)
+        self.paths.append(path)
+
+    def text(self, i: int) -> str:
+        return self.row_texts[self.row[i]][self.start[i] : self.end[i]]
+
+    def texts(self) -> List[str]:
+        return [self.text(i) for i in range(len(self))]
+
+    def chunk_id(self, i: int) -> str:
+        base_id, row_index, row_hash = self.row_keys[self.row[i]]
+        return f"{base_id}__r{row_index}__c{self.index[i]}__{row_hash}"
+
+    def ids(self) -> List[str]:
+        return [self.chunk_id(i) for i in range(len(self))]
+
+    def metadata(self, i: int) -> Dict[str, Any]:
+        base_id, row_index, row_hash = self.row_keys[self.row[i]]
+        m = dict(self.row_metas[self.row[i]])
+        m["source_id"] = base_id
+        m["row_index"] = row_index
+        m["chunk_index"] = self.index[i]
+        m["row_hash"] = row_hash
+        m["chunk_hash"] = self.hashes[i]
+        if self.paths[i]:
+            m["hierarchy"] = self.paths[i]
+        return m
+
+    def metadatas(self) -> List[Dict[str, Any]]:
+        return [self.metadata(i) for i in range(len(self))]
+
@@ -0,0 +1,296 @@
+# UI/core/chunking.py
+"""
+Engine chunking dùng chung (embedding_runner._chunk_text, utils.chunk_text).
+
+Ba chế độ, cùng trả về span (start, end) trên text gốc:
+- chars    : cắt cửa sổ theo số ký tự + overlap (hành vi cũ).
+- tokens   : đo bằng tokenizer của embedder, cắt ở ranh giới câu / vế
+  (. ; : ? ! xuống dòng), đảm bảo mỗi chunk <= max_tokens (gồm special tokens)
+  => không còn đoạn cuối chunk bị model cắt mất khi encode.
+- structure: cắt theo cấu trúc văn bản luật Chương / Điều / Khoản (1., 2.) /
+  Điểm (a), b)), không overlap; mỗi chunk kèm đường dẫn "Khoản 2 > Điểm a–c".
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, List, Sequence, Tuple
+
+Span = Tuple[int, int]
+
+# 1 "đơn vị" = câu / vế câu / dòng, giữ luôn dấu câu ở cuối
+_UNIT_RE = re.compile(r"(?:[^\n.;:?!]|[.;:?!]+(?![\s]|$))+[.;:?!]*|[.;:?!]+")
+_WORD_RE = re.compile(r"\S+")
+_MARK_ONLY_RE = re.compile(r"\d{1,3}\.|[a-zđ]\)")
+
+# marker cấu trúc ở đầu dòng, 1 regex cho cả 4 cấp (level càng lớn càng sâu)
+_STRUCT_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"(?P<chuong>(?:Chương|CHƯƠNG)[ \t]+[IVXLCDM\d]+)"
+    r"|Điều[ \t]+(?P<dieu>\d+[\w.]*?)\.?(?=[ \t:]|$)"
+    r"|(?P<khoan>\d{1,3})\.(?=[ \t])"
+    r"|(?P<diem>[a-zđ])\)(?=[ \t])"
+    r")",
+    re.M,
+)
+_LEVELS = {"chuong": (0, "Chương"), "dieu": (1, "Điều"), "khoan": (2, "Khoản"), "diem": (3, "Điểm")}
+
+
+def chunk_spans_chars(text: str, chunk_size: int, overlap: int) -> List[Span]:
+    n = len(text)
+    if n == 0:
+        return []
+    if chunk_size <= 0:
+        return [(0, n)]
+
+    spans: List[Span] = []
+    start = 0
+    step = max(chunk_size - max(overlap, 0), 1)
+    while start < n:
+        end = min(start + chunk_size, n)
+        spans.append((start, end))
+        if end == n:
+            break
+        start += step
+    return spans
+
+
+def _strip_span(text: str, s: int, e: int) -> Span:
+    while s < e and text[s].isspace():
+        s += 1
+    while e > s and text[e - 1].isspace():
+        e -= 1
+    return s, e
+
+
+def split_units(text: str) -> List[Span]:
+    """Tách text thành các câu / vế (span đã bỏ khoảng trắng 2 đầu)."""
+    out: List[Span] = []
+    glue = False
+    for m in _UNIT_RE.finditer(text):
+        s, e = _strip_span(text, m.start(), m.end())
+        if e <= s:
+            continue
+        if glue and out:
+            out[-1] = (out[-1][0], e)
+        else:
+            out.append((s, e))
+        # "1." / "a)" đứng riêng là số khoản/điểm => dính vào câu sau
+        glue = _MARK_ONLY_RE.fullmatch(text, out[-1][0], out[-1][1]) is not None
+    return out
+
+
+def _token_counter(tokenizer: Any) -> Callable[[Sequence[str]], List[int]]:
+    def count(parts: Sequence[str]) -> List[int]:
+        if not parts:
+            return []
+        ids = tokenizer(list(parts), add_special_tokens=False)["input_ids"]
+        return [len(x) for x in ids]
+
+    return count
+
+
+def _split_oversized(text: str, span: Span, budget: int, count) -> List[Span]:
+    """1 câu dài hơn budget: tách theo từ, từ vẫn quá dài thì cắt đôi theo ký tự."""
+    s, e = span
+    words = [(s + m.start(), s + m.end()) for m in _WORD_RE.finditer(text[s:e])]
+    if len(words) <= 1:
+        if e - s <= 1:
+            return [span]
+        mid = (s + e) // 2
+        out: List[Span] = []
+        for half in ((s, mid), (mid, e)):
+            if count([text[half[0] : half[1]]])[0] <= budget:
+                out.append(half)
+            else:
+                out.extend(_split_oversized(text, half, budget, count))
+        return out
+    return _pack(text, words, count([text[a:b] for a, b in words]), budget, 0, count)
+
+
+def _pack(text: str, units: List[Span], lens: List[int], budget: int, overlap: int, count) -> List[Span]:
+    spans: List[Span] = []
+    i = 0
+    n = len(units)
+    while i < n:
+        if lens[i] > budget:
+            spans.extend(_split_oversized(text, units[i], budget, count))
+            i += 1
+            continue
+
+        j = i
+        used = 0
+        while j < n and lens[j] <= budget and used + lens[j] <= budget:
+            used += lens[j]
+            j += 1
+
+        # tổng token từng câu chỉ xấp xỉ token cả đoạn => đo lại, lố thì bớt câu
+        while j - i > 1 and count([text[units[i][0] : units[j - 1][1]]])[0] > budget:
+            j -= 1
+        spans.append((units[i][0], units[j - 1][1]))
+        if j >= n:
+            break
+
+        # overlap: lùi lại vài câu cuối (tổng <= overlap token) nhưng luôn tiến ít nhất 1 câu
+        back = j
+        carried = 0
+        while overlap > 0 and back - 1 > i and carried + lens[back - 1] <= overlap:
+            back -= 1
+            carried += lens[back]
+        if carried + lens[j] > budget:
+            # câu kế tiếp không còn chỗ cạnh phần overlap => bỏ overlap, tránh chunk lặp vụn
+            back = j
+        i = back
+    return spans
+
+
+def chunk_spans_tokens(text: str, tokenizer: Any, max_tokens: int, overlap_tokens: int = 0) -> List[Span]:
+    units = split_units(text)
+    if not units:
+        return []
+    count = _token_counter(tokenizer)
+    special = int(getattr(tokenizer, "num_special_tokens_to_add", lambda: 2)())
+    budget = max(int(max_tokens) - special, 1)
+    lens = count([text[s:e] for s, e in units])
+    return _pack(text, units, lens, budget, max(int(overlap_tokens), 0), count)
+
+
+def _markers(text: str) -> List[Tuple[int, int, str, str]]:
+    """(vị trí, level, tên cấp, nhãn) của mọi marker cấu trúc trong text."""
+    out = []
+    for m in _STRUCT_RE.finditer(text):
+        for key, (level, name) in _LEVELS.items():
+            val = m.group(key)
+            if val:
+                label = val.split()[-1] if key == "chuong" else val
+                out.append((m.start(), level, name, label))
+                break
+    return out
+
+
+def _range_label(name: str, labels: List[str]) -> str:
+    if not labels:
+        return ""
+    if len(labels) == 1:
+        return f"{name} {labels[0]}"
+    return f"{name} {labels[0]}–{labels[-1]}"
+
+
+def chunk_spans_structure(
+    text: str,
+    tokenizer: Any = None,
+    max_tokens: int = 0,
+    chunk_size: int = 1200,
+) -> List[Tuple[int, int, str]]:
+    """
+    Cắt theo cấu trúc, trả về (start, end, path).
+    Giới hạn: max_tokens nếu có tokenizer, không thì chunk_size ký tự.
+    - Cả đoạn vừa giới hạn => 1 chunk.
+    - Không vừa => tách ở cấp marker nông nhất bên trong, gộp các phần liền nhau
+      còn vừa (vd "Khoản 1–3"), phần nào vẫn quá dài thì xuống cấp sâu hơn.
+    - Hết marker mà vẫn quá dài => cắt theo câu (không overlap).
+    """
+    if tokenizer is not None and max_tokens > 0:
+        count = _token_counter(tokenizer)
+        special = int(getattr(tokenizer, "num_special_tokens_to_add", lambda: 2)())
+        budget = max(int(max_tokens) - special, 1)
+    else:
+        budget = max(int(chunk_size), 1)
+
+        def count(parts: Sequence[str]) -> List[int]:
+            return [len(p) for p in parts]
+
+    def fits(s: int, e: int) -> bool:
+        return count([text[s:e]])[0] <= budget
+
+    markers = _markers(text)
+    out: List[Tuple[int, int, str]] = []
+
+    def emit(s: int, e: int, path: List[str]) -> None:
+        s, e = _strip_span(text, s, e)
+        if e > s:
+            out.append((s, e, " > ".join(p for p in path if p)))
+
+    def leaf(s: int, e: int, path: List[str]) -> None:
+        units = [(s + a, s + b) for a, b in split_units(text[s:e])]
+        lens = count([text[a:b] for a, b in units])
+        for a, b in _pack(text, units, lens, budget, 0, count):
+            emit(a, b, path)
+
+    def split(s: int, e: int, depth: int, path: List[str]) -> None:
+        if fits(s, e):
+            emit(s, e, path)
+            return
+        inner = [m for m in markers if s <= m[0] < e and m[1] > depth]
+        if not inner:
+            leaf(s, e, path)
+            return
+
+        level = min(m[1] for m in inner)
+        cuts = [m for m in inner if m[1] == level]
+        name = cuts[0][2]
+
+        # pieces: (start, end, nhãn hoặc None cho phần mở đầu trước marker đầu tiên)
+        pieces: List[Tuple[int, int, Any]] = []
+        if cuts[0][0] > s:
+            pieces.append((s, cuts[0][0], None))
+        for k, c in enumerate(cuts):
+            pieces.append((c[0], cuts[k + 1][0] if k + 1 < len(cuts) else e, c[3]))
+
+        # gộp các phần liền nhau còn vừa giới hạn, phần quá dài thì xuống cấp
+        k = 0
+        while k < len(pieces):
+            ps, pe, lab = pieces[k]
+            if not fits(ps, pe):
+                split(ps, pe, level, path + ([f"{name} {lab}"] if lab else []))
+                k += 1
+                continue
+            j = k + 1
+            while j < len(pieces) and fits(ps, pieces[j][1]):
+                j += 1
+            labels = [p[2] for p in pieces[k:j] if p[2]]
+            emit(ps, pieces[j - 1][1], path + [_range_label(name, labels)])
+            k = j
+
+    split(0, len(text), -1, [])
+    return out
+
+
+def chunk_spans(
+    text: str,
+    chunk_size: int = 1200,
+    overlap: int = 120,
+    tokenizer: Any = None,
+    max_tokens: int = 0,
+    overlap_tokens: int = 0,
+) -> List[Span]:
+    """Span (start, end) trên chính text truyền vào (caller tự strip nếu cần)."""
+    if not text:
+        return []
+    if tokenizer is not None and max_tokens > 0:
+        return chunk_spans_tokens(text, tokenizer, max_tokens, overlap_tokens)
+    return chunk_spans_chars(text, chunk_size, overlap)
+
+
+def chunk_text(
+    text: str,
+    chunk_size: int = 1200,
+    overlap: int = 120,
+    tokenizer: Any = None,
+    max_tokens: int = 0,
+    overlap_tokens: int = 0,
+) -> List[str]:
+    """
+    Có tokenizer + max_tokens => cắt theo token, ngược lại cắt theo ký tự.
+    text được strip trước, span tính trên text đã strip.
+    """
+    text = (text or "").strip()
+    spans = chunk_spans(text, chunk_size, overlap, tokenizer, max_tokens, overlap_tokens)
+    return [text[s:e] for s, e in spans]
+
+
+def count_truncated(chunks: Sequence[str], tokenizer: Any, max_tokens: int) -> int:
+    """Số chunk dài hơn cửa sổ model (phần đuôi sẽ bị cắt khi encode)."""
+    if not chunks:
+        return 0
+    ids = tokenizer(list(chunks), add_special_tokens=True)["input_ids"]
+    return sum(1 for x in ids if len(x) > max_tokens)
@@ -39,10 +39,31 @@ class Settings:
     CSV_PATH: str
     CHROMA_DIR: str
     CHROMA_COLLECTION: str
+    CHROMA_KEEP_VERSIONS: int
+    VECTOR_BACKEND: str
+    VECTOR_QUANT: str
+    VECTOR_RESCORE: int
+    VECTOR_INDEX: str
+    IVF_LISTS: int
+    IVF_NPROBE: int
+    SNAPSHOT_DIR: str
+    SNAPSHOT_VERIFY: bool
+    SNAPSHOT_CACHE_DIR: str
+    SHARED_INDEX_DIR: str
     SQLITE_PATH: str
     EMBED_MODEL_ID: str
     EMBED_DEVICE: str
     DEFAULT_TOP_K: int
+    RESULT_CACHE_MAX_ENTRIES: int
+    RESULT_CACHE_TTL_S: float
+    SEMANTIC_CACHE_MAX_ENTRIES: int
+    SEMANTIC_CACHE_THRESHOLD: float
+    EMBED_CACHE_DIR: str
+    EMBED_CACHE_MAX_ENTRIES: int
+    EMBED_CACHE_DTYPE: str
+    EMBED_BACKEND: str
+    ONNX_DIR: str
+    ONNX_QUANTIZE: bool
 
 
 def get_settings() -> Settings:
@@ -50,10 +71,45 @@ def get_settings() -> Settings:
         CSV_PATH=_env("CSV_PATH", "data/pdchude.csv"),
         CHROMA_DIR=_env("CHROMA_DIR", "UI/vector_db"),
         CHROMA_COLLECTION=_env("CHROMA_COLLECTION", "iuh_law_advisor_2026"),
+        # blue/green: số bản collection cũ giữ lại để rollback (core/aliases.py)
+        CHROMA_KEEP_VERSIONS=int(_env("CHROMA_KEEP_VERSIONS", "2")),
+        # chroma | numpy (exact search trên bản export mmap, xem core/flat_store.py)
+        # | snapshot (core/snapshot.py) | shared (segment dùng chung giữa worker, core/shared_index.py)
+        VECTOR_BACKEND=_env("VECTOR_BACKEND", "chroma").lower(),
+        # backend numpy: none | float16 | int8 (quét bản nén, re-score top_k*VECTOR_RESCORE bằng float32)
+        VECTOR_QUANT=_env("VECTOR_QUANT", "none").lower(),
+        VECTOR_RESCORE=int(_env("VECTOR_RESCORE", "4")),
+        # backend numpy: flat (quét hết) | ivf (k-means list, quét nprobe list gần nhất; core/ivf.py)
+        VECTOR_INDEX=_env("VECTOR_INDEX", "flat").lower(),
+        IVF_LISTS=int(_env("IVF_LISTS", "0")),  # 0 => ~4*sqrt(số chunk)
+        IVF_NPROBE=int(_env("IVF_NPROBE", "8")),
+        # VECTOR_BACKEND=snapshot: mmap snapshot (python -m core.snapshot export ...) thay vì mở Chroma
+        SNAPSHOT_DIR=_env("SNAPSHOT_DIR", "UI/data/snapshot"),
+        # 1 => kiểm sha256 cả vectors.npy lúc khởi động (chậm hơn với index lớn)
+        SNAPSHOT_VERIFY=_env("SNAPSHOT_VERIFY", "0").lower() in ("1", "true", "yes"),
+        # bản nén / IVF mà snapshot không dựng sẵn => dựng vào đây (thư mục snapshot chỉ đọc)
+        SNAPSHOT_CACHE_DIR=_env("SNAPSHOT_CACHE_DIR", "UI/data/snapshot_cache"),
+        # VECTOR_BACKEND=shared: segment do `python -m core.shared_index publish` ghi; trống => /dev/shm
+        SHARED_INDEX_DIR=_env("SHARED_INDEX_DIR", ""),
         SQLITE_PATH=_env("SQLITE_PATH", "UI/data/ui.sqlite3"),
         EMBED_MODEL_ID=_env("EMBED_MODEL_ID", "keepitreal/vietnamese-sbert"),
         EMBED_DEVICE=_env("EMBED_DEVICE", "auto"),
         DEFAULT_TOP_K=int(_env("DEFAULT_TOP_K", "5")),
+        # cache kết quả chatbot theo câu hỏi đã chuẩn hoá (core/rag.py); 0 => tắt
+        RESULT_CACHE_MAX_ENTRIES=int(_env("RESULT_CACHE_MAX_ENTRIES", "512")),
+        RESULT_CACHE_TTL_S=float(_env("RESULT_CACHE_TTL_S", "3600")),
+        # cache ngữ nghĩa: câu hỏi có cosine >= threshold với câu đã hỏi => dùng lại hits
+        # (core/semantic_cache.py); 0 entries hoặc threshold >= 1 => tắt
+        SEMANTIC_CACHE_MAX_ENTRIES=int(_env("SEMANTIC_CACHE_MAX_ENTRIES", "256")),
+        SEMANTIC_CACHE_THRESHOLD=float(_env("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        # để trống EMBED_CACHE_DIR => tắt cache embedding
+        EMBED_CACHE_DIR=_env("EMBED_CACHE_DIR", "UI/data/embed_cache"),
+        EMBED_CACHE_MAX_ENTRIES=int(_env("EMBED_CACHE_MAX_ENTRIES", "200000")),
+        EMBED_CACHE_DTYPE=_env("EMBED_CACHE_DTYPE", "float16"),
+        # torch | onnx (ONNX Runtime trên CPU, xem core/onnx_backend.py)
+        EMBED_BACKEND=_env("EMBED_BACKEND", "torch").lower(),
+        ONNX_DIR=_env("ONNX_DIR", "UI/data/onnx"),
+        ONNX_QUANTIZE=_env("ONNX_QUANTIZE", "1").lower() in ("1", "true", "yes"),
     )
 
 
@@ -68,3 +124,5 @@ SQLITE_PATH = settings.SQLITE_PATH
 EMBED_MODEL_ID = settings.EMBED_MODEL_ID
 EMBED_DEVICE = settings.EMBED_DEVICE
 DEFAULT_TOP_K = settings.DEFAULT_TOP_K
+EMBED_CACHE_DIR = settings.EMBED_CACHE_DIR
+EMBED_BACKEND = settings.EMBED_BACKEND
@@ -1,6 +1,80 @@
 import os
 import pandas as pd
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any
+
+
+# cột phân cấp (nếu CSV có) => đưa vào meta, dùng cho đường dẫn Chương/Điều/Khoản
+_HIERARCHY_COLS = ("chude_ten", "demuc_ten", "chuong_ten")
+
+
+def _resolve_columns(columns) -> Dict[str, Any]:
+    # bạn có thể tùy biến mapping theo CSV của bạn
+    # ưu tiên các cột hay gặp
+    return {
+        "id": "dieu_id" if "dieu_id" in columns else None,
+        "title": "dieu_ten" if "dieu_ten" in columns else None,
+        "text": "dieu_noidung" if "dieu_noidung" in columns else None,
+        "src": "vbqppl" if "vbqppl" in columns else None,
+        "link": "vbqppl_link" if "vbqppl_link" in columns else None,
+        "hierarchy": [c for c in _HIERARCHY_COLS if c in columns],
+    }
+
+
+def _str_col(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str)
+
+
+def iter_law_doc_batches(csv_path: str, chunksize: int = 2000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Đọc CSV theo từng khúc chunksize dòng (pd.read_csv(chunksize=...)),
+    xử lý cột kiểu vectorized, yield list dict cùng format với load_law_docs_from_csv.
+    RAM chỉ phụ thuộc chunksize, không phụ thuộc kích thước CSV.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV not found: {csv_path}")
+
+    offset = 0
+    cols = None
+    for df in pd.read_csv(csv_path, chunksize=max(int(chunksize), 1)):
+        if cols is None:
+            cols = _resolve_columns(df.columns)
+        n = len(df)
+        row_index = range(offset, offset + n)
+        offset += n
+
+        # ô trống => "" (pandas >= 3 astype(str) giữ NaN là float, không được để lọt vào metadata)
+        if cols["id"]:
+            _ids = [v or str(i) for v, i in zip(_str_col(df[cols["id"]]).tolist(), row_index)]
+        else:
+            _ids = [str(i) for i in row_index]
+        title = _str_col(df[cols["title"]]) if cols["title"] else pd.Series([""] * n, index=df.index)
+        if cols["text"]:
+            body = _str_col(df[cols["text"]])
+        else:
+            body = pd.Series([str(r) for r in df.to_dict("records")], index=df.index)
+        texts = (title.str.strip() + "\n" + body.str.strip()).str.strip().tolist()
+
+        meta_cols = {}
+        if cols["title"]:
+            meta_cols["dieu_ten"] = title.tolist()
+        if cols["src"]:
+            meta_cols["vbqppl"] = _str_col(df[cols["src"]]).tolist()
+        if cols["link"]:
+            meta_cols["vbqppl_link"] = _str_col(df[cols["link"]]).tolist()
+        for c in cols["hierarchy"]:
+            meta_cols[c] = _str_col(df[c]).tolist()
+
+        batch = []
+        for k, idx in enumerate(row_index):
+            meta = {name: vals[k] for name, vals in meta_cols.items()}
+            meta["row_index"] = idx
+            batch.append({"id": _ids[k], "text": texts[k], "meta": meta})
+        yield batch
+
+
+def iter_law_docs_from_csv(csv_path: str, chunksize: int = 2000) -> Iterator[Dict[str, Any]]:
+    for batch in iter_law_doc_batches(csv_path, chunksize):
+        yield from batch
 
 
 def load_law_docs_from_csv(csv_path: str) -> List[Dict[str, Any]]:
@@ -11,31 +85,6 @@ def load_law_docs_from_csv(csv_path: str) -> List[Dict[str, Any]]:
       "text": "...",        # nội dung để embed
       "meta": {...}         # metadata để trace
     }
+    Corpus lớn thì dùng iter_law_docs_from_csv / iter_law_doc_batches (streaming).
     """
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"CSV not found: {csv_path}")
-
-    df = pd.read_csv(csv_path)
-    # bạn có thể tùy biến mapping theo CSV của bạn
-    # ưu tiên các cột hay gặp
-    col_id = "dieu_id" if "dieu_id" in df.columns else None
-    col_title = "dieu_ten" if "dieu_ten" in df.columns else None
-    col_text = "dieu_noidung" if "dieu_noidung" in df.columns else None
-    col_src = "vbqppl" if "vbqppl" in df.columns else None
-    col_link = "vbqppl_link" if "vbqppl_link" in df.columns else None
-
-    docs = []
-    for idx, row in df.iterrows():
-        _id = str(row[col_id]) if col_id else str(idx)
-        title = str(row[col_title]) if col_title else ""
-        body = str(row[col_text]) if col_text else str(row.to_dict())
-
-        text = (title.strip() + "\n" + body.strip()).strip()
-        meta = {}
-        if col_title: meta["dieu_ten"] = title
-        if col_src: meta["vbqppl"] = str(row[col_src])
-        if col_link: meta["vbqppl_link"] = str(row[col_link])
-        meta["row_index"] = int(idx)
-
-        docs.append({"id": _id, "text": text, "meta": meta})
-    return docs
+    return list(iter_law_docs_from_csv(csv_path))
@@ -1,10 +1,11 @@
 # UI/core/db.py
 from __future__ import annotations
 
+import json
 import sqlite3
 import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from .config import settings
 
@@ -61,7 +62,14 @@ def init_db() -> None:
                 collection TEXT,
                 chroma_dir TEXT,
                 total_rows INTEGER,
-                total_chunks INTEGER
+                total_chunks INTEGER,
+                params TEXT DEFAULT '',
+                progress_done INTEGER DEFAULT 0,
+                progress_total INTEGER DEFAULT 0,
+                checkpoint_row INTEGER DEFAULT 0,
+                cancel_requested INTEGER DEFAULT 0,
+                worker_pid INTEGER,
+                heartbeat_at REAL
             )
             """
         )
@@ -80,9 +88,86 @@ def init_db() -> None:
                 "chroma_dir TEXT",
                 "total_rows INTEGER",
                 "total_chunks INTEGER",
+                "params TEXT DEFAULT ''",
+                "progress_done INTEGER DEFAULT 0",
+                "progress_total INTEGER DEFAULT 0",
+                "checkpoint_row INTEGER DEFAULT 0",
+                "cancel_requested INTEGER DEFAULT 0",
+                "worker_pid INTEGER",
+                "heartbeat_at REAL",
             ],
         )
 
+        # Metrics ingest: tổng theo run + chi tiết từng batch
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_run_metrics (
+                run_id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL,
+                model_id TEXT,
+                device TEXT,
+                backend TEXT,
+                chunker TEXT,
+                batch_size INTEGER,
+                encode_workers INTEGER,
+                chunks INTEGER,
+                tokens INTEGER,
+                wall_s REAL,
+                load_s REAL,
+                chunk_s REAL,
+                tokenize_s REAL,
+                encode_s REAL,
+                upsert_s REAL,
+                chunks_per_s REAL,
+                tokens_per_s REAL,
+                peak_rss_mb REAL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_run_batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER NOT NULL,
+                batch_no INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                chunks INTEGER,
+                tokens INTEGER,
+                load_s REAL,
+                chunk_s REAL,
+                tokenize_s REAL,
+                encode_s REAL,
+                upsert_s REAL,
+                chunks_per_s REAL,
+                tokens_per_s REAL,
+                rss_mb REAL
+            )
+            """
+        )
+        # resume đánh số tiếp (next_embedding_batch_no) => mỗi batch 1 dòng
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_embedding_run_batches_run_batch ON embedding_run_batches(run_id, batch_no)"
+        )
+
+        # Kết quả auto-tune batch_size (core/autotune.py), 1 dòng / (model, device, máy)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_batch_tuning (
+                model_id TEXT NOT NULL,
+                device TEXT NOT NULL,
+                host TEXT NOT NULL,
+                batch_size INTEGER NOT NULL,
+                threads INTEGER DEFAULT 0,
+                chunks_per_s REAL,
+                peak_mem_mb REAL,
+                mem_budget_mb REAL,
+                results TEXT DEFAULT '',
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model_id, device, host)
+            )
+            """
+        )
+
         conn.commit()
     finally:
         conn.close()
@@ -175,7 +260,8 @@ def get_embedding_logs(limit: int = 20) -> List[Dict]:
         rows = conn.execute(
             """
             SELECT id, started_at, finished_at, status, note,
-                   model_id, device, collection, chroma_dir, total_rows, total_chunks
+                   model_id, device, collection, chroma_dir, total_rows, total_chunks,
+                   progress_done, progress_total, checkpoint_row, cancel_requested
             FROM embedding_runs
             ORDER BY id DESC
             LIMIT ?
@@ -185,3 +271,334 @@ def get_embedding_logs(limit: int = 20) -> List[Dict]:
         return [dict(r) for r in rows]
     finally:
         conn.close()
+
+
+# -----------------------
+# Embedding job queue (worker: core/embed_jobs.py)
+# status: queued -> running -> ok | failed | cancelled | interrupted
+# -----------------------
+RESUMABLE_STATUSES = ("failed", "cancelled", "interrupted")
+
+
+def _run_row(r: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+    if r is None:
+        return None
+    d = dict(r)
+    try:
+        d["params"] = json.loads(d.get("params") or "{}")
+    except ValueError:
+        d["params"] = {}
+    return d
+
+
+def enqueue_embedding_run(params: Dict[str, Any]) -> int:
+    """Thêm 1 job embedding (status 'queued'); params = kwargs của run_embedding."""
+    init_db()
+    conn = _get_conn()
+    try:
+        cur = conn.execute(
+            """
+            INSERT INTO embedding_runs(started_at, status, note, model_id, device, collection, chroma_dir, params)
+            VALUES(?, 'queued', '', ?, ?, ?, ?, ?)
+            """,
+            (
+                time.time(),
+                params.get("model_id"),
+                params.get("device"),
+                params.get("collection"),
+                params.get("chroma_dir"),
+                json.dumps(params, ensure_ascii=False),
+            ),
+        )
+        conn.commit()
+        return int(cur.lastrowid)
+    finally:
+        conn.close()
+
+
+def claim_embedding_run(worker_pid: int) -> Optional[Dict[str, Any]]:
+    """Worker lấy job queued cũ nhất và chuyển sang 'running' (atomic)."""
+    init_db()
+    conn = _get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        r = conn.execute(
+            "SELECT * FROM embedding_runs WHERE status='queued' ORDER BY id ASC LIMIT 1"
+        ).fetchone()
+        if r is None:
+            conn.commit()
+            return None
+        now = time.time()
+        conn.execute(
+            """
+            UPDATE embedding_runs
+            SET status='running', worker_pid=?, heartbeat_at=?, finished_at=NULL
+            WHERE id=?
+            """,
+            (worker_pid, now, r["id"]),
+        )
+        conn.commit()
+        d = _run_row(r)
+        d["status"] = "running"
+        return d
+    finally:
+        conn.close()
+
+
+def get_embedding_run(run_id: int) -> Optional[Dict[str, Any]]:
+    init_db()
+    conn = _get_conn()
+    try:
+        return _run_row(conn.execute("SELECT * FROM embedding_runs WHERE id=?", (run_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def get_active_embedding_runs() -> List[Dict[str, Any]]:
+    """Các job đang queued / running (cũ nhất trước)."""
+    init_db()
+    conn = _get_conn()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM embedding_runs WHERE status IN ('queued', 'running') ORDER BY id ASC"
+        ).fetchall()
+        return [_run_row(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def update_embedding_progress(
+    run_id: int,
+    done: Optional[int] = None,
+    total: Optional[int] = None,
+    checkpoint_row: Optional[int] = None,
+) -> bool:
+    """Cập nhật progress / checkpoint + heartbeat. Trả về True nếu job đã bị yêu cầu huỷ."""
+    conn = _get_conn()
+    try:
+        conn.execute(
+            """
+            UPDATE embedding_runs
+            SET progress_done=COALESCE(?, progress_done), progress_total=COALESCE(?, progress_total),
+                checkpoint_row=COALESCE(?, checkpoint_row), heartbeat_at=?
+            WHERE id=?
+            """,
+            (done, total, checkpoint_row, time.time(), run_id),
+        )
+        conn.commit()
+        r = conn.execute("SELECT cancel_requested FROM embedding_runs WHERE id=?", (run_id,)).fetchone()
+        return bool(r and r["cancel_requested"])
+    finally:
+        conn.close()
+
+
+def request_cancel_embedding_run(run_id: int) -> None:
+    """Job queued => huỷ ngay; job running => đặt cờ, worker dừng sau batch đang ghi."""
+    init_db()
+    conn = _get_conn()
+    try:
+        conn.execute(
+            """
+            UPDATE embedding_runs
+            SET status='cancelled', finished_at=?, note='Huỷ trước khi chạy'
+            WHERE id=? AND status='queued'
+            """,
+            (time.time(), run_id),
+        )
+        conn.execute(
+            "UPDATE embedding_runs SET cancel_requested=1 WHERE id=? AND status='running'",
+            (run_id,),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def resume_embedding_run(run_id: int) -> bool:
+    """Đưa job failed/cancelled/interrupted về queued, giữ checkpoint_row để chạy tiếp."""
+    init_db()
+    conn = _get_conn()
+    try:
+        cur = conn.execute(
+            f"""
+            UPDATE embedding_runs
+            SET status='queued', cancel_requested=0, finished_at=NULL
+            WHERE id=? AND status IN ({",".join("?" * len(RESUMABLE_STATUSES))})
+            """,
+            (run_id, *RESUMABLE_STATUSES),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def mark_interrupted_embedding_runs(worker_pid: int) -> int:
+    """
+    Job 'running' không thuộc worker_pid (worker chết / máy tắt) => 'interrupted'.
+    Chỉ gọi từ worker đang giữ lock worker (core/embed_jobs.py): khi đó không còn worker nào khác sống.
+    """
+    init_db()
+    conn = _get_conn()
+    try:
+        cur = conn.execute(
+            """
+            UPDATE embedding_runs
+            SET status='interrupted', finished_at=?, note='Worker dừng giữa chừng, có thể chạy tiếp'
+            WHERE status='running' AND (worker_pid IS NULL OR worker_pid != ?)
+            """,
+            (time.time(), int(worker_pid)),
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+
+# -----------------------
+# Embedding metrics
+# -----------------------
+_BATCH_METRIC_COLS = (
+    "batch_no", "chunks", "tokens", "load_s", "chunk_s", "tokenize_s", "encode_s", "upsert_s",
+    "chunks_per_s", "tokens_per_s", "rss_mb",
+)
+_RUN_METRIC_COLS = (
+    "model_id", "device", "backend", "chunker", "batch_size", "encode_workers", "chunks", "tokens",
+    "wall_s", "load_s", "chunk_s", "tokenize_s", "encode_s", "upsert_s",
+    "chunks_per_s", "tokens_per_s", "peak_rss_mb",
+)
+
+
+def add_embedding_batch_metrics(run_id: int, rec: Dict[str, Any]) -> None:
+    conn = _get_conn()
+    try:
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO embedding_run_batches(run_id, created_at, {", ".join(_BATCH_METRIC_COLS)})
+            VALUES(?, ?, {", ".join("?" * len(_BATCH_METRIC_COLS))})
+            """,
+            (run_id, time.time(), *[rec.get(c) for c in _BATCH_METRIC_COLS]),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def next_embedding_batch_no(run_id: int) -> int:
+    """batch_no tiếp theo của run (resume đánh số tiếp, không trùng batch đã ghi)."""
+    init_db()
+    conn = _get_conn()
+    try:
+        row = conn.execute(
+            "SELECT COALESCE(MAX(batch_no) + 1, 0) AS n FROM embedding_run_batches WHERE run_id=?",
+            (run_id,),
+        ).fetchone()
+        return int(row["n"])
+    finally:
+        conn.close()
+
+
+def clear_embedding_batch_metrics(run_id: int) -> None:
+    init_db()
+    conn = _get_conn()
+    try:
+        conn.execute("DELETE FROM embedding_run_batches WHERE run_id=?", (run_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def save_embedding_run_metrics(run_id: int, metrics: Dict[str, Any]) -> None:
+    init_db()
+    conn = _get_conn()
+    try:
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO embedding_run_metrics(run_id, created_at, {", ".join(_RUN_METRIC_COLS)})
+            VALUES(?, ?, {", ".join("?" * len(_RUN_METRIC_COLS))})
+            """,
+            (run_id, time.time(), *[metrics.get(c) for c in _RUN_METRIC_COLS]),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_embedding_run_metrics(limit: int = 50) -> List[Dict]:
+    """Metrics các run gần nhất (cũ -> mới, để vẽ chart theo thời gian)."""
+    init_db()
+    conn = _get_conn()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM embedding_run_metrics ORDER BY run_id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [dict(r) for r in reversed(rows)]
+    finally:
+        conn.close()
+
+
+def get_embedding_batch_metrics(run_id: int) -> List[Dict]:
+    init_db()
+    conn = _get_conn()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM embedding_run_batches WHERE run_id=? ORDER BY id ASC",
+            (run_id,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+# -----------------------
+# Batch-size tuning
+# -----------------------
+def save_batch_tuning(t: Dict[str, Any]) -> None:
+    init_db()
+    conn = _get_conn()
+    try:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO embedding_batch_tuning(
+                model_id, device, host, batch_size, threads, chunks_per_s, peak_mem_mb,
+                mem_budget_mb, results, created_at
+            )
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                t["model_id"],
+                t["device"],
+                t["host"],
+                int(t["batch_size"]),
+                int(t.get("threads") or 0),
+                t.get("chunks_per_s"),
+                t.get("peak_mem_mb"),
+                t.get("mem_budget_mb"),
+                json.dumps(t.get("results") or [], ensure_ascii=False),
+                time.time(),
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_batch_tuning(model_id: str, device: str, host: str) -> Optional[Dict[str, Any]]:
+    init_db()
+    conn = _get_conn()
+    try:
+        r = conn.execute(
+            "SELECT * FROM embedding_batch_tuning WHERE model_id=? AND device=? AND host=?",
+            (model_id, device, host),
+        ).fetchone()
+        if r is None:
+            return None
+        d = dict(r)
+        try:
+            d["results"] = json.loads(d.get("results") or "[]")
+        except ValueError:
+            d["results"] = []
+        return d
+    finally:
+        conn.close()
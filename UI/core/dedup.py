@@ -0,0 +1,86 @@
+# UI/core/dedup.py
+"""
+Khử trùng chunk trước khi encode.
+
+Pháp điển lặp lại rất nhiều text (điều "được bãi bỏ", điều khoản boilerplate,
+khoản giống hệt nhau giữa các đề mục). Ở đây mỗi text (sau chuẩn hoá NFC +
+khoảng trắng) chỉ encode 1 lần, vector được "fan out" cho mọi chunk id cần nó.
+
+- Trong cùng batch: luôn khử trùng.
+- Giữa các batch: nhớ tối đa max_memo vector gần nhất (LRU) trong 1 lần chạy;
+  phần còn lại đã có cache embedding trên đĩa lo (nếu bật).
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+from .embed_cache import text_key
+
+
+class ChunkDeduper:
+    def __init__(self, max_memo: int = 10_000):
+        self.max_memo = max(int(max_memo), 0)
+        self._memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.total = 0
+        self.encoded = 0
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        encode_fn: Callable[[List[str], List[str]], np.ndarray],
+    ) -> np.ndarray:
+        """
+        encode_fn(unique_texts, unique_keys) -> ma trận vector.
+        Trả về ma trận float32 đúng thứ tự texts (text trùng dùng chung vector).
+        """
+        keys = [text_key(t) for t in texts]
+        self.total += len(texts)
+
+        # key -> vị trí đầu tiên trong batch; key đã có trong memo thì lấy vector ngay
+        # (trước khi _remember bên dưới có thể đẩy nó khỏi memo)
+        first: Dict[str, int] = {}
+        vec_of: Dict[str, np.ndarray] = {}
+        for i, k in enumerate(keys):
+            if k in first or k in vec_of:
+                continue
+            v = self._memo.get(k)
+            if v is None:
+                first[k] = i
+            else:
+                vec_of[k] = v
+                self._memo.move_to_end(k)
+
+        if first:
+            uniq_idx = list(first.values())
+            emb = np.asarray(
+                encode_fn([texts[i] for i in uniq_idx], [keys[i] for i in uniq_idx]), dtype=np.float32
+            )
+            self.encoded += len(uniq_idx)
+            for k, row in zip(first.keys(), emb):
+                vec_of[k] = row
+                self._remember(k, row)
+
+        out = np.empty((len(texts), self._dim(vec_of)), dtype=np.float32)
+        for i, k in enumerate(keys):
+            out[i] = vec_of[k]
+        return out
+
+    def _dim(self, vec_of: Dict[str, np.ndarray]) -> int:
+        for v in vec_of.values():
+            return int(v.shape[0])
+        return 0
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        if self.max_memo <= 0:
+            return
+        self._memo[key] = vec
+        while len(self._memo) > self.max_memo:
+            self._memo.popitem(last=False)
+
+    @property
+    def ratio(self) -> float:
+        """Tỉ lệ chunk KHÔNG phải encode nhờ khử trùng."""
+        return 1.0 - (self.encoded / self.total) if self.total else 0.0
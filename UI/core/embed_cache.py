@@ -0,0 +1,263 @@
+# UI/core/embed_cache.py
+"""
+Cache embedding trên đĩa, key = (model_id, hash của text đã chuẩn hoá).
+
+Layout: <EMBED_CACHE_DIR>/<model_id>/<namespace>/
+  - vectors.npy    : ma trận (capacity, dim) float16/float32, mở bằng memmap
+  - index.sqlite3  : key -> slot, last_used (LRU)
+
+Dùng chung giữa các collection / chunk_size khác nhau: cùng text + cùng model
+thì không encode lại. Đầy capacity thì bỏ các entry lâu không dùng nhất.
+
+Lưu ý: mỗi (model, namespace) chỉ nên có 1 process ghi tại một thời điểm
+(ingest dùng namespace "docs", chatbot dùng "queries").
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import abs_path
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(s: str) -> str:
+    s = unicodedata.normalize("NFC", s or "")
+    return _WS_RE.sub(" ", s).strip()
+
+
+def text_key(s: str) -> str:
+    return hashlib.sha1(normalize_text(s).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        model_id: str,
+        namespace: str = "docs",
+        max_entries: int = 200_000,
+        dtype: str = "float16",
+    ):
+        self.root = abs_path(cache_dir) / model_id.replace("/", "__") / namespace
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.capacity = max(int(max_entries), 1)
+        self.dtype = np.dtype(dtype)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.RLock()
+        self._vec_path = self.root / "vectors.npy"
+        self._vecs: Optional[np.ndarray] = None
+
+        self._conn = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+        # LRU trong RAM: key -> slot, đầu = cũ nhất
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._free: List[int] = []
+        self._next_slot = 0
+
+        if self._vec_path.exists():
+            vecs = np.load(self._vec_path, mmap_mode="r+")
+            if vecs.dtype == self.dtype and vecs.shape[0] == self.capacity:
+                self._vecs = vecs
+            del vecs
+        if self._vecs is None:
+            # chưa có hoặc đổi dtype/capacity => làm lại từ đầu
+            self._reset()
+        else:
+            self._load_index()
+
+    # -----------------------
+    # internal
+    # -----------------------
+    def _reset(self) -> None:
+        self._conn.execute("DELETE FROM entries")
+        self._conn.commit()
+        self._vecs = None
+        self._vec_path.unlink(missing_ok=True)
+        self._lru.clear()
+        self._touched.clear()
+        self._free = []
+        self._next_slot = 0
+
+    def _load_index(self) -> None:
+        rows = self._conn.execute("SELECT key, slot FROM entries ORDER BY last_used ASC").fetchall()
+        used = set()
+        for key, slot in rows:
+            if 0 <= slot < self.capacity:
+                self._lru[key] = int(slot)
+                used.add(int(slot))
+        self._next_slot = (max(used) + 1) if used else 0
+        self._free = [i for i in range(self._next_slot) if i not in used]
+
+    def _ensure_matrix(self, dim: int) -> np.ndarray:
+        if self._vecs is not None and self._vecs.shape[1] != dim:
+            # model trả dim khác (đổi model cùng tên) => bỏ cache cũ
+            self._reset()
+        if self._vecs is None:
+            # file thưa (sparse): chưa ghi slot nào thì gần như không tốn đĩa
+            self._vecs = np.lib.format.open_memmap(
+                self._vec_path, mode="w+", dtype=self.dtype, shape=(self.capacity, dim)
+            )
+        return self._vecs
+
+    def _alloc_slots(self, n: int) -> List[int]:
+        slots: List[int] = []
+        evicted: List[str] = []
+        while len(slots) < n:
+            if self._free:
+                slots.append(self._free.pop())
+            elif self._next_slot < self.capacity:
+                slots.append(self._next_slot)
+                self._next_slot += 1
+            else:
+                key, slot = self._lru.popitem(last=False)
+                self._touched.pop(key, None)
+                evicted.append(key)
+                slots.append(slot)
+        if evicted:
+            self.evictions += len(evicted)
+            self._conn.executemany("DELETE FROM entries WHERE key=?", [(k,) for k in evicted])
+        return slots
+
+    def _flush_touched(self) -> None:
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE entries SET last_used=? WHERE key=?",
+            [(ts, k) for k, ts in self._touched.items()],
+        )
+        self._touched.clear()
+
+    # -----------------------
+    # public
+    # -----------------------
+    def get_many(self, keys: Sequence[str]) -> Tuple[List[int], Optional[np.ndarray]]:
+        """Trả về (vị trí các key có trong cache, ma trận vector float32 tương ứng)."""
+        with self._lock:
+            found: List[int] = []
+            slots: List[int] = []
+            now = time.time()
+            for i, k in enumerate(keys):
+                slot = self._lru.get(k)
+                if slot is None:
+                    continue
+                self._lru.move_to_end(k)
+                self._touched[k] = now
+                found.append(i)
+                slots.append(slot)
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            if not found or self._vecs is None:
+                return [], None
+            return found, np.asarray(self._vecs[slots], dtype=np.float32)
+
+    def put_many(self, keys: Sequence[str], vecs: np.ndarray) -> None:
+        if len(keys) == 0:
+            return
+        vecs = np.asarray(vecs)
+        with self._lock:
+            mat = self._ensure_matrix(int(vecs.shape[1]))
+
+            # key trùng trong cùng batch / đã có => chỉ giữ 1 slot
+            todo: Dict[str, int] = {}
+            for i, k in enumerate(keys):
+                if k not in self._lru:
+                    todo[k] = i
+            if not todo:
+                return
+            if len(todo) > self.capacity:
+                # batch lớn hơn cả cache => chỉ giữ `capacity` key cuối, phần đầu bỏ qua không cache
+                todo = dict(list(todo.items())[-self.capacity:])
+
+            slots = self._alloc_slots(len(todo))
+            rows = list(todo.values())
+            mat[slots] = vecs[rows].astype(self.dtype, copy=False)
+            mat.flush()
+
+            now = time.time()
+            for k, slot in zip(todo.keys(), slots):
+                self._lru[k] = slot
+                self._touched.pop(k, None)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries(key, slot, last_used) VALUES(?, ?, ?)",
+                [(k, s, now) for k, s in zip(todo.keys(), slots)],
+            )
+            self._flush_touched()
+            self._conn.commit()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+            self._vecs = None
+
+
+def encode_cached(
+    texts: Sequence[str],
+    encode_fn: Callable[[List[str]], np.ndarray],
+    cache: Optional[EmbeddingCache],
+    keys: Optional[Sequence[str]] = None,
+) -> Tuple[np.ndarray, int]:
+    """
+    Encode qua cache: text có sẵn thì lấy từ cache, phần thiếu mới gọi encode_fn.
+    keys: text_key đã tính sẵn (nếu có) để khỏi hash lại.
+    Trả về (ma trận float32 đúng thứ tự texts, số hit).
+    """
+    if cache is None or not texts:
+        return np.asarray(encode_fn(list(texts)), dtype=np.float32), 0
+
+    if keys is None:
+        keys = [text_key(t) for t in texts]
+    found, cached = cache.get_many(keys)
+    if len(found) == len(texts):
+        return cached, len(found)
+
+    found_set = set(found)
+    miss = [i for i in range(len(texts)) if i not in found_set]
+    fresh = np.asarray(encode_fn([texts[i] for i in miss]), dtype=np.float32)
+    cache.put_many([keys[i] for i in miss], fresh)
+
+    out = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+    out[miss] = fresh
+    if found:
+        out[found] = cached
+    return out, len(found)
@@ -0,0 +1,286 @@
+# UI/core/embed_jobs.py
+"""
+Chạy embedding nền, tách khỏi script Streamlit.
+
+- Page chỉ thêm job vào bảng embedding_runs (status 'queued') rồi ensure_worker().
+- Worker là 1 process riêng (python -m core.embed_jobs): lấy job queued, gọi
+  run_embedding, ghi progress + checkpoint (số dòng CSV đã ghi trọn) vào SQLite.
+  Đóng tab / rerun / restart Streamlit không ảnh hưởng job.
+- Huỷ: page đặt cancel_requested, worker dừng sau batch đang chạy => 'cancelled'.
+- Worker chết giữa chừng => job 'interrupted'. Job failed/cancelled/interrupted
+  có thể resume: chạy lại từ checkpoint_row, không encode lại các dòng đã ghi.
+
+Worker còn sống hay không: file heartbeat (pid + thời điểm) cập nhật mỗi vài giây.
+Chỉ 1 worker: worker giữ lock độc quyền embed_worker.lock suốt đời process (OS tự nhả
+khi process chết); spawn trùng thì worker sau không lấy được lock và thoát ngay.
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import IO, Any, Dict, Optional
+
+from .config import settings
+from .db import (
+    add_embedding_batch_metrics,
+    claim_embedding_run,
+    clear_embedding_batch_metrics,
+    finish_embedding_run,
+    mark_interrupted_embedding_runs,
+    next_embedding_batch_no,
+    save_embedding_run_metrics,
+    update_embedding_progress,
+)
+
+_HEARTBEAT_S = 5.0
+_STALE_S = 30.0
+_POLL_S = 2.0
+_PROGRESS_EVERY_S = 1.0
+
+UI_DIR = Path(__file__).resolve().parents[1]
+
+
+def _worker_dir() -> Path:
+    # cùng thư mục với SQLite (đường dẫn hiểu giống core/db.py)
+    d = Path(settings.SQLITE_PATH).parent
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _heartbeat_file() -> Path:
+    return _worker_dir() / "embed_worker.json"
+
+
+def _lock_file() -> Path:
+    return _worker_dir() / "embed_worker.lock"
+
+
+def _try_lock(f: IO[str]) -> bool:
+    """Lock độc quyền, không chờ. False => process khác đang giữ."""
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _acquire_worker_lock() -> Optional[IO[str]]:
+    """Giữ file mở = giữ lock; None nếu đã có worker khác."""
+    f = open(_lock_file(), "a+", encoding="utf-8")
+    if not _try_lock(f):
+        f.close()
+        return None
+    f.seek(0)
+    f.truncate()
+    f.write(str(os.getpid()))
+    f.flush()
+    return f
+
+
+def _lock_holder_pid() -> Optional[int]:
+    """pid worker đang giữ lock (kể cả lúc chưa kịp ghi heartbeat), không có thì None."""
+    try:
+        f = open(_lock_file(), "a+", encoding="utf-8")
+    except OSError:
+        return None
+    with f:
+        if _try_lock(f):
+            return None  # không ai giữ; đóng file là nhả
+        f.seek(0)
+        try:
+            return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):  # Windows: vùng đang bị lock không đọc được
+            return None
+
+
+def live_worker_pid() -> Optional[int]:
+    """pid của worker còn heartbeat gần đây, không có thì None."""
+    try:
+        hb = json.loads(_heartbeat_file().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if time.time() - float(hb.get("at", 0)) > _STALE_S:
+        return None
+    return int(hb.get("pid", 0)) or None
+
+
+def ensure_worker() -> int:
+    """
+    Có worker sống thì thôi, không thì spawn 1 worker (detached). Trả về pid.
+    Job 'running' của worker đã chết do worker mới đánh dấu interrupted sau khi lấy được lock.
+    """
+    pid = live_worker_pid() or _lock_holder_pid()
+    if pid is not None:
+        return pid
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (str(UI_DIR), env.get("PYTHONPATH", "")) if p)
+    log = open(_worker_dir() / "embed_worker.log", "ab")
+    kwargs: Dict[str, Any] = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP  # type: ignore[attr-defined]
+    else:
+        kwargs["start_new_session"] = True
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "core.embed_jobs"],
+        cwd=os.getcwd(),
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL,
+        **kwargs,
+    )
+    log.close()
+    return proc.pid
+
+
+def run_note(result: Dict[str, Any], params: Dict[str, Any], elapsed: float) -> str:
+    note = (
+        f"OK | time={elapsed:.2f}s | embedded={result['embedded']} "
+        f"skipped={result['skipped']} deleted={result['deleted']} "
+        f"cache_hit={result['cache_hits']} cache_miss={result['cache_misses']} "
+        f"chunks/s={result.get('chunks_per_s', 0)} workers={result.get('encode_workers', 1)}"
+    )
+    if params.get("dedup", True):
+        note += f" dedup={result.get('dedup_ratio', 0):.1%}"
+    if params.get("length_bucketing"):
+        note += f" padding={result.get('padding_fixed', 0):.0%}->{result.get('padding_bucketed', 0):.0%}"
+    if result.get("resumed_from_row"):
+        note += f" resumed_from_row={result['resumed_from_row']}"
+    if result.get("active_version"):
+        note += f" active=v{result['active_version']} cloned={result.get('cloned', 0)}"
+    return note
+
+
+def run_metrics(result: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Dòng embedding_run_metrics từ summary của run_embedding."""
+    m: Dict[str, Any] = dict(result.get("timings") or {})
+    m.update(
+        model_id=params.get("model_id"),
+        device=params.get("device"),
+        backend=settings.EMBED_BACKEND,
+        chunker=params.get("chunker", "chars"),
+        batch_size=result.get("batch_size", params.get("batch_size")),
+        encode_workers=result.get("encode_workers", 1),
+        chunks=result.get("embedded", 0),
+        tokens=result.get("tokens", 0),
+        wall_s=result.get("encode_upsert_s"),
+        chunks_per_s=result.get("chunks_per_s"),
+        tokens_per_s=result.get("tokens_per_s"),
+        peak_rss_mb=result.get("peak_rss_mb"),
+    )
+    return m
+
+
+def _run_job(job: Dict[str, Any]) -> None:
+    from .embedding_runner import EmbeddingCancelled, run_embedding
+
+    run_id = int(job["id"])
+    params = dict(job.get("params") or {})
+    # blue/green: mỗi run ghi vào collection `<collection>__v<run_id>`, xong mới đổi alias
+    if params.pop("blue_green", False):
+        params["version"] = run_id
+    start_row = int(job.get("checkpoint_row") or 0)
+    cancelled = threading.Event()
+    last = {"t": 0.0}
+
+    def on_progress(done: int, total: int) -> None:
+        now = time.time()
+        if now - last["t"] < _PROGRESS_EVERY_S and done < total:
+            return
+        last["t"] = now
+        if update_embedding_progress(run_id, done, total):
+            cancelled.set()
+
+    def on_checkpoint(rows_done: int) -> None:
+        if update_embedding_progress(run_id, checkpoint_row=rows_done):
+            cancelled.set()
+
+    if start_row == 0:
+        clear_embedding_batch_metrics(run_id)
+    # resume: run_embedding đếm batch lại từ 0 => cộng thêm số batch đã ghi
+    first_batch = next_embedding_batch_no(run_id)
+
+    def on_batch(rec: Dict[str, Any]) -> None:
+        add_embedding_batch_metrics(run_id, {**rec, "batch_no": first_batch + rec["batch_no"]})
+
+    t0 = time.time()
+    try:
+        result = run_embedding(
+            **params,
+            on_progress=on_progress,
+            start_row=start_row,
+            on_checkpoint=on_checkpoint,
+            should_cancel=cancelled.is_set,
+            on_batch=on_batch,
+        )
+        save_embedding_run_metrics(run_id, run_metrics(result, params))
+        finish_embedding_run(
+            run_id=run_id,
+            status="ok",
+            note=run_note(result, params, time.time() - t0),
+            total_rows=result["total_rows"],
+            total_chunks=result["total_chunks"],
+        )
+    except EmbeddingCancelled as e:
+        finish_embedding_run(run_id=run_id, status="cancelled", note=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        finish_embedding_run(run_id=run_id, status="failed", note=str(e))
+
+
+def worker_loop(idle_exit_s: float = 300.0) -> None:
+    """Vòng lặp worker: chạy lần lượt các job queued, rảnh quá idle_exit_s thì thoát."""
+    pid = os.getpid()
+    lock = _acquire_worker_lock()
+    if lock is None:
+        return  # đã có worker khác (spawn trùng từ 2 lần poll của page)
+
+    stop = threading.Event()
+
+    def _beat() -> None:
+        while not stop.is_set():
+            _heartbeat_file().write_text(json.dumps({"pid": pid, "at": time.time()}), encoding="utf-8")
+            stop.wait(_HEARTBEAT_S)
+
+    beat = threading.Thread(target=_beat, name="embed-worker-heartbeat", daemon=True)
+    beat.start()
+    idle_since = time.time()
+    try:
+        # đang giữ lock => job 'running' của pid khác là của worker đã chết
+        mark_interrupted_embedding_runs(pid)
+        while True:
+            job = claim_embedding_run(pid)
+            if job is None:
+                if time.time() - idle_since > idle_exit_s:
+                    return
+                time.sleep(_POLL_S)
+                continue
+            print(f"[embed-worker {pid}] run #{job['id']} start (checkpoint_row={job.get('checkpoint_row') or 0})", flush=True)
+            _run_job(job)
+            print(f"[embed-worker {pid}] run #{job['id']} done", flush=True)
+            idle_since = time.time()
+    finally:
+        stop.set()
+        try:
+            _heartbeat_file().unlink()
+        except OSError:
+            pass
+        lock.close()
+
+
+if __name__ == "__main__":
+    worker_loop()
@@ -1,13 +1,29 @@
+import copy
 import os
+import re
+import time
 import hashlib
-from typing import Callable, Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
+import numpy as np
 import torch
-from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 
-from .csv_loader import load_law_docs_from_csv
+from .csv_loader import iter_law_doc_batches, iter_law_docs_from_csv
+from .aliases import activate_version, alias_generation, resolve_alias, touch_alias, versioned_name
+from .autotune import rss_mb, tuned_batch
+from .bucketing import encode_bucketed, padded_tokens, plan_batches, token_lengths
+from .chunk_table import ChunkTable
+from .chunking import chunk_spans, chunk_spans_structure, chunk_text, count_truncated
+from .dedup import ChunkDeduper
+from .embed_cache import encode_cached
+from .encode_pool import EncodePool
+from .flat_store import drop_flat, export_flat, flat_dir, read_manifest
+from .ivf import load_or_build as build_ivf
+from .pipeline import run_pipeline
+from .config import settings
+from .resources import get_embed_cache, get_embedder, get_tokenizer
 
 
 def resolve_device(device_choice: str) -> str:
@@ -27,30 +43,147 @@ def device_status_text(device_real: str) -> str:
 
 
 def _chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
-    text = (text or "").strip()
+    return chunk_text(text, chunk_size, overlap)
+
+
+_DIEU_LABEL_RE = re.compile(r"^\s*(Điều\s+[\w.]+?)\.?(?:\s|$)")
+
+
+def _structure_spans(text: str, meta: Dict[str, Any], tokenizer=None, max_tokens: int = 0, chunk_size: int = 1200):
+    """Span theo Chương/Điều/Khoản/Điểm trên text (đã strip): [(start, end, đường dẫn phân cấp đầy đủ)]."""
     if not text:
         return []
-    if chunk_size <= 0:
-        return [text]
-
-    chunks = []
-    start = 0
-    n = len(text)
-    step = max(chunk_size - overlap, 1)
-
-    while start < n:
-        end = min(start + chunk_size, n)
-        chunks.append(text[start:end])
-        if end == n:
-            break
-        start += step
-    return chunks
+    prefix = [str(meta.get("chuong_ten") or "").strip()]
+    m = _DIEU_LABEL_RE.match(str(meta.get("dieu_ten") or ""))
+    if m:
+        prefix.append(m.group(1))
+
+    out = []
+    for s, e, path in chunk_spans_structure(text, tokenizer, max_tokens, chunk_size):
+        parts = [p for p in prefix if p]
+        # path đã có "Điều x" (văn bản đầy đủ) thì không lặp lại
+        if path.startswith("Điều") or path.startswith("Chương"):
+            parts = [p for p in parts if not p.startswith("Điều")]
+        if path:
+            parts.append(path)
+        out.append((s, e, " > ".join(parts)))
+    return out
+
+
+def _structure_chunks(text: str, meta: Dict[str, Any], tokenizer=None, max_tokens: int = 0, chunk_size: int = 1200):
+    """Chunk theo Chương/Điều/Khoản/Điểm, trả về [(chunk, đường dẫn phân cấp đầy đủ)]."""
+    text = (text or "").strip()
+    return [(text[s:e], path) for s, e, path in _structure_spans(text, meta, tokenizer, max_tokens, chunk_size)]
 
 
 def _safe_hash(s: str, n: int = 12) -> str:
     return hashlib.md5((s or "").encode("utf-8")).hexdigest()[:n]
 
 
+def sample_chunks(csv_path: str, n: int = 256, chunk_size: int = 1200, chunk_overlap: int = 120) -> List[str]:
+    """Lấy n chunk đầu của CSV (dùng để đo tốc độ / calibrate)."""
+    out: List[str] = []
+    for d in iter_law_docs_from_csv(csv_path, chunksize=max(n, 64)):
+        out.extend(_chunk_text(d.get("text", "") or "", chunk_size, chunk_overlap))
+        if len(out) >= n:
+            break
+    return out[:n]
+
+
+def compare_chunkers(
+    csv_path: str,
+    model_id: str,
+    chunk_size: int = 1200,
+    chunk_overlap: int = 120,
+    overlap_tokens: int = 0,
+    n_rows: int = 500,
+) -> Dict[str, Any]:
+    """
+    So các chunker (ký tự cũ / token / cấu trúc) trên n_rows dòng đầu:
+    số chunk, tổng ký tự (độ phình do overlap) và số chunk dài hơn cửa sổ model.
+    """
+    tokenizer, max_len = get_tokenizer(model_id)
+    chunks: Dict[str, List[str]] = {"chars": [], "tokens": [], "structure": []}
+    for i, d in enumerate(iter_law_docs_from_csv(csv_path, chunksize=max(n_rows, 64))):
+        if i >= n_rows:
+            break
+        text = d.get("text", "") or ""
+        chunks["chars"].extend(chunk_text(text, chunk_size, chunk_overlap))
+        chunks["tokens"].extend(
+            chunk_text(text, tokenizer=tokenizer, max_tokens=max_len, overlap_tokens=overlap_tokens)
+        )
+        chunks["structure"].extend(
+            c for c, _ in _structure_chunks(text, d.get("meta", {}), tokenizer, max_len)
+        )
+
+    out: Dict[str, Any] = {"max_seq_length": max_len}
+    for name, items in chunks.items():
+        out[f"{name}_chunks"] = len(items)
+        out[f"{name}_chars"] = sum(len(c) for c in items)
+        out[f"{name}_truncated"] = count_truncated(items, tokenizer, max_len)
+    return out
+
+
+def _existing_chunk_hashes(col, page_size: int = 5000) -> Dict[str, str]:
+    """
+    Đọc id -> chunk_hash của toàn bộ collection (theo trang để không kéo hết 1 lần).
+    Chunk cũ chưa có chunk_hash => "" (sẽ bị embed lại cho chắc).
+    """
+    out: Dict[str, str] = {}
+    offset = 0
+    while True:
+        res = col.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = res.get("ids") or []
+        if not ids:
+            break
+        metas = res.get("metadatas") or [None] * len(ids)
+        for cid, m in zip(ids, metas):
+            out[str(cid)] = str((m or {}).get("chunk_hash", ""))
+        offset += len(ids)
+    return out
+
+
+def _collection_names(client) -> set:
+    # chromadb 0.5 trả Collection, 0.6+ trả tên
+    return {c if isinstance(c, str) else c.name for c in client.list_collections()}
+
+
+def _clone_collection(src, dst, page_size: int = 2000) -> int:
+    """Copy id/vector/document/metadata từ src sang dst (không encode lại)."""
+    copied = 0
+    offset = 0
+    while True:
+        res = src.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        ids = res.get("ids") or []
+        if not ids:
+            break
+        dst.upsert(
+            ids=ids,
+            embeddings=res.get("embeddings"),
+            documents=res.get("documents"),
+            metadatas=res.get("metadatas"),
+        )
+        copied += len(ids)
+        offset += len(ids)
+    return copied
+
+
+def _count_csv_rows(csv_path: str, chunksize: int = 50000) -> int:
+    """Đếm số dòng CSV (chỉ parse 1 cột) để ước lượng tổng chunk cho progress."""
+    import pandas as pd
+
+    return sum(len(df) for df in pd.read_csv(csv_path, usecols=[0], chunksize=chunksize))
+
+
+def _delete_ids(col, ids: List[str], batch_size: int = 5000) -> None:
+    for i in range(0, len(ids), batch_size):
+        col.delete(ids=ids[i : i + batch_size])
+
+
+class EmbeddingCancelled(RuntimeError):
+    """run_embedding dừng vì should_cancel() trả True (các batch đã ghi vẫn giữ nguyên)."""
+
+
 def run_embedding(
     csv_path: str,
     chroma_dir: str,
@@ -61,13 +194,62 @@ def run_embedding(
     chunk_overlap: int = 120,
     batch_size: int = 128,
     on_progress: Optional[Callable[[int, int], None]] = None,
+    incremental: bool = False,
+    use_cache: bool = True,
+    pipeline_depth: int = 2,
+    encode_workers: int = 0,
+    threads_per_worker: int = 0,
+    length_bucketing: bool = False,
+    token_budget: int = 16384,
+    dedup: bool = True,
+    chunker: str = "chars",
+    overlap_tokens: int = 0,
+    start_row: int = 0,
+    on_checkpoint: Optional[Callable[[int], None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    on_batch: Optional[Callable[[Dict[str, Any]], None]] = None,
+    version: Optional[Any] = None,
 ) -> Dict[str, Any]:
     """
     Build Chroma collection from a CSV file.
     - Fix DuplicateIDError bằng cách tạo id theo row_index + chunk_index + hash.
     - ChromaDB bản mới: KHÔNG cần client.persist() (auto-persist).
+    - incremental=True: chỉ embed chunk mới/đổi (so id + chunk_hash với collection),
+      xoá các id không còn trong CSV (vector mồ côi của row_hash cũ).
+    - use_cache=True: text đã từng embed với model này (collection / chunk_size khác)
+      thì lấy vector từ cache trên đĩa, không encode lại.
+    - Chuẩn bị batch / encode / upsert chạy gối nhau (core/pipeline.py), tối đa
+      pipeline_depth batch chờ giữa mỗi tầng.
+    - encode_workers > 1 (chỉ với CPU): encode bằng pool nhiều process
+      (core/encode_pool.py), mỗi process threads_per_worker torch threads.
+    - length_bucketing=True: mỗi lần lấy cửa sổ batch_size*8 chunk, sắp theo số token
+      và cắt batch theo token_budget (core/bucketing.py), upsert vẫn theo thứ tự gốc.
+    - dedup=True: chunk có text giống hệt nhau chỉ encode 1 lần (core/dedup.py).
+    - chunker="tokens": cắt theo token của model ở ranh giới câu/vế, mỗi chunk vừa
+      max_seq_length (core/chunking.py); chunk_size/chunk_overlap khi đó không dùng.
+    - chunker="structure": cắt theo Chương/Điều/Khoản/Điểm, không overlap, meta có
+      "hierarchy" (vd "Điều 5 > Khoản 2 > Điểm a–c"); giới hạn theo max_seq_length.
+    - Chạy nền / resume (core/embed_jobs.py): sau mỗi batch ghi xong gọi
+      on_checkpoint(số dòng CSV đã ghi trọn); chạy lại với start_row=checkpoint thì
+      các dòng trước đó không encode lại. should_cancel() trả True => raise
+      EmbeddingCancelled sau batch đang chạy.
+    - version (blue/green, core/aliases.py): ghi vào collection riêng
+      `<collection>__v<version>` thay vì collection đang phục vụ chatbot; incremental
+      thì copy vector của bản đang active sang trước rồi chỉ encode phần đổi. Xong
+      (không lỗi) mới đổi alias `collection` sang bản mới, giữ CHROMA_KEEP_VERSIONS
+      bản cũ để rollback, bản cũ hơn bị xoá.
+      version=None: ghi thẳng vào collection alias `collection` đang trỏ tới.
+    - batch_size=0: dùng batch_size (+ số torch thread trên CPU) đã calibrate cho
+      (model_id, device, máy này) bằng core/autotune.py; chưa calibrate thì 128.
+    - Metrics: summary["timings"] = tổng thời gian từng tầng (load/chunk/tokenize/
+      encode/upsert, các tầng chạy chồng nhau nên tổng > wall time), tokens/s
+      (token của chunk thật sự đưa vào model, cache / dedup hit không tính),
+      peak_rss_mb = max RSS đo sau mỗi batch. on_batch(dict) được gọi sau mỗi batch
+      ghi xong với số liệu của batch đó (rss_mb lúc đó; lưu vào embedding_run_batches).
     """
     device_real = resolve_device(device)
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV not found: {csv_path}")
 
     # Ensure persist dir
     os.makedirs(chroma_dir, exist_ok=True)
@@ -77,50 +259,214 @@ def run_embedding(
         path=chroma_dir,
         settings=ChromaSettings(anonymized_telemetry=False),
     )
-    col = client.get_or_create_collection(name=collection)
+    target = collection
+    cloned = 0
+    if version is not None:
+        target = versioned_name(collection, version)
+        col = client.get_or_create_collection(name=target)
+        if incremental and col.count() == 0:
+            active_name, _ = resolve_alias(chroma_dir, collection)
+            if active_name != target and active_name in _collection_names(client):
+                cloned = _clone_collection(client.get_collection(active_name), col)
+    else:
+        # ghi thẳng vào collection alias đang trỏ tới (sau blue/green thì không phải tên alias)
+        target, _ = resolve_alias(chroma_dir, collection)
+        col = client.get_or_create_collection(name=target)
+
+    existing = _existing_chunk_hashes(col) if incremental else {}
+    total_rows_est = _count_csv_rows(csv_path) if on_progress else 0
+
+    summary = {
+        "total_rows": 0,
+        "total_chunks": 0,
+        "embedded": 0,
+        "skipped": 0,
+        "deleted": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+    }
+    if start_row > 0:
+        summary["resumed_from_row"] = int(start_row)
+    summary["collection"] = target
+    if version is not None:
+        summary["cloned"] = cloned
+    timings = {"load_s": 0.0, "chunk_s": 0.0, "tokenize_s": 0.0, "encode_s": 0.0, "upsert_s": 0.0}
+    total_tokens = 0
+    source_ids: set = set()
+
+    cache = get_embed_cache(model_id, namespace="docs") if use_cache else None
+    use_pool = encode_workers > 1 and device_real == "cpu"
+    # batch nội bộ của encode: thủ công thì chặn 256, auto thì tin kết quả calibrate (đã đo bộ nhớ)
+    inner_cap = 256
+    if batch_size <= 0:
+        batch_size, tuned_threads, tuned = tuned_batch(model_id, device_real)
+        inner_cap = batch_size
+        summary["batch_size"] = batch_size
+        summary["batch_size_tuned"] = tuned
+        if tuned and tuned_threads > 0 and device_real == "cpu" and not use_pool:
+            # đặt ngay trước pipeline, trả lại số cũ khi xong (worker / app chạy tiếp job khác)
+            summary["torch_threads"] = tuned_threads
+    pool: Optional[EncodePool] = None
+    summary["encode_workers"] = encode_workers if use_pool else 1
+
+    def _encode_raw(batch: List[str]):
+        nonlocal pool
+        inner_bs = len(batch) if length_bucketing else min(batch_size, inner_cap)
+        if use_pool:
+            # pool chỉ khởi tạo khi thật sự có cache miss
+            if pool is None:
+                pool = EncodePool(model_id, encode_workers, threads_per_worker)
+            return pool.encode(batch, batch_size=inner_bs)
+
+        # Embedding model dùng chung với chatbot (registry); chỉ load khi cache miss
+        model = get_embedder(model_id, device_real)
+        return model.encode(
+            batch,
+            batch_size=inner_bs,
+            show_progress_bar=False,
+            normalize_embeddings=True,
+        )
+
+    if length_bucketing:
+        summary["padding_fixed"] = 0.0
+        summary["padding_bucketed"] = 0.0
+        pad_tokens = {"real": 0, "fixed": 0, "bucketed": 0}
+
+    # token của các chunk thật sự đưa vào model (cache / dedup hit không tính) trong batch đang encode
+    encoded = {"tokens": 0, "tokenize_s": 0.0}
 
-    # Load docs
-    docs = load_law_docs_from_csv(csv_path)
+    def _encode(batch: List[str]):
+        t = time.perf_counter()
+        tokenizer, max_len = get_tokenizer(model_id)
+        lengths = token_lengths(batch, tokenizer, max_len)
+        encoded["tokens"] += sum(lengths)
+        encoded["tokenize_s"] += time.perf_counter() - t
+        if not length_bucketing:
+            return _encode_raw(batch)
 
-    ids: List[str] = []
-    texts: List[str] = []
-    metas: List[Dict[str, Any]] = []
+        # thống kê padding: batch cố định theo thứ tự CSV vs bucket theo token
+        fixed = [list(range(i, min(i + batch_size, len(batch)))) for i in range(0, len(batch), batch_size)]
+        pad_tokens["real"] += sum(lengths)
+        pad_tokens["fixed"] += padded_tokens(lengths, fixed)
+        pad_tokens["bucketed"] += padded_tokens(lengths, plan_batches(lengths, token_budget))
+        summary["padding_fixed"] = round(1 - pad_tokens["real"] / max(pad_tokens["fixed"], 1), 4)
+        summary["padding_bucketed"] = round(1 - pad_tokens["real"] / max(pad_tokens["bucketed"], 1), 4)
 
-    for row_idx, d in enumerate(docs):
-        base_id = str(d.get("id", "")).strip() or f"row_{row_idx}"
-        full_text = d.get("text", "") or ""
-        chunks = _chunk_text(full_text, chunk_size, chunk_overlap)
+        return encode_bucketed(batch, _encode_raw, lengths, token_budget)
 
-        row_hash = _safe_hash(full_text)
+    if chunker in ("tokens", "structure"):
+        tokenizer, max_len = get_tokenizer(model_id)
+        # _split chạy trong thread producer, song song với _encode / model.encode dùng tokenizer chung:
+        # HF fast tokenizer không thread-safe ("Already borrowed") => producer dùng bản copy riêng
+        tokenizer = copy.deepcopy(tokenizer)
+        summary["max_seq_length"] = max_len
 
-        for chunk_idx, ch in enumerate(chunks):
-            uid = f"{base_id}__r{row_idx}__c{chunk_idx}__{row_hash}"
-            ids.append(uid)
-            texts.append(ch)
+    def _split(text: str, meta: Dict[str, Any]) -> List[Tuple[int, int, str]]:
+        """[(start, end, hierarchy)] trên text đã strip — hierarchy rỗng nếu không theo cấu trúc."""
+        if chunker == "structure":
+            return _structure_spans(text, meta, tokenizer, max_len)
+        if chunker == "tokens":
+            spans = chunk_spans(text, tokenizer=tokenizer, max_tokens=max_len, overlap_tokens=overlap_tokens)
+        else:
+            spans = chunk_spans(text, chunk_size, chunk_overlap)
+        return [(a, b, "") for a, b in spans]
 
-            m = dict(d.get("meta", {}))
-            m["source_id"] = base_id
-            m["row_index"] = row_idx
-            m["chunk_index"] = chunk_idx
-            m["row_hash"] = row_hash
-            metas.append(m)
+    # bucketing cần cửa sổ rộng hơn 1 batch để có cái mà sắp
+    window = batch_size * 8 if length_bucketing else batch_size
 
-    total_chunks = len(texts)
-    total_rows = len(docs)
+    def _batches():
+        """
+        Tầng 1: đọc CSV theo khúc -> chunk -> lọc incremental -> gom `window` chunk
+        vào 1 ChunkTable (chỉ offset, text dòng + meta dùng chung, không copy).
+        """
+        table = ChunkTable()
+        row_idx = 0
+        load_s = chunk_s = 0.0
 
-    if total_chunks == 0:
-        return {"total_rows": total_rows, "total_chunks": 0}
+        docs_iter = iter(iter_law_doc_batches(csv_path))
+        while True:
+            t = time.perf_counter()
+            docs = next(docs_iter, None)
+            load_s += time.perf_counter() - t
+            if docs is None:
+                break
+            for d in docs:
+                t_row = time.perf_counter()
+                base_id = str(d.get("id", "")).strip() or f"row_{row_idx}"
+                full_text = d.get("text", "") or ""
+                text = full_text.strip()
+                meta = d.get("meta", {})
+                row_hash = _safe_hash(full_text)
+                row = -1  # dòng chỉ vào bảng khi có ít nhất 1 chunk cần embed
 
-    # Load embedding model
-    model = SentenceTransformer(model_id, device=device_real)
+                for chunk_idx, (a, b, hierarchy) in enumerate(_split(text, meta)):
+                    chunk_hash = _safe_hash(text[a:b])
+                    summary["total_chunks"] += 1
+                    if incremental:
+                        uid = f"{base_id}__r{row_idx}__c{chunk_idx}__{row_hash}"
+                        source_ids.add(uid)
+                        if existing.get(uid) == chunk_hash:
+                            summary["skipped"] += 1
+                            continue
+                    if row_idx < start_row:
+                        # đã ghi ở lần chạy trước (checkpoint)
+                        summary["skipped"] += 1
+                        continue
 
-    # Encode + upsert by batches
-    done = 0
-    for i in range(0, total_chunks, batch_size):
-        batch_texts = texts[i : i + batch_size]
-        batch_ids = ids[i : i + batch_size]
-        batch_metas = metas[i : i + batch_size]
+                    if row < 0:
+                        row = table.add_row(text, meta, base_id, row_idx, row_hash)
+                    table.add_chunk(row, a, b, chunk_idx, chunk_hash, hierarchy)
 
+                    if len(table) >= window:
+                        if should_cancel is not None and should_cancel():
+                            raise EmbeddingCancelled("Đã huỷ theo yêu cầu")
+                        # dòng hiện tại có thể còn chunk ở bảng sau => chỉ tính các dòng trước nó
+                        table.rows_done = row_idx
+                        chunk_s += time.perf_counter() - t_row
+                        table.timings.update(load_s=load_s, chunk_s=chunk_s)
+                        load_s = chunk_s = 0.0
+                        yield table
+                        t_row = time.perf_counter()
+                        table = ChunkTable()
+                        row = -1
+
+                chunk_s += time.perf_counter() - t_row
+                row_idx += 1
+                summary["total_rows"] = row_idx
+
+        if len(table):
+            table.rows_done = row_idx
+            table.timings.update(load_s=load_s, chunk_s=chunk_s)
+            yield table
+
+    deduper = ChunkDeduper() if dedup else None
+
+    def _encode_cached(batch_texts: List[str], keys: Optional[List[str]] = None):
+        emb, hits = encode_cached(batch_texts, _encode, cache, keys=keys)
+        summary["cache_hits"] += hits
+        summary["cache_misses"] += len(batch_texts) - hits
+        return emb
+
+    def _encode_batch(table: ChunkTable):
+        # text chunk chỉ cắt ra lúc encode, xong bỏ luôn
+        batch_texts = table.texts()
+        encoded.update(tokens=0, tokenize_s=0.0)
+        t = time.perf_counter()
+        if deduper is not None:
+            emb = deduper.encode(batch_texts, _encode_cached)
+        else:
+            emb = _encode_cached(batch_texts)
+        # tokenize 1 lần trong _encode (bucketing dùng luôn lengths đó), tách khỏi encode_s
+        table.tokens = encoded["tokens"]
+        table.timings["tokenize_s"] = encoded["tokenize_s"]
+        table.timings["encode_s"] = time.perf_counter() - t - encoded["tokenize_s"]
+        return table, emb
+
+    def _upsert(batch) -> int:
+        table, emb = batch
+        batch_ids = table.ids()
+        batch_texts = table.texts()
+        batch_metas = table.metadatas()
         # chống trùng trong batch (cực hiếm nhưng cứ chặn)
         seen = set()
         for k in range(len(batch_ids)):
@@ -129,23 +475,109 @@ def run_embedding(
                 batch_ids[k] = f"{bid}__dup{k}"
             seen.add(batch_ids[k])
 
-        emb = model.encode(
-            batch_texts,
-            batch_size=min(batch_size, 256),
-            show_progress_bar=False,
-            normalize_embeddings=True,
-        )
-
+        t = time.perf_counter()
         col.upsert(
             ids=batch_ids,
             documents=batch_texts,
             embeddings=emb,
             metadatas=batch_metas,
         )
+        table.timings["upsert_s"] = time.perf_counter() - t
+        if on_checkpoint is not None:
+            on_checkpoint(table.rows_done)
+        _record_batch(table)
+        return len(batch_ids)
+
+    batch_no = 0
+    # RSS hiện tại đo mỗi batch (ru_maxrss là peak cả đời process, worker chạy nhiều job)
+    peak_rss = rss_mb()
+
+    def _record_batch(table: ChunkTable) -> None:
+        nonlocal batch_no, total_tokens, peak_rss
+        for k, v in table.timings.items():
+            timings[k] += v
+        total_tokens += table.tokens
+        rss = rss_mb()
+        if rss is not None and (peak_rss is None or rss > peak_rss):
+            peak_rss = rss
+        if on_batch is not None:
+            busy = table.timings.get("encode_s", 0.0) + table.timings.get("upsert_s", 0.0)
+            rec = {"batch_no": batch_no, "chunks": len(table), "tokens": table.tokens}
+            rec.update({k: round(v, 4) for k, v in table.timings.items()})
+            rec["chunks_per_s"] = round(len(table) / busy, 2) if busy > 0 else 0.0
+            rec["tokens_per_s"] = round(table.tokens / busy, 2) if busy > 0 else 0.0
+            rec["rss_mb"] = round(rss, 1) if rss is not None else None
+            on_batch(rec)
+        batch_no += 1
+
+    def _on_written(done: int) -> None:
+        if not on_progress:
+            return
+        # tổng chunk chưa biết trước (đọc streaming) => ước lượng theo số chunk/dòng đã thấy
+        rows = max(summary["total_rows"], 1)
+        est_total = int(summary["total_chunks"] / rows * max(total_rows_est, rows))
+        processed = done + summary["skipped"]
+        on_progress(processed, max(est_total, processed))
+
+    # Chuẩn bị batch -> encode -> upsert chạy song song, có backpressure
+    t0 = time.time()
+    prev_threads = torch.get_num_threads()
+    try:
+        if summary.get("torch_threads"):
+            torch.set_num_threads(summary["torch_threads"])
+        written = run_pipeline(_batches(), _encode_batch, _upsert, on_written=_on_written, queue_size=pipeline_depth)
+    finally:
+        torch.set_num_threads(prev_threads)
+        if pool is not None:
+            pool.close()
+        if version is None and batch_no > 0:
+            # ghi thẳng vào collection đang phục vụ (kể cả khi lỗi giữa chừng) => cache kết quả hết hạn
+            touch_alias(chroma_dir, collection)
+    elapsed = time.time() - t0
+    summary["embedded"] = written
+    if deduper is not None:
+        summary["dedup_unique"] = deduper.encoded
+        summary["dedup_ratio"] = round(deduper.ratio, 4)
+    summary["encode_upsert_s"] = round(elapsed, 3)
+    summary["chunks_per_s"] = round(written / elapsed, 2) if elapsed > 0 else 0.0
+    summary["tokens"] = total_tokens
+    summary["tokens_per_s"] = round(total_tokens / elapsed, 2) if elapsed > 0 else 0.0
+    summary["timings"] = {k: round(v, 3) for k, v in timings.items()}
+    summary["peak_rss_mb"] = round(peak_rss, 1) if peak_rss is not None else None
+
+    if incremental:
+        # xoá vector mồ côi (id không còn sinh ra từ CSV, vd row_hash cũ)
+        stale = [cid for cid in existing if cid not in source_ids]
+        _delete_ids(col, stale)
+        summary["deleted"] = len(stale)
+        if stale and version is None:
+            touch_alias(chroma_dir, collection)
+
+    if version is not None:
+        # bản mới đã đủ => đổi alias (atomic), xoá các bản rơi khỏi history
+        dropped = activate_version(chroma_dir, collection, target, version, keep=settings.CHROMA_KEEP_VERSIONS)
+        for name in dropped:
+            try:
+                client.delete_collection(name)
+            except Exception:
+                pass  # bản legacy / đã xoá tay
+            drop_flat(chroma_dir, name)
+        summary["active_version"] = str(version)
+        summary["dropped_versions"] = dropped
+
+    if settings.VECTOR_BACKEND == "numpy":
+        # export sẵn bản đang active để app (FlatStore) chỉ việc mmap, không export lúc query
+        active_name, _ = resolve_alias(chroma_dir, collection)
+        generation = alias_generation(chroma_dir, collection)
+        if read_manifest(chroma_dir, active_name).get("generation") != generation:
+            export_flat(client, chroma_dir, active_name, generation)
+        if settings.VECTOR_INDEX == "ivf" and read_manifest(chroma_dir, active_name).get("count"):
+            # dùng lại centroid của alias, chỉ gán list cho bản export mới (train lại khi cần)
+            d = flat_dir(chroma_dir, active_name)
+            build_ivf(d, np.load(d / "vectors.npy", mmap_mode="r"), chroma_dir, collection, settings.IVF_LISTS)
 
-        done = min(i + len(batch_texts), total_chunks)
-        if on_progress:
-            on_progress(done, total_chunks)
+    if on_progress:
+        on_progress(summary["total_chunks"], summary["total_chunks"])
 
     # ✅ ChromaDB persistent client auto-save, không gọi persist nữa
-    return {"total_rows": total_rows, "total_chunks": total_chunks}
+    return summary
@@ -0,0 +1,153 @@
+# UI/core/encode_pool.py
+"""
+Pool nhiều process để encode trên CPU (máy nhiều core, không có GPU).
+
+Mỗi worker giữ 1 bản SentenceTransformer riêng, giới hạn torch threads
+(threads_per_worker) để các worker không tranh core với nhau.
+Mỗi lần encode, texts được chia thành các shard liên tiếp, gửi cho các worker,
+rồi ghép lại ĐÚNG thứ tự ban đầu (để upsert id <-> vector không lệch).
+
+Dùng start method "spawn" (torch không an toàn với fork khi đã có thread).
+"""
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+_worker_model = None
+
+
+def _init_worker(model_id: str, threads: int, backend: str = "torch") -> None:
+    global _worker_model
+    if threads > 0:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        os.environ["MKL_NUM_THREADS"] = str(threads)
+    if backend == "onnx":
+        from .onnx_backend import OnnxEmbedder
+
+        _worker_model = OnnxEmbedder.load(model_id, threads=threads)
+        return
+
+    import torch  # type: ignore
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_id, device="cpu")
+
+
+def _encode_shard(args) -> np.ndarray:
+    texts, batch_size = args
+    return _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        show_progress_bar=False,
+        normalize_embeddings=True,
+    ).astype(np.float32, copy=False)
+
+
+def _wait_ready(barrier) -> int:
+    # 1 lần encode để cấp phát xong bộ nhớ, rồi chờ đủ mọi worker => mỗi worker nhận đúng 1 task
+    _worker_model.encode(["Điều 1. Phạm vi điều chỉnh"], batch_size=1, show_progress_bar=False)
+    barrier.wait()
+    return os.getpid()
+
+
+def default_threads_per_worker(workers: int) -> int:
+    return max((os.cpu_count() or 1) // max(workers, 1), 1)
+
+
+class EncodePool:
+    def __init__(self, model_id: str, workers: int, threads_per_worker: int = 0, backend: Optional[str] = None):
+        from .config import settings
+
+        self.model_id = model_id
+        self.backend = backend or settings.EMBED_BACKEND
+        self.workers = max(int(workers), 1)
+        self.threads_per_worker = int(threads_per_worker) or default_threads_per_worker(self.workers)
+        if self.backend == "onnx":
+            # export 1 lần ở process cha, không để N worker cùng export vào 1 thư mục
+            from .onnx_backend import ensure_onnx
+
+            ensure_onnx(model_id)
+
+        ctx = mp.get_context("spawn")
+        self._pool = ctx.Pool(
+            processes=self.workers,
+            initializer=_init_worker,
+            initargs=(model_id, self.threads_per_worker, self.backend),
+        )
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # shard liên tiếp, mỗi worker ~1 shard; map() giữ đúng thứ tự shard
+        shard = max(math.ceil(len(texts) / self.workers), 1)
+        parts = [(texts[i : i + shard], batch_size) for i in range(0, len(texts), shard)]
+        out = self._pool.map(_encode_shard, parts)
+        return np.concatenate(out, axis=0)
+
+    def wait_ready(self, timeout: float = 600.0) -> int:
+        """Chờ mọi worker load xong model (+ encode thử 1 câu). Trả về số worker đã sẵn sàng."""
+        with mp.get_context("spawn").Manager() as manager:
+            barrier = manager.Barrier(self.workers, timeout=timeout)
+            tasks = [self._pool.apply_async(_wait_ready, (barrier,)) for _ in range(self.workers)]
+            return len({t.get(timeout) for t in tasks})
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "EncodePool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def compare_speed(
+    texts: Sequence[str],
+    model_id: str,
+    workers: int,
+    threads_per_worker: int = 0,
+    batch_size: int = 32,
+    single_model: Optional[Any] = None,
+) -> Dict[str, float]:
+    """
+    Đo tốc độ encode 1 process (model dùng chung) vs pool trên cùng 1 mẫu text.
+    Thời gian load model của pool KHÔNG tính (chỉ tính encode).
+    """
+    texts = list(texts)
+    if single_model is None:
+        from .resources import get_embedder
+
+        single_model = get_embedder(model_id, "cpu")
+
+    t = time.time()
+    single_model.encode(texts, batch_size=batch_size, show_progress_bar=False, normalize_embeddings=True)
+    single_s = time.time() - t
+
+    with EncodePool(model_id, workers, threads_per_worker) as pool:
+        pool.wait_ready()  # không tính thời gian load model của từng worker
+        t = time.time()
+        pool.encode(texts, batch_size=batch_size)
+        pool_s = time.time() - t
+
+    return {
+        "n_texts": len(texts),
+        "workers": max(int(workers), 1),
+        "threads_per_worker": int(threads_per_worker) or default_threads_per_worker(workers),
+        "single_s": round(single_s, 3),
+        "pool_s": round(pool_s, 3),
+        "speedup": round(single_s / pool_s, 2) if pool_s > 0 else 0.0,
+    }
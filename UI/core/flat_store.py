@@ -0,0 +1,350 @@
+# UI/core/flat_store.py
+"""
+Backend exact search (VECTOR_BACKEND=numpy).
+
+Vector (đã L2 normalize) nằm trong 1 file .npy mở bằng mmap, top-k = argpartition
+trên tích vô hướng. Corpus cỡ vài trăm nghìn chunk thì nhanh hơn HNSW + SQLite
+của Chroma, và recall tuyệt đối (không xấp xỉ).
+
+Dữ liệu export từ collection Chroma mà alias đang trỏ tới, lần đầu hoặc khi
+generation đổi (run embedding xong / rollback), vào <CHROMA_DIR>/flat/<collection>/:
+  vectors.npy    (n, dim) float32
+  rows.jsonl     {"id", "doc", "meta"} theo đúng thứ tự hàng của vectors.npy
+  manifest.json  {"collection", "generation", "count", "dim"}
+distance trả về = 2 - 2*cos (= L2 bình phương, cùng thang với Chroma mặc định).
+
+VECTOR_QUANT=float16|int8: quét lượt đầu trên bản nén trong RAM, lấy top_k*VECTOR_RESCORE
+ứng viên rồi re-score bằng float32 đọc lười từ mmap (core/quant.py).
+VECTOR_INDEX=ivf: chỉ quét các chunk trong nprobe list gần nhất (core/ivf.py),
+nprobe chỉnh theo từng query: store.query(q, top_k, nprobe=32).
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from collections.abc import Sequence as SequenceABC
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .aliases import alias_file_stamp, alias_generation, resolve_alias
+from .config import abs_path, settings
+from .ivf import IVFLists, load_or_build
+from .quant import QUANT_MODES, approx_scores, load_codes, memory_report, rescore
+from .vectorstore import BaseStore, BatchHits
+
+_DIR_NAME = "flat"
+# số phần tử tối đa của ma trận score (câu hỏi x chunk) mỗi lượt, ~128 MB float32
+_MAX_SCORE_ELEMS = 32 * 1024 * 1024
+
+
+def flat_dir(chroma_dir: str | Path, collection: str) -> Path:
+    return abs_path(chroma_dir) / _DIR_NAME / collection
+
+
+def read_manifest(chroma_dir: str | Path, collection: str) -> Dict[str, Any]:
+    try:
+        return json.loads((flat_dir(chroma_dir, collection) / "manifest.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def drop_flat(chroma_dir: str | Path, collection: str) -> None:
+    """Xoá bản export của collection (collection đã bị xoá khỏi Chroma)."""
+    shutil.rmtree(flat_dir(chroma_dir, collection), ignore_errors=True)
+
+
+def export_flat(client, chroma_dir: str | Path, collection: str, generation: str, page_size: int = 2000) -> Dict[str, Any]:
+    """
+    Đọc id/vector/document/metadata của collection theo trang, ghi ra thư mục tạm
+    rồi đổi tên sang flat/<collection> (reader đang mmap bản cũ vẫn đọc được).
+    """
+    col = client.get_or_create_collection(name=collection)
+    total = int(col.count())
+    out = flat_dir(chroma_dir, collection)
+    tmp = out.with_name(f".{collection}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    vecs: Optional[np.ndarray] = None
+    n = 0
+    with open(tmp / "rows.jsonl", "w", encoding="utf-8") as f:
+        while n < total:
+            res = col.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=n)
+            ids = (res.get("ids") or [])[: total - n]
+            if not ids:
+                break
+            emb = np.asarray(res.get("embeddings"), dtype=np.float32)[: len(ids)]
+            if vecs is None:
+                vecs = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32, shape=(total, emb.shape[1]))
+            vecs[n : n + len(ids)] = emb
+            docs = res.get("documents") or [""] * len(ids)
+            metas = res.get("metadatas") or [{}] * len(ids)
+            for cid, doc, meta in zip(ids, docs, metas):
+                f.write(json.dumps({"id": cid, "doc": doc or "", "meta": meta or {}}, ensure_ascii=False) + "\n")
+            n += len(ids)
+
+    dim = int(vecs.shape[1]) if vecs is not None else 0
+    if vecs is None:
+        np.save(tmp / "vectors.npy", np.zeros((0, 0), dtype=np.float32))
+    else:
+        vecs.flush()
+        del vecs
+        if n < total:
+            # collection bị xoá bớt trong lúc export => cắt phần chưa ghi
+            full = np.load(tmp / "vectors.npy", mmap_mode="r")
+            np.save(tmp / "vectors.part.npy", np.asarray(full[:n]))
+            del full
+            os.replace(tmp / "vectors.part.npy", tmp / "vectors.npy")
+
+    manifest = {"collection": collection, "generation": generation, "count": n, "dim": dim, "exported_at": time.time()}
+    (tmp / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    old = out.with_name(f".{collection}.{os.getpid()}.old")
+    if out.exists():
+        os.replace(out, old)
+    os.replace(tmp, out)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+class BlobColumn(SequenceABC):
+    """Cột chuỗi (id/doc/meta) trên mmap: blob utf-8 + offset, decode lười từng phần tử."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, decode: Callable[[str], Any] = str):
+        self._blob = blob
+        self._off = offsets
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return len(self._off) - 1
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        a, b = int(self._off[i]), int(self._off[i + 1])
+        return self._decode(bytes(self._blob[a:b]).decode("utf-8"))
+
+
+def write_blob(d: Path, name: str, values: Iterable[str], n: int) -> None:
+    """Ghi <name>.bin (chuỗi utf-8 nối liền) + <name>.off.npy (n+1,) int64 cho BlobColumn."""
+    off = np.zeros(n + 1, dtype=np.int64)
+    pos = 0
+    with open(d / f"{name}.bin", "wb") as f:
+        for i, v in enumerate(values):
+            b = v.encode("utf-8")
+            f.write(b)
+            pos += len(b)
+            off[i + 1] = pos
+    np.save(d / f"{name}.off.npy", off)
+
+
+def read_blob(d: Path, name: str, decode: Callable[[str], Any] = str) -> BlobColumn:
+    path = d / f"{name}.bin"
+    # np.memmap không mở được file rỗng
+    blob = np.memmap(path, dtype=np.uint8, mode="r") if path.stat().st_size else np.zeros(0, dtype=np.uint8)
+    return BlobColumn(blob, np.load(d / f"{name}.off.npy", mmap_mode="r"), decode)
+
+
+@dataclass
+class FlatData:
+    """Dữ liệu 1 bản export đã nạp; đổi cả cụm 1 lượt khi alias đổi."""
+
+    vecs: np.ndarray = field(default_factory=lambda: np.zeros((0, 0), dtype=np.float32))  # float32 mmap
+    codes: Optional[np.ndarray] = None  # bản nén trong RAM (VECTOR_QUANT)
+    scale: Optional[np.ndarray] = None
+    ivf: Optional[IVFLists] = None  # VECTOR_INDEX=ivf
+    ids: List[str] = field(default_factory=list)
+    docs: List[str] = field(default_factory=list)
+    metas: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class FlatStore(BaseStore):
+    def __init__(
+        self,
+        persist_dir: str | Path,
+        collection_name: str,
+        model_id: Optional[str] = None,
+        device: Optional[str] = None,
+        quant: Optional[str] = None,
+        rescore_factor: Optional[int] = None,
+        index: Optional[str] = None,
+        nprobe: Optional[int] = None,
+    ):
+        super().__init__(persist_dir, collection_name, model_id, device)
+        self.index = (index or settings.VECTOR_INDEX).lower()
+        if self.index not in ("flat", "ivf"):
+            raise ValueError(f"VECTOR_INDEX phải là flat hoặc ivf, nhận {self.index!r}")
+        self.nprobe = max(int(nprobe or settings.IVF_NPROBE), 1)
+        self.quant = (quant or settings.VECTOR_QUANT).lower()
+        if self.quant not in QUANT_MODES:
+            raise ValueError(f"VECTOR_QUANT phải là một trong {QUANT_MODES}, nhận {self.quant!r}")
+        self.rescore_factor = max(int(rescore_factor or settings.VECTOR_RESCORE), 1)
+        self._client = None
+        self._lock = threading.Lock()
+        self._data = FlatData()
+        self._resolve()
+
+    def _chroma(self):
+        # chỉ cần Chroma khi phải export lại
+        if self._client is None:
+            import chromadb
+
+            self._client = chromadb.PersistentClient(path=str(self.persist_dir))
+        return self._client
+
+    def _resolve(self) -> FlatData:
+        """File alias đổi => nạp bản export của collection mới (export lại nếu cũ)."""
+        stamp = alias_file_stamp(self.persist_dir)
+        if stamp == self._alias_stamp:
+            return self._data
+        with self._lock:
+            if stamp == self._alias_stamp:
+                return self._data
+            name, version = resolve_alias(self.persist_dir, self.alias)
+            generation = alias_generation(self.persist_dir, self.alias)
+            if read_manifest(self.persist_dir, name).get("generation") != generation:
+                export_flat(self._chroma(), self.persist_dir, name, generation)
+            # gán 1 lượt: query đang chạy vẫn cầm bản cũ trọn vẹn
+            self._data = self._load(name)
+            self.collection_name, self.version, self.generation = name, version, generation
+            self._alias_stamp = stamp
+        return self._data
+
+    def _load(self, name: str) -> FlatData:
+        d = flat_dir(self.persist_dir, name)
+        data = FlatData()
+        with open(d / "rows.jsonl", "r", encoding="utf-8") as f:
+            for line in f:
+                r = json.loads(line)
+                data.ids.append(r["id"])
+                data.docs.append(r["doc"])
+                data.metas.append(r["meta"])
+        if data.ids:
+            data.vecs = np.load(d / "vectors.npy", mmap_mode="r")
+            if self.quant != "none":
+                data.codes, data.scale = load_codes(d, data.vecs, self.quant)
+            if self.index == "ivf":
+                data.ivf = load_or_build(d, data.vecs, self.persist_dir, self.alias, settings.IVF_LISTS)
+        return data
+
+    def count(self) -> int:
+        return len(self._resolve().ids)
+
+    @staticmethod
+    def _topk(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(vị trí, điểm) top-k theo từng hàng, điểm giảm dần."""
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def _scan(
+        self,
+        data: FlatData,
+        q: np.ndarray,
+        k: int,
+        exact: bool = False,
+        rescore_factor: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (hàng corpus, cos) cho khối câu hỏi q. exact=True => quét hết bằng float32."""
+        if exact:
+            return self._topk(q @ data.vecs.T, k)
+        c = min(k * (rescore_factor or self.rescore_factor), len(data.ids))
+        if data.ivf is not None:
+            return self._scan_ivf(data, q, k, c, nprobe or self.nprobe)
+        if data.codes is None:
+            return self._topk(q @ data.vecs.T, k)
+        cand, _ = self._topk(approx_scores(q, data.codes, data.scale), c)
+        top, top_scores = self._topk(rescore(q, data.vecs, cand), k)
+        return np.take_along_axis(cand, top, axis=1), top_scores
+
+    def _scan_ivf(self, data: FlatData, q: np.ndarray, k: int, c: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        # mỗi câu hỏi có tập list riêng => lặp từng câu, chỉ chạm các hàng trong list được probe
+        tops = np.empty((len(q), k), dtype=np.int64)
+        scores = np.empty((len(q), k), dtype=np.float32)
+        for j in range(len(q)):
+            qj = q[j : j + 1]
+            rows = np.sort(data.ivf.probe(q[j], nprobe, min_rows=c if data.codes is not None else k))
+            if data.codes is not None:
+                part, _ = self._topk(approx_scores(qj, data.codes[rows], data.scale), min(c, len(rows)))
+                cand = rows[part]
+                top, tops_j = self._topk(rescore(qj, data.vecs, cand), k)
+                tops[j], scores[j] = cand[0][top[0]], tops_j[0]
+            else:
+                top, tops_j = self._topk(qj @ np.asarray(data.vecs[rows], dtype=np.float32).T, k)
+                tops[j], scores[j] = rows[top[0]], tops_j[0]
+        return tops, scores
+
+    def _search(self, q_emb: np.ndarray, top_k: int, nprobe: Optional[int] = None) -> BatchHits:
+        data = self._data
+        q = np.asarray(q_emb, dtype=np.float32)
+        m, n = len(q), len(data.ids)
+        k = min(int(top_k), n)
+        out = BatchHits([], [], [], [], np.full((m, top_k), np.inf, dtype=np.float32))
+        if k == 0:
+            out.ids, out.docs, out.metas = [[] for _ in range(m)], [[] for _ in range(m)], [[] for _ in range(m)]
+            return out
+
+        step = max(1, _MAX_SCORE_ELEMS // max(n, 1))
+        for a in range(0, m, step):
+            top, top_scores = self._scan(data, q[a : a + step], k, nprobe=nprobe)
+            out.distances[a : a + len(top), :k] = 2.0 - 2.0 * top_scores
+            for row in top.tolist():
+                out.ids.append([data.ids[i] for i in row])
+                out.docs.append([data.docs[i] for i in row])
+                out.metas.append([data.metas[i] for i in row])
+        return out
+
+    def quant_report(self, questions: Sequence[str], k: int = 5) -> Dict[str, Any]:
+        """
+        Bộ nhớ tiết kiệm được + recall@k của bản nén so với exact float32 trên các câu hỏi
+        (recall = tỉ lệ top-k exact có trong top-k trả về), có và không re-score.
+        """
+        data = self._resolve()
+        n = len(data.ids)
+        out: Dict[str, Any] = {"quant": self.quant, "rescore_factor": self.rescore_factor, "chunks": n}
+        out.update(memory_report(data.vecs, data.codes))
+        k = min(int(k), n)
+        if not questions or k == 0:
+            return out
+        q = self.embed_queries(questions)
+        exact, _ = self._scan(data, q, k, exact=True)
+
+        def _recall(top: np.ndarray) -> float:
+            return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(exact.tolist(), top.tolist())]))
+
+        out[f"recall@{k}"] = round(_recall(self._scan(data, q, k)[0]), 4)
+        # rescore_factor=1: ứng viên = đúng top-k của bản nén => recall của riêng bản nén
+        out[f"recall@{k}_no_rescore"] = round(_recall(self._scan(data, q, k, rescore_factor=1)[0]), 4)
+        return out
+
+    def ivf_stats(self) -> Dict[str, Any]:
+        ivf = self._resolve().ivf
+        return ivf.stats() if ivf is not None else {}
+
+    def ivf_report(self, questions: Sequence[str], k: int = 5, nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32, 64)) -> List[Dict[str, Any]]:
+        """Recall@k (so với exact float32) và ms/câu theo nprobe — chọn IVF_NPROBE."""
+        data = self._resolve()
+        k = min(int(k), len(data.ids))
+        if data.ivf is None or not questions or k == 0:
+            return []
+        q = self.embed_queries(questions)
+        t = time.perf_counter()
+        exact, _ = self._scan(data, q, k, exact=True)
+        rows = [{"nprobe": "exact", f"recall@{k}": 1.0, "ms_per_query": round((time.perf_counter() - t) * 1000 / len(q), 3)}]
+        for p in nprobes:
+            if p > data.ivf.n_lists:
+                break
+            t = time.perf_counter()
+            top, _ = self._scan(data, q, k, nprobe=p)
+            ms = (time.perf_counter() - t) * 1000 / len(q)
+            recall = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(exact.tolist(), top.tolist())]))
+            rows.append({"nprobe": p, f"recall@{k}": round(recall, 4), "ms_per_query": round(ms, 3)})
+        return rows
@@ -0,0 +1,172 @@
+# UI/core/ivf.py
+"""
+Index IVF (inverted file) bằng NumPy cho FlatStore (VECTOR_INDEX=ivf).
+
+- Train: spherical k-means trên mẫu vector => n_lists centroid (đã normalize).
+- Mỗi chunk thuộc list có centroid gần nhất; lúc query chỉ quét các chunk trong
+  nprobe list gần câu hỏi nhất (nprobe lớn => recall cao hơn, chậm hơn; chỉnh được
+  theo từng query).
+
+Build tăng dần: centroid lưu theo alias (<CHROMA_DIR>/flat/<alias>.ivf.npy + .json)
+và dùng lại cho mọi bản export sau (run embedding mới / version mới), mỗi lần chỉ
+phải gán list cho vector (1 phép nhân với centroid), không chạy lại k-means.
+Chỉ train lại khi chưa có, đổi dim / n_lists, hoặc corpus đã lớn gấp đôi lúc train.
+
+save_lists / load_lists: ghi sẵn centroid + order + offsets (ivf.*.npy) để process khác
+mmap thẳng, không gán / argsort lại (segment dùng chung, snapshot).
+"""
+from __future__ import annotations
+
+import json
+import math
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .config import abs_path
+
+_BLOCK = 16384
+_RETRAIN_GROWTH = 2.0
+
+
+def auto_lists(n: int) -> int:
+    """Số list mặc định ~ 4*sqrt(n) (mỗi list vài trăm chunk với corpus vừa)."""
+    return max(1, min(n, int(4 * math.sqrt(max(n, 1)))))
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norm > 0, norm, 1.0)
+
+
+def assign(vecs: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """List gần nhất (int32) cho từng hàng của vecs, tính theo khối."""
+    out = np.empty(vecs.shape[0], dtype=np.int32)
+    for a in range(0, vecs.shape[0], _BLOCK):
+        block = np.asarray(vecs[a : a + _BLOCK], dtype=np.float32)
+        out[a : a + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(vecs: np.ndarray, n_lists: int, iters: int = 20, sample_per_list: int = 256, seed: int = 0) -> np.ndarray:
+    """Spherical k-means trên tối đa n_lists*sample_per_list vector lấy ngẫu nhiên."""
+    rng = np.random.default_rng(seed)
+    n = vecs.shape[0]
+    take = min(n, n_lists * sample_per_list)
+    idx = np.sort(rng.choice(n, size=take, replace=False))
+    x = np.asarray(vecs[idx], dtype=np.float32)
+    centroids = x[rng.choice(take, size=n_lists, replace=False)].copy()
+    for _ in range(iters):
+        labels = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            # list rỗng => lấy điểm ngẫu nhiên làm centroid mới
+            sums[empty] = x[rng.choice(take, size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums).astype(np.float32)
+    return centroids
+
+
+@dataclass
+class IVFLists:
+    centroids: np.ndarray  # (n_lists, dim) float32
+    order: np.ndarray  # hàng corpus, xếp theo list
+    offsets: np.ndarray  # (n_lists + 1,) list l = order[offsets[l]:offsets[l+1]]
+
+    @classmethod
+    def from_assign(cls, centroids: np.ndarray, labels: np.ndarray) -> "IVFLists":
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(centroids)), out=offsets[1:])
+        return cls(centroids, order, offsets)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def probe(self, q: np.ndarray, nprobe: int, min_rows: int = 0) -> np.ndarray:
+        """Hàng corpus trong nprobe list gần q nhất; probe thêm list nếu chưa đủ min_rows."""
+        ranked = np.argsort(-(self.centroids @ q))
+        sizes = self.offsets[ranked + 1] - self.offsets[ranked]
+        p = max(1, min(int(nprobe), self.n_lists))
+        if min_rows:
+            # ít nhất đủ min_rows ứng viên (list nhỏ / nprobe quá thấp)
+            p = max(p, int(np.searchsorted(np.cumsum(sizes), min_rows)) + 1)
+        lists = ranked[:p]
+        return np.concatenate([self.order[self.offsets[l] : self.offsets[l + 1]] for l in lists])
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = np.diff(self.offsets)
+        return {
+            "n_lists": self.n_lists,
+            "list_min": int(sizes.min()) if len(sizes) else 0,
+            "list_mean": round(float(sizes.mean()), 1) if len(sizes) else 0.0,
+            "list_max": int(sizes.max()) if len(sizes) else 0,
+        }
+
+
+def _centroid_files(chroma_dir: str | Path, alias: str) -> tuple:
+    root = abs_path(chroma_dir) / "flat"
+    return root / f"{alias}.ivf.npy", root / f"{alias}.ivf.json"
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def load_or_build(export_dir: Path, vecs: np.ndarray, chroma_dir: str | Path, alias: str, n_lists: int = 0) -> IVFLists:
+    """
+    IVF cho 1 bản export (flat/<collection>/): dùng centroid chung của alias (train nếu
+    cần), gán list cho vecs và lưu ivf.assign.npy cạnh vectors.npy để lần sau nạp thẳng.
+    """
+    n, dim = vecs.shape
+    want = int(n_lists) or auto_lists(n)
+    c_file, meta_file = _centroid_files(chroma_dir, alias)
+    meta = _read_json(meta_file)
+    centroids: Optional[np.ndarray] = None
+    if c_file.exists() and meta.get("dim") == dim and (not n_lists or meta.get("n_lists") == want):
+        if n <= _RETRAIN_GROWTH * max(int(meta.get("trained_on") or 0), 1):
+            centroids = np.load(c_file)
+    if centroids is None:
+        centroids = train_centroids(vecs, min(want, n))
+        meta = {"dim": dim, "n_lists": int(len(centroids)), "trained_on": n, "trained_at": time.time()}
+        c_file.parent.mkdir(parents=True, exist_ok=True)
+        np.save(c_file.with_suffix(".tmp.npy"), centroids)
+        c_file.with_suffix(".tmp.npy").replace(c_file)
+        meta_file.write_text(json.dumps(meta), encoding="utf-8")
+
+    assign_file = export_dir / "ivf.assign.npy"
+    assign_meta_file = export_dir / "ivf.json"
+    if assign_file.exists() and _read_json(assign_meta_file).get("trained_at") == meta.get("trained_at"):
+        labels = np.load(assign_file)
+    else:
+        labels = assign(vecs, centroids)
+        np.save(assign_file, labels)
+        assign_meta_file.write_text(json.dumps({"trained_at": meta.get("trained_at")}), encoding="utf-8")
+    return IVFLists.from_assign(centroids, labels)
+
+
+_LIST_FILES = ("centroids", "order", "offsets")
+
+
+def save_lists(d: Path, lists: IVFLists) -> None:
+    """Ghi ivf.centroids.npy / ivf.order.npy / ivf.offsets.npy vào d."""
+    # offsets ghi sau cùng: có ivf.offsets.npy => đủ bộ
+    for name in _LIST_FILES:
+        tmp = d / f"ivf.{name}.tmp.npy"
+        np.save(tmp, getattr(lists, name))
+        tmp.replace(d / f"ivf.{name}.npy")
+
+
+def load_lists(d: Path, mmap: bool = True) -> IVFLists:
+    """IVFLists từ file save_lists, chỉ đọc (mmap=True: order/offsets không chiếm RAM riêng)."""
+    mode = "r" if mmap else None
+    return IVFLists(*(np.load(d / f"ivf.{name}.npy", mmap_mode=mode) for name in _LIST_FILES))
@@ -0,0 +1,245 @@
+# UI/core/onnx_backend.py
+"""
+Backend ONNX Runtime cho embedder (CPU).
+
+- export_onnx(): export transformer của SentenceTransformer ra ONNX,
+  quantize dynamic int8 (onnxruntime.quantization), lưu kèm tokenizer + meta
+  (pooling, max_seq_length, do_lower_case) vào <ONNX_DIR>/<model_id>/.
+- OnnxEmbedder: có .encode(...) / .tokenizer / .max_seq_length giống
+  SentenceTransformer nên dùng thay thế được trong registry + run_embedding.
+  Pooling + L2 normalize làm bằng NumPy => vector tương thích collection cũ.
+- parity_check(): so cosine giữa vector torch và ONNX + đo speedup.
+
+Cần: pip install onnxruntime onnx
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .config import settings, abs_path
+
+
+_FP32_NAME = "model.onnx"
+_INT8_NAME = "model.int8.onnx"
+_META_NAME = "embedder_meta.json"
+# pooling _pool() làm được bằng NumPy (tên theo Pooling.get_pooling_mode_str của sentence-transformers)
+POOLING_MODES = ("mean", "cls", "max")
+
+
+def onnx_model_dir(model_id: str, onnx_dir: Optional[str] = None) -> Path:
+    return abs_path(onnx_dir or settings.ONNX_DIR) / model_id.replace("/", "__")
+
+
+def _require_ort():
+    try:
+        import onnxruntime as ort  # type: ignore
+    except Exception as e:
+        raise RuntimeError("Thiếu thư viện onnxruntime. Cài: pip install onnxruntime onnx") from e
+    return ort
+
+
+def _check_pooling(pooling: str, model_id: str) -> str:
+    if pooling not in POOLING_MODES:
+        raise ValueError(
+            f"Model {model_id} dùng pooling {pooling!r}, backend ONNX chỉ hỗ trợ {POOLING_MODES}. "
+            "Dùng EMBED_BACKEND=torch cho model này."
+        )
+    return pooling
+
+
+def export_onnx(model_id: str, onnx_dir: Optional[str] = None, quantize: bool = True) -> Path:
+    """
+    Export + (tuỳ chọn) quantize int8. Trả về thư mục chứa model ONNX.
+    Ghi vào thư mục tạm rồi rename => process khác không bao giờ load phải bản ghi dở.
+    """
+    import torch  # type: ignore
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+    final = onnx_model_dir(model_id, onnx_dir)
+    final.parent.mkdir(parents=True, exist_ok=True)
+    out = final.with_name(f"{final.name}.{os.getpid()}.tmp")
+    shutil.rmtree(out, ignore_errors=True)
+    out.mkdir()
+
+    st_model = SentenceTransformer(model_id, device="cpu")
+    transformer = st_model[0]
+    pooling = _check_pooling(st_model[1].get_pooling_mode_str() if len(st_model) > 1 else "mean", model_id)
+    # sau pooling chỉ được có Normalize (Dense ... đổi vector, ONNX không export phần đó)
+    extra = [type(m).__name__ for m in list(st_model)[2:] if type(m).__name__ != "Normalize"]
+    if extra:
+        raise ValueError(f"Model {model_id} có thêm module {extra} sau pooling, backend ONNX không hỗ trợ")
+
+    class _Wrap(torch.nn.Module):
+        def __init__(self, m):
+            super().__init__()
+            self.m = m
+
+        def forward(self, input_ids, attention_mask):
+            return self.m(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    wrap = _Wrap(transformer.auto_model).eval()
+    dummy = transformer.tokenizer(["Điều 1. Phạm vi điều chỉnh"], return_tensors="pt")
+    fp32_path = out / _FP32_NAME
+    with torch.no_grad():
+        torch.onnx.export(
+            wrap,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            str(fp32_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "seq"},
+                "attention_mask": {0: "batch", 1: "seq"},
+                "last_hidden_state": {0: "batch", 1: "seq"},
+            },
+            opset_version=14,
+        )
+
+    model_file = _FP32_NAME
+    if quantize:
+        _require_ort()
+        from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+        quantize_dynamic(str(fp32_path), str(out / _INT8_NAME), weight_type=QuantType.QInt8)
+        model_file = _INT8_NAME
+
+    transformer.tokenizer.save_pretrained(str(out))
+    meta = {
+        "model_id": model_id,
+        "model_file": model_file,
+        "pooling": pooling,
+        "max_seq_length": int(st_model.max_seq_length),
+        "do_lower_case": bool(getattr(transformer, "do_lower_case", False)),
+        "dim": int(st_model.get_sentence_embedding_dimension()),
+        "quantized": bool(quantize),
+    }
+    (out / _META_NAME).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    shutil.rmtree(final, ignore_errors=True)
+    try:
+        os.replace(out, final)
+    except OSError:
+        # process khác vừa export xong cùng model => dùng bản của nó
+        shutil.rmtree(out, ignore_errors=True)
+        if not (final / _META_NAME).exists():
+            raise
+    return final
+
+
+def ensure_onnx(model_id: str, onnx_dir: Optional[str] = None) -> Path:
+    """Thư mục model ONNX đã export; chưa có thì export (cần torch)."""
+    d = onnx_model_dir(model_id, onnx_dir)
+    if not (d / _META_NAME).exists():
+        export_onnx(model_id, onnx_dir, quantize=settings.ONNX_QUANTIZE)
+    return d
+
+
+class OnnxEmbedder:
+    def __init__(self, model_dir: str | Path, threads: int = 0):
+        ort = _require_ort()
+        from transformers import AutoTokenizer  # type: ignore
+
+        model_dir = Path(model_dir)
+        self.meta: Dict[str, Any] = json.loads((model_dir / _META_NAME).read_text(encoding="utf-8"))
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.max_seq_length = int(self.meta["max_seq_length"])
+        self.pooling = _check_pooling(self.meta.get("pooling", "mean"), self.meta.get("model_id", str(model_dir)))
+        self.do_lower_case = bool(self.meta.get("do_lower_case", False))
+
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            so.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(model_dir / self.meta["model_file"]), so, providers=["CPUExecutionProvider"]
+        )
+
+    @classmethod
+    def load(cls, model_id: str, onnx_dir: Optional[str] = None, threads: int = 0) -> "OnnxEmbedder":
+        """Load model ONNX đã export; chưa có thì export (cần torch) rồi load."""
+        return cls(ensure_onnx(model_id, onnx_dir), threads=threads)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.meta["dim"])
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        m = mask[..., None].astype(np.float32)
+        if self.pooling == "max":
+            return np.where(m > 0, hidden, -1e9).max(axis=1)
+        # mean (pooling khác đã bị chặn ở export / __init__)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+    def encode(
+        self,
+        sentences: Sequence[str] | str,
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False,
+        **_: Any,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts: List[str] = [sentences] if single else list(sentences)  # type: ignore[list-item]
+        if self.do_lower_case:
+            texts = [t.lower() for t in texts]
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # giống SentenceTransformer: sắp theo độ dài để batch ít padding, xong trả lại thứ tự
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for i in range(0, len(texts), max(batch_size, 1)):
+            idx = order[i : i + batch_size]
+            enc = self.tokenizer(
+                [texts[k] for k in idx],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np",
+            )
+            mask = enc["attention_mask"].astype(np.int64)
+            hidden = self.session.run(
+                None, {"input_ids": enc["input_ids"].astype(np.int64), "attention_mask": mask}
+            )[0]
+            out[idx] = self._pool(hidden, mask)
+
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+
+def parity_check(texts: Sequence[str], model_id: str, onnx_dir: Optional[str] = None) -> Dict[str, float]:
+    """So vector ONNX với torch (cosine) + thời gian encode của mỗi backend."""
+    from .resources import get_embedder
+
+    texts = list(texts)
+    torch_model = get_embedder(model_id, "cpu", backend="torch")
+    onnx_model = get_embedder(model_id, "cpu", backend="onnx")
+
+    torch_model.encode(texts[:4], normalize_embeddings=True)  # warm
+    t = time.time()
+    a = np.asarray(torch_model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+    torch_s = time.time() - t
+
+    onnx_model.encode(texts[:4], normalize_embeddings=True)
+    t = time.time()
+    b = onnx_model.encode(texts, normalize_embeddings=True)
+    onnx_s = time.time() - t
+
+    cos = (a * b).sum(axis=1)
+    return {
+        "n_texts": len(texts),
+        "cos_mean": round(float(cos.mean()), 5),
+        "cos_min": round(float(cos.min()), 5),
+        "torch_s": round(torch_s, 3),
+        "onnx_s": round(onnx_s, 3),
+        "speedup": round(torch_s / onnx_s, 2) if onnx_s > 0 else 0.0,
+    }
@@ -0,0 +1,141 @@
+# UI/core/pipeline.py
+"""
+Pipeline 3 tầng cho ingest: chuẩn bị batch -> encode -> ghi Chroma.
+
+- Tầng 1 (thread riêng): duyệt iterator batch (chunking, lọc incremental, ...).
+- Tầng 2 (thread gọi hàm): encode. Chạy ở thread gọi để on_progress vẫn gọi
+  được st.progress (Streamlit chỉ cho cập nhật UI từ script thread).
+- Tầng 3 (thread riêng): upsert vào Chroma (SQLite + HNSW).
+
+Giữa các tầng là queue có giới hạn => backpressure: writer chậm thì encode chờ,
+encode chậm thì tầng chuẩn bị chờ, RAM không phình theo corpus.
+Progress chỉ tính các chunk ĐÃ ghi xong.
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+_DONE = object()
+_POLL_S = 0.2
+
+
+class _Stage(threading.Thread):
+    def __init__(self, name: str, target: Callable[[], None], stop: threading.Event):
+        super().__init__(name=name, daemon=True)
+        self._target_fn = target
+        self._stop_evt = stop
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            self._target_fn()
+        except BaseException as e:  # truyền lỗi về thread chính
+            self.error = e
+            self._stop_evt.set()
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> bool:
+    """put có chờ nhưng bỏ cuộc nếu pipeline đã dừng (tránh deadlock khi tầng sau chết)."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_S)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: "queue.Queue[Any]", stop: threading.Event) -> Any:
+    while True:
+        try:
+            return q.get(timeout=_POLL_S)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+def run_pipeline(
+    batches: Iterable[Any],
+    encode_fn: Callable[[Any], Any],
+    write_fn: Callable[[Any], int],
+    on_written: Optional[Callable[[int], None]] = None,
+    queue_size: int = 2,
+) -> int:
+    """
+    batches   : iterator các batch đã chuẩn bị (chạy ở thread tầng 1)
+    encode_fn : batch -> kết quả encode (chạy ở thread gọi)
+    write_fn  : kết quả encode -> số chunk đã ghi (chạy ở thread tầng 3)
+    on_written: gọi ở thread gọi với số chunk ghi xong (cộng dồn)
+
+    Trả về tổng số chunk đã ghi. Lỗi ở bất kỳ tầng nào sẽ raise lại ở thread gọi.
+    """
+    stop = threading.Event()
+    q_in: "queue.Queue[Any]" = queue.Queue(maxsize=max(queue_size, 1))
+    q_out: "queue.Queue[Any]" = queue.Queue(maxsize=max(queue_size, 1))
+    written: "queue.Queue[int]" = queue.Queue()
+
+    def _produce() -> None:
+        for b in batches:
+            if not _put(q_in, b, stop):
+                return
+        _put(q_in, _DONE, stop)
+
+    def _write() -> None:
+        while True:
+            item = _get(q_out, stop)
+            if item is _DONE:
+                return
+            written.put(int(write_fn(item)))
+
+    producer = _Stage("ingest-prepare", _produce, stop)
+    writer = _Stage("ingest-write", _write, stop)
+    producer.start()
+    writer.start()
+
+    total = 0
+
+    def _drain() -> None:
+        nonlocal total
+        while True:
+            try:
+                n = written.get_nowait()
+            except queue.Empty:
+                return
+            total += n
+            if on_written:
+                on_written(total)
+
+    def _raise_if_failed() -> None:
+        for st in (producer, writer):
+            if st.error is not None:
+                raise st.error
+
+    try:
+        while True:
+            item = _get(q_in, stop)
+            if item is _DONE:
+                break
+            enc = encode_fn(item)
+            if not _put(q_out, enc, stop):
+                break
+            _drain()
+
+        _put(q_out, _DONE, stop)
+        while writer.is_alive():
+            writer.join(timeout=_POLL_S)
+            _drain()
+        _drain()
+        _raise_if_failed()
+    except BaseException:
+        stop.set()
+        _raise_if_failed()
+        raise
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+        writer.join(timeout=5)
+
+    return total
+
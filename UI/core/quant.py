@@ -0,0 +1,82 @@
+# UI/core/quant.py
+"""
+Lượng tử hoá vector cho FlatStore (VECTOR_QUANT):
+- float16: mỗi chiều 2 byte (giảm 50%).
+- int8: scale theo từng chiều (max |v_d| / 127), mỗi chiều 1 byte (giảm 75%).
+
+Bản nén nằm trong RAM để quét lượt đầu; float32 (vectors.npy) vẫn mmap trên đĩa,
+chỉ đọc các hàng ứng viên khi re-score => RAM ~ bản nén, độ chính xác ~ float32.
+File nén được tạo 1 lần cạnh vectors.npy (export lại thì thư mục mới, tạo lại).
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+QUANT_MODES = ("none", "float16", "int8")
+# số hàng corpus đổi sang float32 mỗi lượt khi quét bản nén (~48 MB với dim 768)
+_SCAN_ROWS = 16384
+
+
+def _files(d: Path, mode: str) -> Tuple[Path, Path]:
+    return d / f"vectors.{mode}.npy", d / f"scale.{mode}.npy"
+
+
+def load_codes(d: Path, vecs: np.ndarray, mode: str, mmap: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    (codes, scale theo chiều hoặc None). Chưa có file thì lượng tử hoá từ vecs.
+    mmap=True: không nạp vào RAM riêng (segment dùng chung giữa các process, core/shared_index.py).
+    """
+    codes_f, scale_f = _files(d, mode)
+    if not codes_f.exists():
+        n, dim = vecs.shape
+        if mode == "int8":
+            scale = np.zeros(dim, dtype=np.float32)
+            for a in range(0, n, _SCAN_ROWS):
+                np.maximum(scale, np.abs(vecs[a : a + _SCAN_ROWS]).max(axis=0), out=scale)
+            scale = np.where(scale > 0, scale / 127.0, 1.0).astype(np.float32)
+            np.save(scale_f, scale)
+        codes = np.lib.format.open_memmap(codes_f.with_suffix(".tmp"), mode="w+", dtype=mode, shape=(n, dim))
+        for a in range(0, n, _SCAN_ROWS):
+            block = np.asarray(vecs[a : a + _SCAN_ROWS], dtype=np.float32)
+            if mode == "int8":
+                codes[a : a + len(block)] = np.clip(np.rint(block / scale), -127, 127)
+            else:
+                codes[a : a + len(block)] = block
+        codes.flush()
+        del codes
+        codes_f.with_suffix(".tmp").replace(codes_f)
+    # mặc định nạp hẳn vào RAM: đây là phần được quét mỗi query
+    codes = np.load(codes_f, mmap_mode="r" if mmap else None)
+    scale = np.load(scale_f) if mode == "int8" else None
+    return codes, scale
+
+
+def approx_scores(q: np.ndarray, codes: np.ndarray, scale: Optional[np.ndarray]) -> np.ndarray:
+    """Tích vô hướng xấp xỉ (m, n) của q (m, dim) float32 với bản nén, đổi float32 theo khối."""
+    qs = q * scale if scale is not None else q
+    out = np.empty((len(q), codes.shape[0]), dtype=np.float32)
+    for a in range(0, codes.shape[0], _SCAN_ROWS):
+        out[:, a : a + _SCAN_ROWS] = qs @ codes[a : a + _SCAN_ROWS].astype(np.float32).T
+    return out
+
+
+def rescore(q: np.ndarray, vecs: np.ndarray, cand: np.ndarray) -> np.ndarray:
+    """Điểm float32 chính xác cho ứng viên cand (m, c): chỉ đọc các hàng đó từ mmap."""
+    rows = np.unique(cand)
+    full = np.asarray(vecs[rows], dtype=np.float32)
+    pos = np.searchsorted(rows, cand)
+    return np.einsum("md,mcd->mc", q, full[pos])
+
+
+def memory_report(vecs: np.ndarray, codes: Optional[np.ndarray]) -> dict:
+    full_mb = vecs.shape[0] * vecs.shape[1] * 4 / (1024 * 1024) if vecs.ndim == 2 else 0.0
+    index_mb = codes.nbytes / (1024 * 1024) if codes is not None else full_mb
+    return {
+        "full_mb": round(full_mb, 2),
+        "index_mb": round(index_mb, 2),
+        "saved_mb": round(full_mb - index_mb, 2),
+        "saved_pct": round(1 - index_mb / full_mb, 4) if full_mb else 0.0,
+    }
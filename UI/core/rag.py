@@ -1,13 +1,124 @@
 # UI/core/rag.py
 from __future__ import annotations
-from typing import Any, Dict, List, Tuple
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 from .config import settings
-from .vectorstore import ChromaStore, Hit
+from .embed_cache import normalize_text
+from .resources import get_store
+from .vectorstore import BatchHits, Hit
+
+
+def normalize_question(question: str) -> str:
+    """NFC + gộp khoảng trắng + casefold: "Đăng ký  khai sinh ?" == "đăng ký khai sinh ?"."""
+    return normalize_text(question).casefold()
+
+
+def _approx_bytes(out: Dict[str, Any]) -> int:
+    """Ước lượng RAM của 1 kết quả (chỉ tính text, đủ để theo dõi)."""
+    n = len(out.get("answer") or "")
+    for meta, _ in out.get("hits") or []:
+        n += sum(len(str(k)) + len(str(v)) for k, v in meta.items()) + 8
+    return n * 2  # str tiếng Việt phần lớn 2 byte/ký tự trong CPython
+
+
+class ResultCache:
+    """
+    LRU + TTL cho answer_with_citations, key = (câu hỏi chuẩn hoá, top_k, generation
+    của collection). Run embedding xong / đổi version => generation đổi => key cũ
+    không bao giờ trúng nữa, bị dọn khi LRU đẩy ra hoặc hết TTL.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_s: float = 3600.0):
+        self.max_entries = max(int(max_entries), 0)
+        self.ttl_s = float(ttl_s)
+        self._data: "OrderedDict[Tuple[str, int, str], Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = ""
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, key) -> None:
+        _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+    def get(self, key: Tuple[str, int, str]) -> Optional[Dict[str, Any]]:
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            if key[2] != self._generation:
+                # collection đã đổi => bỏ hết kết quả cũ ngay
+                self._data.clear()
+                self.bytes = 0
+                self._generation = key[2]
+            item = self._data.get(key)
+            if item is None or (self.ttl_s > 0 and time.time() - item[0] > self.ttl_s):
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[2]
+
+    def put(self, key: Tuple[str, int, str], out: Dict[str, Any]) -> None:
+        if self.max_entries <= 0 or key[2] != self._generation:
+            return
+        size = _approx_bytes(out)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.time(), size, out)
+            self.bytes += size
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "approx_mb": round(self.bytes / (1024 * 1024), 3),
+            "generation": self._generation,
+        }
+
+
+_result_cache = ResultCache(settings.RESULT_CACHE_MAX_ENTRIES, settings.RESULT_CACHE_TTL_S)
+
+
+def result_cache_stats() -> Dict[str, Any]:
+    return _result_cache.stats()
+
+
+def clear_result_cache() -> None:
+    _result_cache.clear()
+    get_store(settings.CHROMA_DIR, settings.CHROMA_COLLECTION).semantic_cache.clear()
+
+
+def semantic_cache_stats() -> Dict[str, Any]:
+    """Thống kê cache ngữ nghĩa của store đang phục vụ + các lần trúng gần nhất (để chỉnh threshold)."""
+    sc = get_store(settings.CHROMA_DIR, settings.CHROMA_COLLECTION).semantic_cache
+    return {**sc.stats(), "recent_hits": list(sc.recent_hits)}
 
 
 def retrieve_topk(question: str, top_k: int = 5) -> List[Tuple[dict, float]]:
-    store = ChromaStore(settings.CHROMA_DIR, settings.CHROMA_COLLECTION)
+    store = get_store(settings.CHROMA_DIR, settings.CHROMA_COLLECTION)
     hits: List[Hit] = store.query(question, top_k=top_k)
 
     out: List[Tuple[dict, float]] = []
@@ -19,13 +130,24 @@ def retrieve_topk(question: str, top_k: int = 5) -> List[Tuple[dict, float]]:
     return out
 
 
+def retrieve_many(questions: List[str], top_k: int = 5) -> BatchHits:
+    """Truy hồi cho nhiều câu hỏi 1 lượt (Evaluate, pre-warm, export), kết quả dạng cột."""
+    store = get_store(settings.CHROMA_DIR, settings.CHROMA_COLLECTION)
+    return store.query_many(questions, top_k=top_k)
+
+
 def _format_citation(meta: dict) -> str:
     dieu = meta.get("dieu_ten") or meta.get("dieu") or meta.get("ten") or meta.get("mapc") or ""
     vb = meta.get("vbqppl") or meta.get("vb") or ""
     link = meta.get("vbqppl_link") or meta.get("link") or ""
+    # chunk theo cấu trúc => thêm "Khoản 2 > Điểm a–c" để trích dẫn tới đúng khoản/điểm
+    path = str(meta.get("hierarchy") or "").split(" > ")
+    sub = " > ".join(p for p in path if p.startswith(("Khoản", "Điểm")))
     bits = []
     if dieu:
         bits.append(str(dieu))
+    if sub:
+        bits.append(f"- {sub}")
     if vb:
         bits.append(f"({vb})")
     if link:
@@ -33,7 +155,24 @@ def _format_citation(meta: dict) -> str:
     return " ".join(bits).strip()
 
 
+def _copy_result(out: Dict[str, Any]) -> Dict[str, Any]:
+    # caller được sửa thoải mái, không làm hỏng bản trong cache
+    return {"answer": out["answer"], "hits": [(dict(m), d) for m, d in out["hits"]]}
+
+
 def answer_with_citations(question: str, top_k: int = 5) -> Dict[str, Any]:
+    store = get_store(settings.CHROMA_DIR, settings.CHROMA_COLLECTION)
+    key = (normalize_question(question), int(top_k), store.current_generation())
+    cached = _result_cache.get(key)
+    if cached is not None:
+        return _copy_result(cached)
+
+    out = _answer(question, top_k)
+    _result_cache.put(key, _copy_result(out))
+    return out
+
+
+def _answer(question: str, top_k: int) -> Dict[str, Any]:
     hits = retrieve_topk(question, top_k=top_k)
 
     if not hits:
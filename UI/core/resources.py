@@ -0,0 +1,285 @@
+# UI/core/resources.py
+"""
+Registry tài nguyên dùng chung cho cả process (mọi session Streamlit).
+
+- Embedder (SentenceTransformer / ONNX): load 1 lần cho mỗi (model_id, device, backend).
+- Vector store (ChromaStore / FlatStore theo VECTOR_BACKEND): mở 1 lần cho mỗi (chroma_dir, collection).
+
+Thread-safe: mỗi key có lock riêng nên 2 session hỏi cùng lúc sẽ chờ nhau load,
+không load trùng; còn các key khác nhau vẫn load song song được.
+"""
+from __future__ import annotations
+
+import gc
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings, abs_path
+from .utils import detect_device
+
+
+_registry_lock = threading.Lock()
+_key_locks: Dict[Tuple[str, ...], threading.Lock] = {}
+
+_embedders: Dict[Tuple[str, str, str], Any] = {}
+_stores: Dict[Tuple[str, str], Any] = {}
+_caches: Dict[Tuple[str, str], Any] = {}
+_tokenizers: Dict[str, Tuple[Any, int]] = {}
+
+
+def _lock_for(key: Tuple[str, ...]) -> threading.Lock:
+    with _registry_lock:
+        lk = _key_locks.get(key)
+        if lk is None:
+            lk = threading.Lock()
+            _key_locks[key] = lk
+        return lk
+
+
+def _embedder_key(
+    model_id: Optional[str], device: Optional[str], backend: Optional[str] = None
+) -> Tuple[str, str, str]:
+    model_id = (model_id or settings.EMBED_MODEL_ID).strip()
+    backend = (backend or settings.EMBED_BACKEND).strip().lower()
+    # ONNX Runtime chỉ chạy CPU provider
+    device = "cpu" if backend == "onnx" else detect_device(device or settings.EMBED_DEVICE)
+    return model_id, device, backend
+
+
+def _store_key(chroma_dir: Optional[str], collection: Optional[str]) -> Tuple[str, str]:
+    p = str(abs_path(chroma_dir or settings.CHROMA_DIR))
+    return p, (collection or settings.CHROMA_COLLECTION).strip()
+
+
+# -----------------------
+# Embedder
+# -----------------------
+def get_embedder(model_id: Optional[str] = None, device: Optional[str] = None, backend: Optional[str] = None):
+    """Trả về embedder dùng chung (backend theo EMBED_BACKEND), load lần đầu nếu chưa có."""
+    key = _embedder_key(model_id, device, backend)
+    model = _embedders.get(key)
+    if model is not None:
+        return model
+
+    with _lock_for(("embedder",) + key):
+        model = _embedders.get(key)
+        if model is not None:
+            return model
+
+        if key[2] == "onnx":
+            from .onnx_backend import OnnxEmbedder
+
+            model = OnnxEmbedder.load(key[0])
+            _embedders[key] = model
+            return model
+
+        # Lazy import để tránh load nặng khi chưa dùng
+        try:
+            from sentence_transformers import SentenceTransformer  # type: ignore
+        except Exception as e:
+            raise RuntimeError(
+                "Thiếu thư viện sentence-transformers. Cài: pip install sentence-transformers"
+            ) from e
+
+        model = SentenceTransformer(key[0], device=key[1])
+        _embedders[key] = model
+        return model
+
+
+def release_embedder(
+    model_id: Optional[str] = None, device: Optional[str] = None, backend: Optional[str] = None
+) -> bool:
+    key = _embedder_key(model_id, device, backend)
+    with _lock_for(("embedder",) + key):
+        model = _embedders.pop(key, None)
+    if model is None:
+        return False
+    del model
+    _free_memory()
+    return True
+
+
+def _max_seq_length(model_id: str, tokenizer: Any) -> int:
+    """max_seq_length của SentenceTransformer (sentence_bert_config.json), fallback theo tokenizer."""
+    import json
+    from pathlib import Path
+
+    try:
+        cfg = Path(model_id) / "sentence_bert_config.json"
+        if not cfg.exists():
+            from huggingface_hub import hf_hub_download
+
+            cfg = Path(hf_hub_download(model_id, "sentence_bert_config.json"))
+        return int(json.loads(cfg.read_text(encoding="utf-8"))["max_seq_length"])
+    except Exception:
+        return min(int(getattr(tokenizer, "model_max_length", 512) or 512), 512)
+
+
+def get_tokenizer(model_id: Optional[str] = None) -> Tuple[Any, int]:
+    """
+    (tokenizer, max_seq_length) của model. Nếu embedder đã load thì dùng luôn
+    tokenizer của nó, không thì chỉ load tokenizer (nhẹ, không cần torch model).
+    """
+    model_id = (model_id or settings.EMBED_MODEL_ID).strip()
+    tok = _tokenizers.get(model_id)
+    if tok is not None:
+        return tok
+
+    with _lock_for(("tokenizer", model_id)):
+        tok = _tokenizers.get(model_id)
+        if tok is not None:
+            return tok
+
+        with _registry_lock:
+            loaded = [m for (mid, _, _), m in _embedders.items() if mid == model_id]
+        if loaded:
+            tok = (loaded[0].tokenizer, int(loaded[0].max_seq_length))
+        else:
+            from transformers import AutoTokenizer  # type: ignore
+
+            tokenizer = AutoTokenizer.from_pretrained(model_id)
+            tok = (tokenizer, _max_seq_length(model_id, tokenizer))
+        _tokenizers[model_id] = tok
+        return tok
+
+
+# -----------------------
+# Vector store
+# -----------------------
+def get_store(chroma_dir: Optional[str] = None, collection: Optional[str] = None):
+    """Trả về VectorStore dùng chung cho (chroma_dir, collection); backend theo VECTOR_BACKEND."""
+    key = _store_key(chroma_dir, collection)
+    store = _stores.get(key)
+    if store is not None:
+        return store
+
+    with _lock_for(("store",) + key):
+        store = _stores.get(key)
+        if store is not None:
+            return store
+
+        if settings.VECTOR_BACKEND == "shared":
+            from .shared_index import SharedIndexStore
+
+            store = SharedIndexStore(key[1])
+        elif settings.VECTOR_BACKEND == "snapshot":
+            from .snapshot import SnapshotStore
+
+            store = SnapshotStore(settings.SNAPSHOT_DIR)
+        elif settings.VECTOR_BACKEND == "numpy":
+            from .flat_store import FlatStore
+
+            store = FlatStore(key[0], key[1])
+        else:
+            from .vectorstore import ChromaStore
+
+            store = ChromaStore(key[0], key[1])
+        _stores[key] = store
+        return store
+
+
+def release_store(chroma_dir: Optional[str] = None, collection: Optional[str] = None) -> bool:
+    key = _store_key(chroma_dir, collection)
+    with _lock_for(("store",) + key):
+        store = _stores.pop(key, None)
+    if store is None:
+        return False
+    del store
+    gc.collect()
+    return True
+
+
+# -----------------------
+# Embedding cache
+# -----------------------
+def get_embed_cache(model_id: Optional[str] = None, namespace: str = "docs"):
+    """EmbeddingCache dùng chung cho (model_id, namespace); None nếu tắt cache (EMBED_CACHE_DIR rỗng)."""
+    if not settings.EMBED_CACHE_DIR:
+        return None
+    model_id = (model_id or settings.EMBED_MODEL_ID).strip()
+    if settings.EMBED_BACKEND != "torch":
+        # vector ONNX int8 lệch nhẹ so với torch => cache riêng
+        model_id = f"{model_id}@{settings.EMBED_BACKEND}"
+    key = (model_id, namespace)
+    cache = _caches.get(key)
+    if cache is not None:
+        return cache
+
+    with _lock_for(("cache",) + key):
+        cache = _caches.get(key)
+        if cache is not None:
+            return cache
+
+        from .embed_cache import EmbeddingCache
+
+        cache = EmbeddingCache(
+            settings.EMBED_CACHE_DIR,
+            key[0],
+            namespace=namespace,
+            max_entries=settings.EMBED_CACHE_MAX_ENTRIES,
+            dtype=settings.EMBED_CACHE_DTYPE,
+        )
+        _caches[key] = cache
+        return cache
+
+
+# -----------------------
+# Housekeeping
+# -----------------------
+def release_all() -> None:
+    """Giải phóng toàn bộ embedder + store (vd: khi đổi model / CHROMA_DIR)."""
+    with _registry_lock:
+        keys_e = list(_embedders.keys())
+        keys_s = list(_stores.keys())
+        caches = list(_caches.values())
+    for c in caches:
+        c.flush()
+    for k in keys_s:
+        release_store(*k)
+    for k in keys_e:
+        release_embedder(*k)
+
+
+def release_stale(
+    model_id: Optional[str] = None,
+    device: Optional[str] = None,
+    chroma_dir: Optional[str] = None,
+    collection: Optional[str] = None,
+) -> int:
+    """
+    Chỉ giữ lại tài nguyên khớp cấu hình hiện tại (mặc định: model / collection chatbot trong settings),
+    giải phóng phần còn lại — vd model load tạm khi đo calibrate / speedup / parity ở trang Embedding.
+    Trả về số tài nguyên đã giải phóng.
+    """
+    keep_e = _embedder_key(model_id, device)
+    keep_s = _store_key(chroma_dir, collection)
+    with _registry_lock:
+        stale_e = [k for k in _embedders if k != keep_e]
+        stale_s = [k for k in _stores if k != keep_s]
+
+    n = 0
+    for k in stale_s:
+        n += int(release_store(*k))
+    for k in stale_e:
+        n += int(release_embedder(*k))
+    return n
+
+
+def resource_stats() -> Dict[str, Any]:
+    with _registry_lock:
+        return {
+            "embedders": [f"{m} @ {d} ({b})" for m, d, b in _embedders],
+            "stores": [f"{c} @ {p}" for p, c in _stores],
+            "embed_caches": {f"{m}/{ns}": c.stats() for (m, ns), c in _caches.items()},
+        }
+
+
+def _free_memory() -> None:
+    gc.collect()
+    try:
+        import torch  # type: ignore
+
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
@@ -0,0 +1,167 @@
+# UI/core/semantic_cache.py
+"""
+Cache tầng 2 (sau khi đã có vector câu hỏi): câu hỏi gần nghĩa => dùng lại hits.
+
+"mức phạt vượt đèn đỏ" vs "phạt vượt đèn đỏ bao nhiêu": chuỗi khác nhau nên cache
+exact (core/rag.py) trượt, nhưng vector gần như trùng. Ở đây giữ vector các câu hỏi
+gần đây trong 1 ma trận nhỏ (max_entries x dim, đã L2 normalize), mỗi câu mới chỉ
+tốn 1 phép nhân ma trận - vector; cosine >= threshold => trả hits của câu cũ,
+không query Chroma.
+
+- Đầy thì đẩy slot ít dùng gần đây nhất (LRU theo lần dùng cuối).
+- generation (core/aliases.py) đổi => xoá hết.
+- Mỗi lần trúng được log (logger + recent_hits) để chỉnh threshold;
+  evaluate_thresholds() đo hit rate / recall@k theo threshold trên bộ Evaluate.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    def __init__(self, max_entries: int = 256, threshold: float = 0.95, log_size: int = 200):
+        self.max_entries = max(int(max_entries), 0)
+        self.threshold = float(threshold)
+        self._lock = threading.Lock()
+        self._vecs: Optional[np.ndarray] = None  # (max_entries, dim) float32
+        self._valid = np.zeros(self.max_entries, dtype=bool)
+        self._last_used = np.zeros(self.max_entries, dtype=np.float64)
+        self._top_k = np.zeros(self.max_entries, dtype=np.int32)
+        self._questions: List[str] = [""] * self.max_entries
+        self._results: List[Any] = [None] * self.max_entries
+        self._generation = ""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.recent_hits: deque = deque(maxlen=log_size)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.threshold < 1.0
+
+    def _reset(self, generation: str) -> None:
+        self._valid[:] = False
+        self._results = [None] * self.max_entries
+        self._generation = generation
+
+    def lookup(self, question: str, vec: np.ndarray, top_k: int, generation: str) -> Optional[Tuple[Any, float, str]]:
+        """(kết quả đã cache, cosine, câu hỏi đã cache) nếu có câu đủ gần với top_k >= top_k; None nếu trượt."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if generation != self._generation:
+                self._reset(generation)
+            if self._vecs is None or not self._valid.any():
+                self.misses += 1
+                return None
+            usable = self._valid & (self._top_k >= int(top_k))
+            idx = np.flatnonzero(usable)
+            if idx.size == 0:
+                self.misses += 1
+                return None
+            sims = self._vecs[idx] @ np.asarray(vec, dtype=np.float32)
+            j = int(np.argmax(sims))
+            sim = float(sims[j])
+            if sim < self.threshold:
+                self.misses += 1
+                return None
+            slot = int(idx[j])
+            self._last_used[slot] = time.time()
+            self.hits += 1
+            # đọc trong lock: add() của thread khác có thể ghi đè slot này ngay sau khi nhả lock
+            matched = self._questions[slot]
+            result = self._results[slot]
+            self.recent_hits.append({"at": time.time(), "question": question, "matched": matched, "cosine": round(sim, 4)})
+        log.info("semantic cache hit cos=%.4f: %r ~ %r", sim, question, matched)
+        return result, sim, matched
+
+    def add(self, question: str, vec: np.ndarray, top_k: int, result: Any, generation: str) -> None:
+        if not self.enabled or generation != self._generation:
+            return
+        v = np.asarray(vec, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if self._vecs is None or self._vecs.shape[1] != v.shape[0]:
+                self._vecs = np.zeros((self.max_entries, v.shape[0]), dtype=np.float32)
+                self._valid[:] = False
+            free = np.flatnonzero(~self._valid)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vecs[slot] = v
+            self._valid[slot] = True
+            self._last_used[slot] = time.time()
+            self._top_k[slot] = int(top_k)
+            self._questions[slot] = question
+            self._results[slot] = result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset(self._generation)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": int(self._valid.sum()),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "matrix_mb": round(self._vecs.nbytes / (1024 * 1024), 3) if self._vecs is not None else 0.0,
+        }
+
+
+def evaluate_thresholds(
+    questions: Sequence[str],
+    gold_ids: Sequence[str],
+    vecs: np.ndarray,
+    retrieve_fn: Callable[[str], List[str]],
+    thresholds: Sequence[float] = (0.85, 0.9, 0.92, 0.95, 0.97, 0.99),
+    k: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Mô phỏng cache trên bộ Evaluate (câu hỏi theo thứ tự, cache không giới hạn):
+    câu i trúng nếu cosine với 1 câu trước đó >= threshold, khi đó dùng id của câu đó.
+    retrieve_fn(question) -> list id (source_id) truy hồi thật, không qua cache.
+    Trả về mỗi threshold: hit_rate, recall@k khi có cache, recall@k gốc.
+    """
+    from .eval_metrics import recall_at_k
+
+    n = len(questions)
+    preds = [retrieve_fn(q) for q in questions]
+    base = [recall_at_k(preds[i], str(gold_ids[i]), k) for i in range(n)]
+    v = np.asarray(vecs, dtype=np.float32)
+    sims = v @ v.T
+
+    rows = []
+    for t in thresholds:
+        hit = 0
+        rec = 0.0
+        for i in range(n):
+            pred = preds[i]
+            if i > 0:
+                j = int(np.argmax(sims[i, :i]))
+                if sims[i, j] >= t:
+                    hit += 1
+                    pred = preds[j]
+            rec += recall_at_k(pred, str(gold_ids[i]), k)
+        rows.append(
+            {
+                "threshold": t,
+                "hit_rate": round(hit / n, 4) if n else 0.0,
+                f"recall@{k}": round(rec / n, 4) if n else 0.0,
+                f"recall@{k}_no_cache": round(sum(base) / n, 4) if n else 0.0,
+            }
+        )
+    return rows
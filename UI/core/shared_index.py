@@ -0,0 +1,229 @@
+# UI/core/shared_index.py
+"""
+1 bản index dùng chung cho nhiều worker (Streamlit / API sau load balancer).
+
+Loader (1 process) publish index đang active thành "segment" trong SHARED_INDEX_DIR
+(mặc định /dev/shm => nằm trong RAM dùng chung, không có thì UI/data/shared_index):
+  <root>/<alias>.current.json    trỏ segment đang dùng (đổi bằng os.replace, atomic)
+  <root>/<alias>/seg-<ms>/
+    vectors.npy                  (n, dim) float32
+    ids.bin / ids.off.npy        id utf-8 nối liền + offset (n+1,) int64
+    docs.bin / docs.off.npy      document
+    metas.bin / metas.off.npy    metadata (JSON từng hàng)
+    segment.json                 generation, model_id, count, dim, ...
+  (+ vectors.<quant>.npy nếu bật VECTOR_QUANT,
+     ivf.centroids.npy / ivf.order.npy / ivf.offsets.npy nếu VECTOR_INDEX=ivf)
+
+Worker (VECTOR_BACKEND=shared) mở SharedIndexStore: mmap read-only mọi file, id/doc/meta
+chỉ decode cho các hàng trúng top-k => page của segment dùng chung giữa các process,
+RAM mỗi worker gần như không tăng theo số chunk. Loader publish segment mới thì worker
+tự chuyển ở query sau (os.stat file current), segment cũ bị xoá sau grace.
+
+  python -m core.shared_index publish            # 1 lần
+  python -m core.shared_index publish --watch    # theo dõi alias, publish lại khi đổi
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .config import abs_path, settings
+from .flat_store import FlatData, FlatStore, read_blob, write_blob
+from .ivf import load_lists, load_or_build, save_lists
+from .quant import load_codes
+
+_KEEP_SEGMENTS = 2
+_GRACE_S = 300.0
+
+
+def shared_root() -> Path:
+    if settings.SHARED_INDEX_DIR:
+        return abs_path(settings.SHARED_INDEX_DIR)
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm / "nlp_tracuu_index"
+    return abs_path("UI/data/shared_index")
+
+
+def _pointer(root: Path, alias: str) -> Path:
+    return root / f"{alias}.current.json"
+
+
+def _source_store() -> FlatStore:
+    """Index nguồn để publish: snapshot nếu VECTOR_BACKEND=snapshot, không thì collection Chroma đang active."""
+    if settings.VECTOR_BACKEND == "snapshot":
+        from .snapshot import SnapshotStore
+
+        return SnapshotStore(settings.SNAPSHOT_DIR, quant="none", index="flat")
+    return FlatStore(settings.CHROMA_DIR, settings.CHROMA_COLLECTION, quant="none", index="flat")
+
+
+def publish(source: Optional[FlatStore] = None, root: Optional[Path] = None) -> Dict[str, Any]:
+    """Ghi segment mới từ source rồi trỏ <alias>.current.json sang nó; dọn segment cũ."""
+    source = source or _source_store()
+    data = source._resolve()
+    root = root or shared_root()
+    alias = source.alias
+    n = len(data.ids)
+
+    stamp = int(time.time() * 1000)
+    while (root / alias / f"seg-{stamp}").exists():
+        stamp += 1  # publish 2 lần trong cùng 1 ms
+    seg = f"seg-{stamp}"
+    tmp = root / alias / f".{seg}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    if n:
+        out = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32, shape=data.vecs.shape)
+        for a in range(0, n, 16384):
+            out[a : a + 16384] = data.vecs[a : a + 16384]
+        out.flush()
+        del out
+    else:
+        np.save(tmp / "vectors.npy", np.zeros((0, 0), dtype=np.float32))
+    write_blob(tmp, "ids", (str(x) for x in data.ids), n)
+    write_blob(tmp, "docs", (str(x or "") for x in data.docs), n)
+    write_blob(tmp, "metas", (json.dumps(m or {}, ensure_ascii=False) for m in data.metas), n)
+
+    # bản nén / IVF dựng sẵn ở đây, worker chỉ mmap (không gán list / ghi file vào segment)
+    ivf_lists = 0
+    if n and settings.VECTOR_QUANT != "none":
+        load_codes(tmp, np.load(tmp / "vectors.npy", mmap_mode="r"), settings.VECTOR_QUANT, mmap=True)
+    if n and settings.VECTOR_INDEX == "ivf":
+        # centroid theo alias để ở <root>/flat/, dùng lại cho các lần publish sau
+        lists = load_or_build(tmp, np.load(tmp / "vectors.npy", mmap_mode="r"), root, alias, settings.IVF_LISTS)
+        save_lists(tmp, lists)
+        ivf_lists = lists.n_lists
+        for f in ("ivf.assign.npy", "ivf.json"):
+            (tmp / f).unlink(missing_ok=True)
+
+    meta = {
+        "alias": alias,
+        "collection": source.collection_name,
+        "version": source.version,
+        "generation": source.generation,
+        "model_id": source.model_id,
+        "count": n,
+        "dim": int(data.vecs.shape[1]) if n else 0,
+        "quant": settings.VECTOR_QUANT,
+        "index": settings.VECTOR_INDEX,
+        "ivf_lists": ivf_lists,
+        "published_at": time.time(),
+        "segment": seg,
+    }
+    (tmp / "segment.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, root / alias / seg)
+
+    ptr = _pointer(root, alias)
+    ptr_tmp = ptr.with_name(f"{ptr.name}.{os.getpid()}.tmp")
+    ptr_tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    os.replace(ptr_tmp, ptr)
+    _cleanup(root / alias, keep=seg)
+    return meta
+
+
+def _cleanup(alias_dir: Path, keep: str) -> None:
+    """Xoá segment cũ: giữ _KEEP_SEGMENTS bản mới nhất, bản cũ hơn chỉ xoá sau _GRACE_S."""
+    segs = sorted((p for p in alias_dir.iterdir() if p.is_dir() and p.name.startswith("seg-")), reverse=True)
+    now = time.time()
+    for p in segs[_KEEP_SEGMENTS:]:
+        if p.name != keep and now - p.stat().st_mtime > _GRACE_S:
+            # worker còn mmap thì vẫn đọc được tới khi chuyển segment (POSIX)
+            shutil.rmtree(p, ignore_errors=True)
+
+
+def publish_loop(interval_s: float = 5.0) -> None:
+    """Publish lại mỗi khi generation của nguồn đổi (run embedding xong / rollback)."""
+    source = _source_store()
+    last = None
+    while True:
+        generation = source.current_generation()
+        if generation != last:
+            meta = publish(source)
+            last = generation
+            print(f"[shared-index] published {meta['segment']} ({meta['count']} chunks, {meta['generation']})", flush=True)
+        time.sleep(interval_s)
+
+
+class SharedIndexStore(FlatStore):
+    """
+    VectorStore đọc segment dùng chung (VECTOR_BACKEND=shared), cùng API với ChromaStore.
+    Search giống FlatStore; mọi mảng là mmap read-only của segment.
+    """
+
+    def __init__(self, collection_name: Optional[str] = None, root: Optional[Path] = None, **kw: Any):
+        self.root = root or shared_root()
+        super().__init__(self.root, collection_name or settings.CHROMA_COLLECTION, **kw)
+
+    def _resolve(self) -> FlatData:
+        ptr = _pointer(self.root, self.alias)
+        try:
+            st = os.stat(ptr)
+        except OSError:
+            raise RuntimeError(
+                f"Chưa có index dùng chung cho {self.alias} trong {self.root}. "
+                "Chạy: python -m core.shared_index publish"
+            ) from None
+        stamp = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if stamp == self._alias_stamp:
+            return self._data
+        with self._lock:
+            if stamp == self._alias_stamp:
+                return self._data
+            meta = json.loads(ptr.read_text(encoding="utf-8"))
+            if meta.get("model_id") and meta["model_id"] != self.model_id:
+                raise ValueError(f"Index dùng chung embed bằng {meta['model_id']}, app đang dùng {self.model_id}")
+            self._data = self._attach(self.root / self.alias / meta["segment"], meta)
+            self.collection_name = meta.get("collection") or self.alias
+            self.version = str(meta.get("version") or "")
+            self.generation = f"{meta.get('generation')}|{meta['segment']}"
+            self._alias_stamp = stamp
+        return self._data
+
+    def _attach(self, d: Path, meta: Dict[str, Any]) -> FlatData:
+        data = FlatData()
+        data.ids = read_blob(d, "ids")  # type: ignore[assignment]
+        data.docs = read_blob(d, "docs")  # type: ignore[assignment]
+        data.metas = read_blob(d, "metas", json.loads)  # type: ignore[assignment]
+        if len(data.ids):
+            data.vecs = np.load(d / "vectors.npy", mmap_mode="r")
+            # chỉ dùng bản nén / IVF loader đã dựng sẵn, worker không tự ghi file vào segment
+            if self.quant != "none" and meta.get("quant") == self.quant:
+                data.codes, data.scale = load_codes(d, data.vecs, self.quant, mmap=True)
+            if self.index == "ivf" and meta.get("ivf_lists"):
+                data.ivf = load_lists(d, mmap=True)
+                if data.ivf.n_lists != meta["ivf_lists"]:
+                    raise ValueError(f"Segment {d}: IVF có {data.ivf.n_lists} list, segment.json ghi {meta['ivf_lists']}")
+        return data
+
+    def segment_info(self) -> Dict[str, Any]:
+        self._resolve()
+        return json.loads(_pointer(self.root, self.alias).read_text(encoding="utf-8"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m core.shared_index", description="Publish index dùng chung cho các worker")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("publish", help="publish index đang active thành segment dùng chung")
+    p.add_argument("--watch", action="store_true", help="chạy mãi, publish lại khi alias đổi")
+    p.add_argument("--interval", type=float, default=5.0)
+    args = ap.parse_args(argv)
+
+    if args.watch:
+        publish_loop(args.interval)
+    else:
+        print(json.dumps(publish(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+# UI/core/snapshot.py
+"""
+Snapshot index portable để deploy (khỏi ship cả UI/vector_db hoặc embed lại).
+
+Thư mục snapshot:
+  vectors.npy                 (n, dim) float32, đã L2 normalize
+  ids.bin / ids.off.npy       id utf-8 nối liền + offset (n+1,) theo đúng thứ tự hàng
+  docs.bin / docs.off.npy     document
+  meta.<j>.bin / .off.npy     dạng cột: cột j = meta_keys[j], mỗi hàng 1 giá trị JSON (thiếu => null)
+  (+ vectors.<quant>.npy / ivf.*.npy dựng sẵn lúc export theo VECTOR_QUANT / VECTOR_INDEX)
+  snapshot.json               alias, collection, version, model_id, count, dim, meta_keys,
+                              sha256 từng file + checksum chung
+
+App dùng VECTOR_BACKEND=snapshot + SNAPSHOT_DIR: SnapshotStore mmap mọi file lúc khởi
+động, không mở Chroma, id/doc/meta chỉ decode cho hàng trúng top-k. Thư mục snapshot
+chỉ đọc; bản nén / IVF chưa có sẵn thì dựng vào SNAPSHOT_CACHE_DIR/<checksum>/.
+
+Dòng lệnh (chạy trong thư mục UI):
+  python -m core.snapshot export <out_dir>                  # từ collection đang active
+  python -m core.snapshot verify <snapshot_dir>
+  python -m core.snapshot import <snapshot_dir> [--version V]  # nạp vào Chroma (blue/green)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from collections.abc import Sequence as SequenceABC
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .aliases import activate_version, alias_generation, resolve_alias, versioned_name
+from .config import abs_path, settings
+from .flat_store import BlobColumn, FlatData, FlatStore, read_blob, write_blob
+from .ivf import load_lists, load_or_build, save_lists
+from .quant import load_codes
+
+FORMAT_VERSION = 2
+MANIFEST = "snapshot.json"
+_FILES = ("vectors.npy", "ids.bin", "ids.off.npy", "docs.bin", "docs.off.npy")
+
+
+def _sha256(path: Path, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def _checksum(file_hashes: Dict[str, str]) -> str:
+    return hashlib.sha256("".join(f"{k}:{file_hashes[k]}\n" for k in sorted(file_hashes)).encode()).hexdigest()
+
+
+def read_snapshot_manifest(snapshot_dir: str | Path) -> Dict[str, Any]:
+    return json.loads((abs_path(snapshot_dir) / MANIFEST).read_text(encoding="utf-8"))
+
+
+def export_snapshot(
+    out_dir: str | Path,
+    chroma_dir: Optional[str] = None,
+    alias: Optional[str] = None,
+    model_id: Optional[str] = None,
+    page_size: int = 2000,
+    quant: Optional[str] = None,
+    index: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Ghi collection alias đang trỏ tới thành snapshot (ghi vào thư mục tạm rồi đổi tên).
+    quant / index (mặc định VECTOR_QUANT / VECTOR_INDEX): dựng sẵn bản nén / IVF vào snapshot.
+    """
+    import chromadb
+
+    chroma_dir = chroma_dir or settings.CHROMA_DIR
+    alias = alias or settings.CHROMA_COLLECTION
+    quant = (quant or settings.VECTOR_QUANT).lower()
+    index = (index or settings.VECTOR_INDEX).lower()
+    name, version = resolve_alias(chroma_dir, alias)
+    client = chromadb.PersistentClient(path=str(abs_path(chroma_dir)))
+    col = client.get_collection(name)
+    total = int(col.count())
+
+    out = abs_path(out_dir)
+    tmp = out.with_name(f".{out.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    ids: List[str] = []
+    docs: List[str] = []
+    meta_cols: Dict[str, List[Any]] = {}
+    vecs: Optional[np.ndarray] = None
+    while len(ids) < total:
+        res = col.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=len(ids))
+        page_ids = (res.get("ids") or [])[: total - len(ids)]
+        if not page_ids:
+            break
+        emb = np.asarray(res.get("embeddings"), dtype=np.float32)[: len(page_ids)]
+        if vecs is None:
+            vecs = np.lib.format.open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float32, shape=(total, emb.shape[1]))
+        vecs[len(ids) : len(ids) + len(page_ids)] = emb
+        for i, m in enumerate(res.get("metadatas") or [{}] * len(page_ids)):
+            row = len(ids) + i
+            for key, value in (m or {}).items():
+                meta_cols.setdefault(key, [None] * row).append(value)
+            for col_values in meta_cols.values():
+                if len(col_values) <= row:
+                    col_values.append(None)
+        docs.extend(str(d or "") for d in (res.get("documents") or [""] * len(page_ids)))
+        ids.extend(str(x) for x in page_ids)
+
+    n = len(ids)
+    dim = int(vecs.shape[1]) if vecs is not None else 0
+    if vecs is not None:
+        vecs.flush()
+        del vecs
+        if n < total:
+            # collection bị xoá bớt trong lúc export => cắt phần chưa ghi
+            full = np.load(tmp / "vectors.npy", mmap_mode="r")
+            np.save(tmp / "vectors.part.npy", np.asarray(full[:n]))
+            del full
+            os.replace(tmp / "vectors.part.npy", tmp / "vectors.npy")
+    else:
+        np.save(tmp / "vectors.npy", np.zeros((0, 0), dtype=np.float32))
+    write_blob(tmp, "ids", ids, n)
+    write_blob(tmp, "docs", docs, n)
+    meta_keys = list(meta_cols)
+    for j, key in enumerate(meta_keys):
+        write_blob(tmp, f"meta.{j}", (json.dumps(v, ensure_ascii=False) for v in meta_cols[key]), n)
+
+    # bản nén / IVF dựng ở đây, nằm trong checksum => máy deploy không phải ghi gì
+    ivf_lists = 0
+    if n and quant != "none":
+        load_codes(tmp, np.load(tmp / "vectors.npy", mmap_mode="r"), quant, mmap=True)
+    if n and index == "ivf":
+        lists = load_or_build(tmp, np.load(tmp / "vectors.npy", mmap_mode="r"), chroma_dir, alias, settings.IVF_LISTS)
+        save_lists(tmp, lists)
+        ivf_lists = lists.n_lists
+        for f in ("ivf.assign.npy", "ivf.json"):
+            (tmp / f).unlink(missing_ok=True)
+
+    file_hashes = {p.name: _sha256(p) for p in sorted(tmp.iterdir())}
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "alias": alias,
+        "collection": name,
+        "version": version,
+        "generation": alias_generation(chroma_dir, alias),
+        "model_id": model_id or settings.EMBED_MODEL_ID,
+        "count": n,
+        "dim": dim,
+        "meta_keys": meta_keys,
+        "quant": quant if n else "none",
+        "ivf_lists": ivf_lists,
+        "created_at": time.time(),
+        "files": file_hashes,
+        "checksum": _checksum(file_hashes),
+    }
+    (tmp / MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if out.exists():
+        shutil.rmtree(out)
+    os.replace(tmp, out)
+    return manifest
+
+
+def verify_snapshot(snapshot_dir: str | Path, full: bool = True) -> Dict[str, Any]:
+    """
+    Kiểm checksum mọi file trong manifest; sai => ValueError. full=False bỏ qua
+    vectors*.npy (file lớn nhất) để khởi động nhanh, vẫn kiểm id/doc/meta + kích thước vectors.
+    """
+    d = abs_path(snapshot_dir)
+    manifest = read_snapshot_manifest(d)
+    if int(manifest.get("format_version", 0)) != FORMAT_VERSION:
+        raise ValueError(f"Snapshot {d}: format_version {manifest.get('format_version')} không hỗ trợ")
+    files = manifest.get("files") or {}
+    if _checksum(files) != manifest.get("checksum"):
+        raise ValueError(f"Snapshot {d}: checksum manifest không khớp")
+    missing = [f for f in _FILES if f not in files]
+    if missing:
+        raise ValueError(f"Snapshot {d}: manifest thiếu {', '.join(missing)}")
+    for f, digest in files.items():
+        if f.startswith("vectors.") and not full:
+            continue
+        if _sha256(d / f) != digest:
+            raise ValueError(f"Snapshot {d}: {f} sai checksum")
+    if not full and manifest["count"]:
+        shape = np.load(d / "vectors.npy", mmap_mode="r").shape
+        if tuple(shape) != (manifest["count"], manifest["dim"]):
+            raise ValueError(f"Snapshot {d}: vectors.npy shape {shape} khác manifest")
+    return manifest
+
+
+class MetaColumns(SequenceABC):
+    """metadata dạng cột trên mmap: dựng dict của 1 hàng khi được đọc (bỏ giá trị null)."""
+
+    def __init__(self, columns: Dict[str, BlobColumn], n: int):
+        self._columns = columns
+        self._n = n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        row = {}
+        for key, col in self._columns.items():
+            value = col[i]
+            if value is not None:
+                row[key] = value
+        return row
+
+
+def _load_rows(d: Path, manifest: Dict[str, Any]) -> FlatData:
+    data = FlatData()
+    data.ids = read_blob(d, "ids")  # type: ignore[assignment]
+    data.docs = read_blob(d, "docs")  # type: ignore[assignment]
+    columns = {key: read_blob(d, f"meta.{j}", json.loads) for j, key in enumerate(manifest.get("meta_keys") or [])}
+    data.metas = MetaColumns(columns, len(data.ids))  # type: ignore[assignment]
+    if len(data.ids):
+        data.vecs = np.load(d / "vectors.npy", mmap_mode="r")
+    return data
+
+
+class SnapshotStore(FlatStore):
+    """
+    VectorStore đọc thẳng snapshot (VECTOR_BACKEND=snapshot): dùng lại search của
+    FlatStore (exact / VECTOR_QUANT / IVF), dữ liệu cố định nên không resolve alias.
+    """
+
+    def __init__(self, snapshot_dir: str | Path, model_id: Optional[str] = None, device: Optional[str] = None, **kw: Any):
+        d = abs_path(snapshot_dir)
+        manifest = verify_snapshot(d, full=settings.SNAPSHOT_VERIFY)
+        model_id = model_id or settings.EMBED_MODEL_ID
+        if manifest.get("model_id") and manifest["model_id"] != model_id:
+            raise ValueError(f"Snapshot embed bằng {manifest['model_id']}, app đang dùng {model_id}")
+        self.manifest = manifest
+        super().__init__(d, manifest.get("alias") or d.name, model_id, device, **kw)
+
+    def _resolve(self) -> FlatData:
+        if self._alias_stamp == MANIFEST:
+            return self._data
+        with self._lock:
+            if self._alias_stamp != MANIFEST:
+                data = _load_rows(self.persist_dir, self.manifest)
+                if len(data.ids) and self.quant != "none":
+                    d = self.persist_dir if self.manifest.get("quant") == self.quant else self._cache_dir()
+                    data.codes, data.scale = load_codes(d, data.vecs, self.quant)
+                if len(data.ids) and self.index == "ivf":
+                    data.ivf = self._load_ivf(data.vecs)
+                self._data = data
+                self.collection_name = self.manifest.get("collection") or self.alias
+                self.version = str(self.manifest.get("version") or "")
+                self.generation = f"snapshot:{self.manifest['checksum'][:16]}"
+                self._alias_stamp = MANIFEST
+        return self._data
+
+    def _cache_dir(self) -> Path:
+        """Thư mục ghi được cho bản nén / IVF snapshot không dựng sẵn (theo checksum => không lẫn bản)."""
+        d = abs_path(settings.SNAPSHOT_CACHE_DIR) / self.manifest["checksum"][:16]
+        d.mkdir(parents=True, exist_ok=True)
+        return d
+
+    def _load_ivf(self, vecs: np.ndarray):
+        if self.manifest.get("ivf_lists"):
+            return load_lists(self.persist_dir)
+        d = self._cache_dir()
+        if not (d / "ivf.offsets.npy").exists():
+            save_lists(d, load_or_build(d, vecs, d, self.alias, settings.IVF_LISTS))
+        return load_lists(d)
+
+
+def import_snapshot(
+    snapshot_dir: str | Path,
+    chroma_dir: Optional[str] = None,
+    alias: Optional[str] = None,
+    version: Optional[str] = None,
+    page_size: int = 2000,
+) -> Dict[str, Any]:
+    """Nạp snapshot vào Chroma thành collection `<alias>__v<version>` rồi đổi alias sang đó."""
+    import chromadb
+
+    d = abs_path(snapshot_dir)
+    manifest = verify_snapshot(d, full=True)
+    chroma_dir = chroma_dir or settings.CHROMA_DIR
+    alias = alias or manifest.get("alias") or settings.CHROMA_COLLECTION
+    version = str(version or f"snap{int(time.time())}")
+    target = versioned_name(alias, version)
+
+    data = _load_rows(d, manifest)
+    client = chromadb.PersistentClient(path=str(abs_path(chroma_dir)))
+    col = client.get_or_create_collection(name=target)
+    for a in range(0, len(data.ids), page_size):
+        col.upsert(
+            ids=data.ids[a : a + page_size],
+            embeddings=np.asarray(data.vecs[a : a + page_size]).tolist(),
+            documents=data.docs[a : a + page_size],
+            metadatas=[m or None for m in data.metas[a : a + page_size]],
+        )
+    dropped = activate_version(chroma_dir, alias, target, version, keep=settings.CHROMA_KEEP_VERSIONS)
+    for name in dropped:
+        try:
+            client.delete_collection(name)
+        except Exception:
+            pass  # bản legacy / đã xoá tay
+    return {"collection": target, "version": version, "count": len(data.ids), "dropped_versions": dropped}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m core.snapshot", description="Export / verify / import snapshot index")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export", help="ghi collection đang active thành snapshot")
+    p.add_argument("out_dir")
+    p.add_argument("--chroma-dir", default=None)
+    p.add_argument("--collection", default=None, help="alias (mặc định CHROMA_COLLECTION)")
+    p.add_argument("--quant", default=None, help="dựng sẵn bản nén none|float16|int8 (mặc định VECTOR_QUANT)")
+    p.add_argument("--index", default=None, help="flat|ivf: dựng sẵn IVF (mặc định VECTOR_INDEX)")
+    p = sub.add_parser("verify", help="kiểm checksum snapshot")
+    p.add_argument("snapshot_dir")
+    p = sub.add_parser("import", help="nạp snapshot vào Chroma (blue/green) và đổi alias")
+    p.add_argument("snapshot_dir")
+    p.add_argument("--chroma-dir", default=None)
+    p.add_argument("--collection", default=None)
+    p.add_argument("--version", default=None)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "export":
+        out = export_snapshot(args.out_dir, args.chroma_dir, args.collection, quant=args.quant, index=args.index)
+    elif args.cmd == "verify":
+        out = verify_snapshot(args.snapshot_dir)
+    else:
+        out = import_snapshot(args.snapshot_dir, args.chroma_dir, args.collection, args.version)
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,25 +18,10 @@ def stable_id(*parts: str) -> str:
     return h.hexdigest()
 
 def chunk_text(text: str, chunk_size: int = 1500, chunk_overlap: int = 120) -> List[str]:
-    text = clean_text(text)
-    if not text:
-        return []
-    if chunk_size <= 0:
-        return [text]
+    # dùng chung engine với embedding_runner (core/chunking.py)
+    from .chunking import chunk_text as _chunk
 
-    chunks = []
-    start = 0
-    n = len(text)
-    step = max(1, chunk_size - max(0, chunk_overlap))
-
-    while start < n:
-        end = min(n, start + chunk_size)
-        chunks.append(text[start:end])
-        if end == n:
-            break
-        start += step
-
-    return chunks
+    return _chunk(clean_text(text), chunk_size, max(0, chunk_overlap))
 
 def detect_device(mode: str = "auto") -> str:
     mode = (mode or "auto").lower().strip()
@@ -1,13 +1,22 @@
 # UI/core/vectorstore.py
+"""
+Vector store cho chatbot. rag.py chỉ phụ thuộc VectorStore (Protocol):
+- ChromaStore: HNSW của Chroma (mặc định).
+- FlatStore (core/flat_store.py): exact search trên ma trận float32 mmap, recall tuyệt đối.
+VECTOR_BACKEND=chroma|numpy chọn backend (core/resources.get_store).
+Cả hai resolve alias blue/green và dùng chung embed/cache ngữ nghĩa qua BaseStore.
+"""
 from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Protocol, Sequence
 
-import chromadb
+import numpy as np
 
+from .aliases import alias_file_stamp, alias_generation, resolve_alias
 from .config import settings, abs_path
+from .semantic_cache import SemanticCache
 
 
 @dataclass
@@ -18,70 +27,208 @@ class Hit:
     distance: float
 
 
-class ChromaStore:
-    def __init__(self, persist_dir: str | Path, collection_name: str):
+@dataclass
+class BatchHits:
+    """
+    Kết quả query_many dạng cột (giữ nguyên list Chroma trả về, không tạo Hit / copy meta
+    cho từng kết quả). Hàng i ứng với questions[i]; distances pad inf nếu ít hơn top_k.
+    """
+
+    questions: List[str]
+    ids: List[List[str]]
+    docs: List[List[str]]
+    metas: List[List[Dict[str, Any]]]
+    distances: np.ndarray  # (n_questions, top_k) float32
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def source_ids(self, i: int) -> List[str]:
+        """id gốc (dieu_id) của các kết quả câu i — dùng cho eval_metrics."""
+        return [str((m or {}).get("source_id", cid)) for cid, m in zip(self.ids[i], self.metas[i])]
+
+    def hits(self, i: int) -> List[Hit]:
+        """Dựng List[Hit] cho 1 câu khi thật sự cần (hiển thị)."""
+        return [
+            Hit(id=str(cid), doc=str(doc or ""), meta=dict(m or {}), distance=float(d))
+            for cid, doc, m, d in zip(self.ids[i], self.docs[i], self.metas[i], self.distances[i])
+        ]
+
+
+class VectorStore(Protocol):
+    alias: str
+    collection_name: str
+    version: str
+    generation: str
+    semantic_cache: SemanticCache
+
+    def current_generation(self) -> str: ...
+
+    def count(self) -> int: ...
+
+    def embed_query(self, text: str) -> List[float]: ...
+
+    def embed_queries(self, texts: Sequence[str], batch_size: int = 64) -> np.ndarray: ...
+
+    def query(self, question: str, top_k: int = 5, use_cache: bool = True, **search_opts: Any) -> List[Hit]: ...
+
+    def query_many(self, questions: Sequence[str], top_k: int = 5, chunk: int = 256, **search_opts: Any) -> BatchHits: ...
+
+
+class BaseStore:
+    """
+    Phần chung của các backend: encode câu hỏi (qua cache embedding), cache ngữ nghĩa,
+    query / query_many. Lớp con cài _resolve() (đổi theo alias) và _search().
+    """
+
+    def __init__(
+        self,
+        persist_dir: str | Path,
+        collection_name: str,
+        model_id: Optional[str] = None,
+        device: Optional[str] = None,
+    ):
         p = abs_path(persist_dir)
         p.mkdir(parents=True, exist_ok=True)
+        self.persist_dir = p
+        # collection_name là alias: collection thật + version resolve lúc query (blue/green)
+        self.alias = collection_name
+        self._alias_stamp: Any = object()
+        self.collection_name = collection_name
+        self.version = ""
+        self.generation = ""
+
+        self.model_id = model_id or settings.EMBED_MODEL_ID
+        self.device = device or settings.EMBED_DEVICE
+        # câu hỏi gần nghĩa với câu đã hỏi => lấy hits cũ, không search lại
+        self.semantic_cache = SemanticCache(settings.SEMANTIC_CACHE_MAX_ENTRIES, settings.SEMANTIC_CACHE_THRESHOLD)
+
+    def _resolve(self) -> Any:
+        raise NotImplementedError
+
+    def _search(self, q_emb: np.ndarray, top_k: int, **search_opts: Any) -> BatchHits:
+        """
+        q_emb (n, dim) float32 => BatchHits (questions để trống, caller điền).
+        search_opts: tham số riêng của backend (vd nprobe của IVF), backend khác bỏ qua.
+        """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def current_generation(self) -> str:
+        """Generation của dữ liệu đang phục vụ (đổi khi run embedding xong / rollback)."""
+        self._resolve()
+        return self.generation
 
-        # ✅ Chroma persistent client
-        self.client = chromadb.PersistentClient(path=str(p))
-        self.col = self.client.get_or_create_collection(name=collection_name)
+    def _get_embedder(self):
+        # ✅ embedder dùng chung cả process (xem core/resources.py), không load lại mỗi câu hỏi
+        from .resources import get_embedder
 
-        self._embedder = None
+        return get_embedder(self.model_id, self.device)
 
-    def _get_embedder(self):
-        if self._embedder is not None:
-            return self._embedder
-
-        # Lazy import để tránh load nặng khi chưa dùng
-        try:
-            from sentence_transformers import SentenceTransformer  # type: ignore
-        except Exception as e:
-            raise RuntimeError(
-                "Thiếu thư viện sentence-transformers. Cài: pip install sentence-transformers"
-            ) from e
-
-        device = settings.EMBED_DEVICE
-        if device == "auto":
-            # ưu tiên cuda nếu có
-            try:
-                import torch  # type: ignore
-
-                device = "cuda" if torch.cuda.is_available() else "cpu"
-            except Exception:
-                device = "cpu"
-
-        self._embedder = SentenceTransformer(settings.EMBED_MODEL_ID, device=device)
-        return self._embedder
+    def embed_queries(self, texts: Sequence[str], batch_size: int = 64) -> np.ndarray:
+        """Ma trận (len(texts), dim) float32 đã normalize, encode 1 lần cho cả list."""
+        from .embed_cache import encode_cached
+        from .resources import get_embed_cache
+
+        def _encode(batch: List[str]):
+            return self._get_embedder().encode(batch, batch_size=batch_size, normalize_embeddings=True)
+
+        # câu hỏi lặp lại => lấy vector từ cache, không chạy model
+        vecs, _ = encode_cached(list(texts), _encode, get_embed_cache(self.model_id, namespace="queries"))
+        return vecs
 
     def embed_query(self, text: str) -> List[float]:
-        model = self._get_embedder()
-        vec = model.encode([text], normalize_embeddings=True)
-        return vec[0].tolist()
+        return self.embed_queries([text])[0].tolist()
+
+    def query(self, question: str, top_k: int = 5, use_cache: bool = True, **search_opts: Any) -> List[Hit]:
+        q_emb = self.embed_queries([question])
+        self._resolve()
+        generation = self.generation
+        # chỉnh tham số search cho riêng câu này => kết quả khác mặc định, không dùng cache
+        use_cache = use_cache and not search_opts
+        if use_cache:
+            cached = self.semantic_cache.lookup(question, q_emb[0], top_k, generation)
+            if cached is not None:
+                return [Hit(h.id, h.doc, dict(h.meta), h.distance) for h in cached[0][:top_k]]
+
+        hits = self._search(q_emb, top_k, **search_opts).hits(0)
+        if use_cache:
+            cached_hits = [Hit(h.id, h.doc, dict(h.meta), h.distance) for h in hits]
+            self.semantic_cache.add(question, q_emb[0], top_k, cached_hits, generation)
+        return hits
 
-    def query(self, question: str, top_k: int = 5) -> List[Hit]:
-        q_emb = self.embed_query(question)
+    def query_many(self, questions: Sequence[str], top_k: int = 5, chunk: int = 256, **search_opts: Any) -> BatchHits:
+        """
+        Nhiều câu hỏi 1 lượt: encode theo batch, search mỗi `chunk` câu 1 lần (giới hạn
+        bộ nhớ). Không qua cache ngữ nghĩa — dùng cho Evaluate / pre-warm / export nên
+        cần kết quả truy hồi thật.
+        """
+        questions = [str(q) for q in questions]
+        n = len(questions)
+        out = BatchHits(questions, [], [], [], np.full((n, top_k), np.inf, dtype=np.float32))
+        if n == 0:
+            return out
+        q_emb = self.embed_queries(questions)
+        self._resolve()
+        for a in range(0, n, chunk):
+            part = self._search(q_emb[a : a + chunk], top_k, **search_opts)
+            out.ids.extend(part.ids)
+            out.docs.extend(part.docs)
+            out.metas.extend(part.metas)
+            w = min(part.distances.shape[1], top_k)
+            out.distances[a : a + len(part.ids), :w] = part.distances[:, :w]
+        return out
+
+
+class ChromaStore(BaseStore):
+    def __init__(
+        self,
+        persist_dir: str | Path,
+        collection_name: str,
+        model_id: Optional[str] = None,
+        device: Optional[str] = None,
+    ):
+        super().__init__(persist_dir, collection_name, model_id, device)
+        # import ở đây: backend numpy / snapshot / shared không cần cài chromadb
+        import chromadb
 
+        # ✅ Chroma persistent client
+        self.client = chromadb.PersistentClient(path=str(self.persist_dir))
+        self._resolve()
+
+    def _resolve(self):
+        """File alias đổi (run embedding xong / rollback) => chuyển sang collection mới."""
+        stamp = alias_file_stamp(self.persist_dir)
+        if stamp == self._alias_stamp:
+            return self.col
+        name, version = resolve_alias(self.persist_dir, self.alias)
+        col = self.client.get_or_create_collection(name=name)
+        # nhiều thread cùng resolve thì cùng lắm mở collection 2 lần, không sai
+        self.col, self.collection_name, self.version = col, name, version
+        self.generation = alias_generation(self.persist_dir, self.alias)
+        self._alias_stamp = stamp
+        return col
+
+    def count(self) -> int:
+        return int(self._resolve().count())
+
+    def _search(self, q_emb: np.ndarray, top_k: int, **search_opts: Any) -> BatchHits:
         # ✅ include KHÔNG được chứa "ids" (Chroma sẽ trả ids sẵn trong res["ids"])
-        res = self.col.query(
-            query_embeddings=[q_emb],
+        res = self._resolve().query(
+            query_embeddings=np.asarray(q_emb, dtype=np.float32).tolist(),
             n_results=top_k,
             include=["documents", "metadatas", "distances"],
         )
-
-        ids = (res.get("ids") or [[]])[0]
-        docs = (res.get("documents") or [[]])[0]
-        metas = (res.get("metadatas") or [[]])[0]
-        dists = (res.get("distances") or [[]])[0]
-
-        hits: List[Hit] = []
-        for i in range(len(ids)):
-            hits.append(
-                Hit(
-                    id=str(ids[i]),
-                    doc=str(docs[i] or ""),
-                    meta=dict(metas[i] or {}),
-                    distance=float(dists[i]),
-                )
-            )
-        return hits
+        m = len(q_emb)
+        out = BatchHits(
+            questions=[],
+            ids=res.get("ids") or [[]] * m,
+            docs=res.get("documents") or [[]] * m,
+            metas=res.get("metadatas") or [[]] * m,
+            distances=np.full((m, top_k), np.inf, dtype=np.float32),
+        )
+        for j, d in enumerate(res.get("distances") or []):
+            out.distances[j, : len(d)] = d
+        return out
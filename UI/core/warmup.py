@@ -0,0 +1,89 @@
+# UI/core/warmup.py
+"""
+Warm-up chạy nền khi app khởi động:
+load embedder + mở collection + encode/query thử 1 lần,
+để câu hỏi đầu tiên của user không phải chờ import torch / load model.
+
+Chỉ chạy 1 lần cho mỗi process (gọi start_warmup() nhiều lần cũng không sao).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict
+
+from .config import settings
+from .resources import get_embedder, get_store
+
+
+_WARMUP_QUERY = "Đăng ký khai sinh được thực hiện như thế nào ?"
+_RETRY_AFTER_S = 60.0
+
+_lock = threading.Lock()
+_thread: threading.Thread | None = None
+_state: Dict[str, Any] = {
+    "status": "idle",  # idle | warming | ready | failed
+    "stage": "",
+    "error": "",
+    "started_at": None,
+    "finished_at": None,
+    "timings": {},
+}
+
+
+def _set(**kw: Any) -> None:
+    with _lock:
+        _state.update(kw)
+
+
+def _run() -> None:
+    timings: Dict[str, float] = {}
+    try:
+        t = time.time()
+        _set(stage="load_model")
+        model = get_embedder(settings.EMBED_MODEL_ID, settings.EMBED_DEVICE)
+        timings["load_model"] = time.time() - t
+
+        t = time.time()
+        _set(stage="open_collection")
+        store = get_store(settings.CHROMA_DIR, settings.CHROMA_COLLECTION)
+        timings["open_collection"] = time.time() - t
+
+        # encode + query thử để warm cache (tokenizer, kernel, HNSW index).
+        # encode thẳng bằng model: store.embed_query đi qua cache "queries" nên từ lần 2 model không chạy
+        t = time.time()
+        _set(stage="dummy_query")
+        model.encode([_WARMUP_QUERY], batch_size=1, normalize_embeddings=True)
+        if store.count() > 0:
+            store.query(_WARMUP_QUERY, top_k=1)
+        timings["dummy_query"] = time.time() - t
+
+        _set(status="ready", stage="", finished_at=time.time(), timings=timings)
+    except Exception as e:
+        _set(status="failed", error=str(e), finished_at=time.time(), timings=timings)
+
+
+def start_warmup() -> None:
+    """Khởi động warm-up nền (idempotent). Lần trước failed thì chờ một lúc mới thử lại."""
+    global _thread
+    with _lock:
+        if _state["status"] in ("warming", "ready"):
+            return
+        if _state["status"] == "failed" and time.time() - (_state["finished_at"] or 0) < _RETRY_AFTER_S:
+            return
+        _state.update(
+            status="warming", stage="", error="", started_at=time.time(), finished_at=None, timings={}
+        )
+        _thread = threading.Thread(target=_run, name="rag-warmup", daemon=True)
+        _thread.start()
+
+
+def warmup_status() -> Dict[str, Any]:
+    with _lock:
+        out = dict(_state)
+        out["timings"] = dict(_state["timings"])
+    return out
+
+
+def is_ready() -> bool:
+    return warmup_status()["status"] == "ready"
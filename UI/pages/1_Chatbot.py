@@ -4,11 +4,15 @@ from __future__ import annotations
 import streamlit as st
 
 from core.config import settings
-from core.rag import answer_with_citations
+from core.rag import answer_with_citations, clear_result_cache, result_cache_stats, semantic_cache_stats
+from core.warmup import start_warmup, warmup_status
 
 
 st.set_page_config(page_title="Chatbot (Trích dẫn Điều/Khoản)", layout="wide")
 
+# nếu user vào thẳng trang này (chưa qua app.py) thì vẫn warm-up
+start_warmup()
+
 # ✅ CSS cho chữ to hơn + đẹp hơn
 st.markdown(
     """
@@ -33,10 +37,41 @@ with st.sidebar:
     st.header("⚙️ Cấu hình")
 
     st.write("**Embedding model:**", settings.EMBED_MODEL_ID)
+
+    warm = warmup_status()
+    if warm["status"] == "ready":
+        total = sum(warm["timings"].values())
+        st.success(f"✅ Model & VectorDB sẵn sàng (warm-up {total:.1f}s)")
+    elif warm["status"] == "failed":
+        st.warning(f"⚠️ Warm-up lỗi: {warm['error']}")
+    else:
+        st.info(f"⏳ Đang khởi động model & VectorDB... {warm['stage']}")
+        if st.button("🔄 Kiểm tra lại"):
+            st.rerun()
     top_k = st.slider("Top K", min_value=1, max_value=20, value=int(settings.DEFAULT_TOP_K), step=1)
 
     show_topk = st.checkbox("Hiển thị Top-K (debug)", value=True)
 
+    rc = result_cache_stats()
+    st.caption(
+        f"Cache kết quả: {rc['entries']}/{rc['max_entries']} câu | hit {rc['hit_rate']:.0%} "
+        f"({rc['hits']}/{rc['hits'] + rc['misses']}) | ~{rc['approx_mb']} MB"
+    )
+    sc = semantic_cache_stats()
+    st.caption(
+        f"Cache ngữ nghĩa (cos ≥ {sc['threshold']}): {sc['entries']}/{sc['max_entries']} câu | "
+        f"hit {sc['hit_rate']:.0%} ({sc['hits']}/{sc['hits'] + sc['misses']})"
+    )
+    if sc["recent_hits"]:
+        with st.expander("Các lần trúng cache ngữ nghĩa"):
+            st.dataframe(
+                [{k: h[k] for k in ("question", "matched", "cosine")} for h in reversed(sc["recent_hits"])],
+                use_container_width=True,
+            )
+    if st.button("🧹 Xoá cache kết quả"):
+        clear_result_cache()
+        st.rerun()
+
     default_prompt = (
         "Bạn là trợ lý pháp lý tiếng Việt.\n"
         "Nhiệm vụ: trả lời NGẮN GỌN, dễ hiểu, đúng trọng tâm dựa trên đoạn luật được truy xuất.\n"
@@ -10,12 +10,28 @@ import streamlit as st
 
 from core.config import get_settings
 from core.db import (
-    init_db,
-    start_embedding_run,
-    finish_embedding_run,
+    RESUMABLE_STATUSES,
+    enqueue_embedding_run,
+    get_active_embedding_runs,
+    get_embedding_batch_metrics,
     get_embedding_logs,
+    get_embedding_run_metrics,
+    init_db,
+    request_cancel_embedding_run,
+    resume_embedding_run,
+)
+from core.aliases import list_versions, rollback
+from core.autotune import calibrate, host_id, tuned_batch
+from core.embed_jobs import ensure_worker, live_worker_pid
+from core.embedding_runner import (
+    compare_chunkers,
+    device_status_text,
+    resolve_device,
+    sample_chunks,
 )
-from core.embedding_runner import run_embedding, resolve_device, device_status_text
+from core.encode_pool import compare_speed, default_threads_per_worker
+from core.onnx_backend import parity_check
+from core.resources import release_all, release_stale, release_store, resource_stats
 
 
 st.set_page_config(page_title="Embedding", layout="wide")
@@ -42,16 +58,104 @@ with st.sidebar:
         index=["auto", "cuda", "cpu"].index(settings.EMBED_DEVICE),
         help="auto: nếu có CUDA thì dùng CUDA, không có thì CPU",
     )
+    device_real = resolve_device(device_choice)
 
     st.markdown("---")
-    chunk_size = st.slider("chunk_size", 200, 2000, 1200, step=50)
-    chunk_overlap = st.slider("chunk_overlap", 0, 300, 120, step=10)
-    batch_size = st.slider("batch_size", 8, 512, 128, step=8)
+    chunker = st.radio(
+        "Chunker",
+        options=["chars", "tokens", "structure"],
+        format_func=lambda x: {"chars": "Ký tự (cũ)", "tokens": "Token", "structure": "Khoản/Điểm"}[x],
+        horizontal=True,
+        help=(
+            "tokens: đo bằng tokenizer, cắt ở ranh giới câu/vế, mỗi chunk vừa max_seq_length. "
+            "structure: cắt theo Chương/Điều/Khoản/Điểm, không overlap, lưu đường dẫn phân cấp vào metadata."
+        ),
+    )
+    chunk_size = st.slider("chunk_size", 200, 2000, 1200, step=50, disabled=chunker != "chars")
+    chunk_overlap = st.slider("chunk_overlap", 0, 300, 120, step=10, disabled=chunker != "chars")
+    overlap_tokens = st.slider("overlap (token)", 0, 64, 0, step=8, disabled=chunker != "tokens")
+    auto_batch = st.checkbox(
+        "Tự chọn batch_size (auto-tune)",
+        value=False,
+        help="Dùng batch_size (+ số thread CPU) đã calibrate cho model/device/máy này.",
+    )
+    tuned_bs, tuned_threads, has_tuning = tuned_batch(model_id, device_real)
+    batch_size = st.slider("batch_size", 8, 512, 128, step=8, disabled=auto_batch)
+    if auto_batch:
+        if has_tuning:
+            st.caption(f"auto: batch_size={tuned_bs}" + (f", threads={tuned_threads}" if tuned_threads else ""))
+        else:
+            st.caption(f"Chưa calibrate máy này => {tuned_bs}. Bấm Calibrate ở trang chính.")
+        batch_size = tuned_bs
+    length_bucketing = st.checkbox(
+        "Gom batch theo độ dài token",
+        value=False,
+        help="Sắp chunk theo số token rồi cắt batch theo token budget thay vì batch_size cố định => ít padding hơn.",
+    )
+    token_budget = st.slider(
+        "token budget / batch",
+        2048,
+        65536,
+        16384,
+        step=1024,
+        disabled=not length_bucketing,
+        help="Số câu x độ dài câu dài nhất trong batch không vượt quá giá trị này.",
+    )
+    incremental = st.checkbox(
+        "Incremental (chỉ embed chunk mới/đổi, xoá chunk cũ)",
+        value=True,
+        help="So id + hash chunk trong CSV với collection: chỉ encode phần thiếu, xoá id không còn trong CSV.",
+    )
+    blue_green = st.checkbox(
+        "Blue/green (build collection mới rồi mới đổi)",
+        value=True,
+        help=(
+            "Mỗi run ghi vào `<collection>__v<run_id>`; chatbot vẫn dùng bản cũ tới khi run xong "
+            "mới đổi alias (atomic). Giữ CHROMA_KEEP_VERSIONS bản cũ để rollback."
+        ),
+    )
+    dedup = st.checkbox(
+        "Khử trùng chunk trước khi encode",
+        value=True,
+        help="Chunk có nội dung giống hệt nhau (điều bãi bỏ, boilerplate...) chỉ encode 1 lần.",
+    )
+    use_cache = st.checkbox(
+        "Dùng cache embedding trên đĩa",
+        value=True,
+        help="Text đã embed với cùng model (collection/chunk_size khác) sẽ lấy lại vector, không encode lại.",
+    )
 
     # status
-    device_real = resolve_device(device_choice)
     st.success(device_status_text(device_real))
 
+    st.markdown("---")
+    cpu_n = os.cpu_count() or 1
+    encode_workers = st.number_input(
+        "Encode workers (CPU, multi-process)",
+        min_value=0,
+        max_value=cpu_n,
+        value=0,
+        step=1,
+        help="0/1 = 1 process như cũ. >1: mỗi process giữ 1 bản model, chia batch cho các process (chỉ áp dụng khi chạy CPU).",
+        disabled=device_real != "cpu",
+    )
+    threads_per_worker = st.number_input(
+        "Threads / worker",
+        min_value=0,
+        max_value=cpu_n,
+        value=0,
+        step=1,
+        help=f"0 = tự chia đều core (hiện: {default_threads_per_worker(max(int(encode_workers), 1))}).",
+        disabled=device_real != "cpu",
+    )
+
+    st.markdown("---")
+    stats = resource_stats()
+    st.caption(f"Model đang giữ trong RAM: {len(stats['embedders'])} | VectorDB đang mở: {len(stats['stores'])}")
+    if st.button("♻️ Giải phóng model/VectorDB đang cache", use_container_width=True):
+        release_all()
+        st.rerun()
+
 # ===== Main actions =====
 colA, colB = st.columns([1, 1], gap="large")
 
@@ -69,9 +173,119 @@ with colA:
         language="text",
     )
 
-    run_btn = st.button("▶️ Chạy Embedding & Lưu VectorDB", type="primary", use_container_width=True)
+    active = get_active_embedding_runs()
+    run_btn = st.button(
+        "▶️ Chạy Embedding & Lưu VectorDB (chạy nền)",
+        type="primary",
+        use_container_width=True,
+        disabled=bool(active),
+    )
+
+    # job chạy trong worker process riêng => page chỉ poll trạng thái từ SQLite
+    for job in active:
+        done, total = int(job.get("progress_done") or 0), int(job.get("progress_total") or 0)
+        pct = int(done / max(total, 1) * 100)
+        label = "đang chờ worker" if job["status"] == "queued" else f"{done}/{total} chunks ({pct}%)"
+        if job.get("cancel_requested"):
+            label += " — đang huỷ..."
+        st.progress(pct, text=f"Job #{job['id']} ({job.get('collection', '')}): {label}")
+        if st.button(f"⏹️ Huỷ job #{job['id']}", key=f"cancel_{job['id']}"):
+            request_cancel_embedding_run(int(job["id"]))
+            st.rerun()
+    if active:
+        st.caption(f"Worker pid: {live_worker_pid() or 'đang khởi động...'} — đóng tab không dừng job.")
+
+    if device_real == "cpu" and encode_workers > 1:
+        if st.button("⏱️ Đo speedup (pool vs 1 process, 256 chunk đầu)", use_container_width=True):
+            with st.spinner("Đang đo tốc độ encode..."):
+                sample = sample_chunks(csv_abs, 256, chunk_size, chunk_overlap)
+                bench = compare_speed(
+                    sample,
+                    model_id=model_id,
+                    workers=int(encode_workers),
+                    threads_per_worker=int(threads_per_worker),
+                    batch_size=min(batch_size, 256),
+                )
+                # model đo thử (model_id trên trang) không phải model chatbot đang dùng => nhả RAM
+                release_stale()
+            st.info(
+                f"{bench['n_texts']} chunks | 1 process: {bench['single_s']}s | "
+                f"{bench['workers']}x{bench['threads_per_worker']} threads: {bench['pool_s']}s | "
+                f"speedup x{bench['speedup']}"
+            )
+
+    cal1, cal2 = st.columns([1, 2])
+    with cal1:
+        mem_budget = st.number_input(
+            "Budget bộ nhớ (MB)",
+            min_value=0,
+            value=0,
+            step=256,
+            help="0 = không giới hạn. CUDA: VRAM đỉnh; CPU: RSS đỉnh của process.",
+        )
+    with cal2:
+        st.write("")
+        cal_btn = st.button(
+            f"🎛️ Calibrate batch_size ({device_real}, máy {host_id()})",
+            use_container_width=True,
+        )
+    if cal_btn:
+        with st.spinner("Đang quét batch_size x threads trên 512 chunk đầu..."):
+            sample = sample_chunks(csv_abs, 512, chunk_size, chunk_overlap)
+            tune = calibrate(sample, model_id, device_real, mem_budget_mb=float(mem_budget))
+            release_stale()
+        msg = (
+            f"batch_size={tune['batch_size']}"
+            + (f", threads={tune['threads']}" if tune["threads"] else "")
+            + f" | {tune['chunks_per_s']} chunks/s | peak {tune['peak_mem_mb']} MB"
+        )
+        if tune["fits"]:
+            st.success(f"Chọn {msg}")
+        else:
+            st.warning(f"Không cấu hình nào vừa budget {mem_budget} MB — nhỏ nhất đã đo: {msg}. Chưa lưu.")
+        st.dataframe(tune["results"], use_container_width=True)
+
+    if st.button("📏 So sánh các chunker (500 dòng đầu)", use_container_width=True):
+        with st.spinner("Đang chunk + đếm token..."):
+            cmp = compare_chunkers(csv_abs, model_id, chunk_size, chunk_overlap, overlap_tokens)
+        st.caption(f"max_seq_length={cmp['max_seq_length']}")
+        st.table(
+            [
+                {
+                    "chunker": name,
+                    "chunks": cmp[f"{name}_chunks"],
+                    "tổng ký tự": cmp[f"{name}_chars"],
+                    "bị cắt đuôi": cmp[f"{name}_truncated"],
+                }
+                for name in ("chars", "tokens", "structure")
+            ]
+        )
+
+    st.caption(f"Embedder backend: `{settings.EMBED_BACKEND}` (đổi bằng EMBED_BACKEND trong .env)")
+    if st.button("🧪 Kiểm tra ONNX int8 vs torch (cosine + speedup, 128 chunk đầu)", use_container_width=True):
+        with st.spinner("Đang export/load ONNX và so sánh với torch..."):
+            sample = sample_chunks(csv_abs, 128, chunk_size, chunk_overlap)
+            par = parity_check(sample, model_id)
+            release_stale()
+        st.info(
+            f"{par['n_texts']} chunks | cosine mean={par['cos_mean']} min={par['cos_min']} | "
+            f"torch {par['torch_s']}s vs onnx {par['onnx_s']}s | speedup x{par['speedup']}"
+        )
 
 with colB:
+    st.subheader("🔀 Phiên bản collection")
+    for v in list_versions(chroma_abs, collection):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(v["activated_at"])) if v.get("activated_at") else "-"
+        line = f"`{v['collection']}` (v{v['version']}, {when})"
+        if v["active"]:
+            st.markdown(f"- ✅ **active**: {line}")
+        else:
+            vcol1, vcol2 = st.columns([3, 1])
+            vcol1.markdown(f"- {line}")
+            if vcol2.button("↩️ Rollback", key=f"rollback_{v['version']}", disabled=bool(active)):
+                rollback(chroma_abs, collection, v["version"])
+                st.rerun()
+
     st.subheader("🧾 Lịch sử")
     logs = get_embedding_logs(limit=20)
     if not logs:
@@ -84,6 +298,53 @@ with colB:
                 f"rows={r.get('total_rows','')} chunks={r.get('total_chunks','')} | "
                 f"device={r.get('device','')} | note={r.get('note','')}"
             )
+            if r.get("status") in RESUMABLE_STATUSES:
+                if st.button(
+                    f"⏯️ Chạy tiếp #{r['id']} từ dòng {r.get('checkpoint_row') or 0}",
+                    key=f"resume_{r['id']}",
+                    disabled=bool(active),
+                ):
+                    resume_embedding_run(int(r["id"]))
+                    ensure_worker()
+                    st.rerun()
+
+# ===== Ingest metrics =====
+st.markdown("---")
+st.subheader("📈 Hiệu năng ingest theo run")
+run_metrics = get_embedding_run_metrics(limit=50)
+if not run_metrics:
+    st.info("Chưa có metrics. Chạy embedding (nền) để ghi số liệu.")
+else:
+    import pandas as pd
+
+    mdf = pd.DataFrame(run_metrics)
+    mdf["run"] = mdf["run_id"].map(lambda x: f"#{x}")
+    mdf = mdf.set_index("run")
+    m1, m2 = st.columns(2, gap="large")
+    with m1:
+        st.caption("Thông lượng (chunks/s, tokens/s)")
+        st.line_chart(mdf[["chunks_per_s"]])
+        st.line_chart(mdf[["tokens_per_s"]])
+    with m2:
+        st.caption("Thời gian từng tầng (s, các tầng chạy chồng nhau)")
+        st.bar_chart(mdf[["load_s", "chunk_s", "tokenize_s", "encode_s", "upsert_s"]])
+        st.caption("Peak RSS (MB, process chạy embedding)")
+        st.line_chart(mdf[["peak_rss_mb"]])
+    st.dataframe(
+        mdf[["model_id", "device", "backend", "chunker", "batch_size", "encode_workers", "chunks", "wall_s",
+             "chunks_per_s", "tokens_per_s", "peak_rss_mb"]],
+        use_container_width=True,
+    )
+
+    pick = st.selectbox("Chi tiết từng batch của run", options=list(mdf["run_id"])[::-1], format_func=lambda x: f"#{x}")
+    bdf = pd.DataFrame(get_embedding_batch_metrics(int(pick)))
+    if not bdf.empty:
+        bdf = bdf.set_index("batch_no")
+        st.line_chart(bdf[["chunks_per_s"]])
+        st.area_chart(bdf[["load_s", "chunk_s", "tokenize_s", "encode_s", "upsert_s"]])
+        if bdf["rss_mb"].notna().any():
+            st.caption("RSS sau mỗi batch (MB)")
+            st.line_chart(bdf[["rss_mb"]])
 
 # ===== Execute embedding =====
 from pathlib import Path
@@ -92,23 +353,8 @@ st.write("CSV exists:", Path(csv_path).exists(), "->", csv_path)
 
 
 if run_btn:
-    t0 = time.time()
-    run_id = None
-    try:
-        run_id = start_embedding_run(
-            model_id=model_id,
-            device=device_real,
-            chroma_dir=chroma_abs,
-            collection=collection,
-        )
-
-        progress = st.progress(0, text="Đang chạy embedding...")
-
-        def on_progress(done: int, total: int):
-            pct = int((done / max(total, 1)) * 100)
-            progress.progress(pct, text=f"Embedding: {done}/{total} chunks ({pct}%)")
-
-        result = run_embedding(
+    run_id = enqueue_embedding_run(
+        dict(
             csv_path=csv_abs,
             chroma_dir=chroma_abs,
             collection=collection,
@@ -116,21 +362,40 @@ if run_btn:
             device=device_real,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
-            batch_size=batch_size,
-            on_progress=on_progress,
-        )
-
-        finish_embedding_run(
-            run_id=run_id,
-            status="ok",
-            note=f"OK | time={time.time()-t0:.2f}s",
-            total_rows=result["total_rows"],
-            total_chunks=result["total_chunks"],
+            batch_size=0 if auto_batch else batch_size,
+            incremental=incremental,
+            use_cache=use_cache,
+            encode_workers=int(encode_workers),
+            threads_per_worker=int(threads_per_worker),
+            length_bucketing=length_bucketing,
+            token_budget=token_budget,
+            dedup=dedup,
+            chunker=chunker,
+            overlap_tokens=overlap_tokens,
+            blue_green=blue_green,
         )
-        st.success(f"✅ Xong! rows={result['total_rows']} | chunks={result['total_chunks']} | time={time.time()-t0:.2f}s")
-
-    except Exception as e:
-        if run_id is not None:
-            finish_embedding_run(run_id=run_id, status="failed", note=str(e))
-        st.error(f"❌ Lỗi: {e}")
-        st.exception(e)
+    )
+    ensure_worker()
+    st.session_state.setdefault("embed_watch", set()).add(run_id)
+    st.rerun()
+
+# job vừa xong => chatbot mở lại collection vừa build ở câu hỏi kế tiếp
+watching = st.session_state.get("embed_watch", set())
+active_ids = {int(j["id"]) for j in active}
+for r in logs:
+    if r["id"] in watching and r["id"] not in active_ids:
+        watching.discard(r["id"])
+        if r.get("status") == "ok":
+            release_store(r.get("chroma_dir") or chroma_abs, r.get("collection") or collection)
+            st.success(f"✅ Job #{r['id']} xong: {r.get('note', '')}")
+        else:
+            st.error(f"❌ Job #{r['id']} {r.get('status')}: {r.get('note', '')}")
+
+if active:
+    # không còn worker sống (idle thoát đúng lúc job mới vào queue / máy tắt / kill)
+    # => bật lại; job running mồ côi được đánh dấu interrupted để resume
+    if live_worker_pid() is None:
+        ensure_worker()
+    st.session_state.setdefault("embed_watch", set()).update(active_ids)
+    time.sleep(2)
+    st.rerun()
@@ -15,5 +15,62 @@ st.write("- **Faithfulness / Citation correctness**: câu trả lời bám đún
 st.markdown("### Dataset đánh giá")
 st.info("Bạn có thể tạo file test dạng: question, relevant_dieu_id (hoặc relevant_text), và chạy batch query để tính metric.")
 
+st.markdown("### Chỉnh threshold cache ngữ nghĩa")
+st.caption(
+    "CSV có cột question, relevant_dieu_id. Mỗi threshold: tỉ lệ câu trúng cache (dùng lại hits của câu "
+    "trước đó đủ gần) và Recall@k khi có cache so với khi truy hồi thật."
+)
+up = st.file_uploader("Bộ test (CSV)", type=["csv"])
+if up is not None:
+    from core.config import settings
+    from core.resources import get_store
+    from core.semantic_cache import evaluate_thresholds
+
+    test_df = pd.read_csv(up, dtype=str).fillna("")
+    k = st.number_input("k", min_value=1, max_value=50, value=int(settings.DEFAULT_TOP_K))
+    if {"question", "relevant_dieu_id"} - set(test_df.columns):
+        st.error("CSV cần cột question, relevant_dieu_id")
+    elif st.button("Chạy"):
+        store = get_store(settings.CHROMA_DIR, settings.CHROMA_COLLECTION)
+        qs = test_df["question"].tolist()
+        with st.spinner(f"Truy hồi {len(qs)} câu..."):
+            batch = store.query_many(qs, top_k=int(k))
+            pred = {q: batch.source_ids(i) for i, q in enumerate(qs)}
+            rows = evaluate_thresholds(
+                qs,
+                test_df["relevant_dieu_id"].tolist(),
+                store.embed_queries(qs),
+                pred.__getitem__,
+                k=int(k),
+            )
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+        st.caption(f"Threshold đang dùng: SEMANTIC_CACHE_THRESHOLD={settings.SEMANTIC_CACHE_THRESHOLD}")
+
+    if not ({"question"} - set(test_df.columns)) and settings.VECTOR_BACKEND == "numpy":
+        st.markdown("#### Vector nén (VECTOR_QUANT)")
+        st.caption("RAM của bản quét lượt đầu so với float32, và Recall@k so với exact search float32.")
+        if st.button("Đo bản nén"):
+            from core.flat_store import FlatStore
+
+            qs = test_df["question"].tolist()
+            rows = []
+            with st.spinner("Đang đo..."):
+                for mode in ("none", "float16", "int8"):
+                    fs = FlatStore(settings.CHROMA_DIR, settings.CHROMA_COLLECTION, quant=mode)
+                    rows.append(fs.quant_report(qs, k=int(k)))
+            st.dataframe(pd.DataFrame(rows), use_container_width=True)
+            st.caption(f"Đang dùng: VECTOR_QUANT={settings.VECTOR_QUANT}, VECTOR_RESCORE={settings.VECTOR_RESCORE}")
+
+        if settings.VECTOR_INDEX == "ivf":
+            st.markdown("#### IVF: recall / độ trễ theo nprobe")
+            if st.button("Đo IVF"):
+                from core.flat_store import FlatStore
+
+                fs = FlatStore(settings.CHROMA_DIR, settings.CHROMA_COLLECTION)
+                with st.spinner("Đang đo..."):
+                    rows = fs.ivf_report(test_df["question"].tolist(), k=int(k))
+                st.dataframe(pd.DataFrame(rows), use_container_width=True)
+                st.caption(f"Đang dùng: IVF_NPROBE={settings.IVF_NPROBE} | {fs.ivf_stats()}")
+
 st.markdown("### Kết quả")
 st.warning("Trang Evaluate bạn sẽ bổ sung sau. Nếu bạn gửi format bộ test (CSV), mình code luôn phần tính metric + báo cáo bảng/biểu đồ.")
@@ -0,0 +1,99 @@
+# UI/tests/conftest.py
+"""
+Chạy: cd UI && python -m pytest -q
+
+Embedder được stub (vector ngẫu nhiên cố định theo text), không tải model. Test cần
+chromadb / torch thật thì tự skip khi chưa cài.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pytest
+
+UI_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(UI_DIR))
+
+# settings đọc env lúc import core.config => đặt trước mọi import core.*
+_TMP = Path(tempfile.mkdtemp(prefix="nlp_tracuu_tests_"))
+os.environ.setdefault("SQLITE_PATH", str(_TMP / "ui.sqlite3"))
+os.environ.setdefault("EMBED_CACHE_DIR", str(_TMP / "embed_cache"))
+os.environ.setdefault("SNAPSHOT_CACHE_DIR", str(_TMP / "snapshot_cache"))
+os.environ.setdefault("SEMANTIC_CACHE_MAX_ENTRIES", "0")
+
+
+class FakeEmbedder:
+    """Thay SentenceTransformer: vector chuẩn hoá, cố định theo nội dung text."""
+
+    max_seq_length = 256
+
+    def __init__(self, dim: int = 16):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, normalize_embeddings: bool = True, **_: Any) -> np.ndarray:
+        out = np.stack([np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(self.dim) for t in texts])
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out.astype(np.float32)
+
+
+class FakeTokenizer:
+    """Đếm token theo khoảng trắng (đủ cho thống kê token / bucketing trong test)."""
+
+    def __call__(self, texts: Sequence[str], max_length: int = 256, **_: Any) -> Dict[str, List[List[int]]]:
+        return {"input_ids": [[0] * min(len(t.split()) + 2, max_length) for t in texts]}
+
+
+def clustered_vectors(n: int, dim: int, n_clusters: int, seed: int = 0) -> np.ndarray:
+    """Vector đã normalize, gom quanh n_clusters tâm (giống embedding thật hơn nhiễu đều)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim))
+    x = centers[rng.integers(0, n_clusters, n)] + 0.35 * rng.standard_normal((n, dim))
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def write_flat_export(chroma_dir: Path, alias: str, vecs: np.ndarray) -> List[str]:
+    """Bản export flat/<alias>/ như export_flat ghi (alias chưa blue/green), không cần Chroma."""
+    from core.aliases import alias_generation
+    from core.flat_store import flat_dir
+
+    d = flat_dir(chroma_dir, alias)
+    d.mkdir(parents=True)
+    np.save(d / "vectors.npy", vecs)
+    ids = [f"c{i}" for i in range(len(vecs))]
+    with open(d / "rows.jsonl", "w", encoding="utf-8") as f:
+        for i, cid in enumerate(ids):
+            f.write(json.dumps({"id": cid, "doc": f"doc {i}", "meta": {"source_id": f"d{i // 3}"}}) + "\n")
+    manifest = {
+        "collection": alias,
+        "generation": alias_generation(chroma_dir, alias),
+        "count": len(vecs),
+        "dim": int(vecs.shape[1]),
+    }
+    (d / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    return ids
+
+
+def exact_topk(vecs: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(q @ vecs.T), axis=1, kind="stable")[:, :k]
+
+
+def recall(got_ids: List[List[str]], want: np.ndarray, ids: List[str]) -> float:
+    hit = sum(len(set(g) & {ids[j] for j in w}) for g, w in zip(got_ids, want))
+    return hit / want.size
+
+
+@pytest.fixture
+def corpus():
+    vecs = clustered_vectors(3000, 32, 40)
+    queries = clustered_vectors(50, 32, 40, seed=1)
+    return vecs, queries
@@ -0,0 +1,63 @@
+# UI/tests/test_aliases.py
+import pytest
+
+from core.aliases import (
+    LEGACY_VERSION,
+    activate_version,
+    alias_generation,
+    list_versions,
+    resolve_alias,
+    rollback,
+    touch_alias,
+    versioned_name,
+)
+
+
+def _versions(d):
+    return [(v["version"], v["active"]) for v in list_versions(d, "law")]
+
+
+def test_activate_keeps_history_and_drops_oldest(tmp_path):
+    assert resolve_alias(tmp_path, "law") == ("law", LEGACY_VERSION)
+
+    assert activate_version(tmp_path, "law", versioned_name("law", 1), 1, keep=2) == []
+    assert activate_version(tmp_path, "law", versioned_name("law", 2), 2, keep=2) == []
+    # bản thứ 3 => collection cũ cùng tên alias rơi khỏi history, caller xoá
+    assert activate_version(tmp_path, "law", versioned_name("law", 3), 3, keep=2) == ["law"]
+    assert resolve_alias(tmp_path, "law") == ("law__v3", "3")
+    assert _versions(tmp_path) == [("3", True), ("2", False), ("1", False)]
+
+    # activate lại đúng bản đang active => không nhân đôi trong history
+    activate_version(tmp_path, "law", "law__v3", 3, keep=2)
+    assert _versions(tmp_path) == [("3", True), ("2", False), ("1", False)]
+
+
+def test_rollback_swaps_with_history(tmp_path):
+    for v in (1, 2, 3):
+        activate_version(tmp_path, "law", versioned_name("law", v), v, keep=3)
+
+    assert rollback(tmp_path, "law") == ("law__v2", "2")
+    assert _versions(tmp_path) == [("2", True), ("3", False), ("1", False), (LEGACY_VERSION, False)]
+
+    assert rollback(tmp_path, "law", "1") == ("law__v1", "1")
+    assert _versions(tmp_path) == [("1", True), ("2", False), ("3", False), (LEGACY_VERSION, False)]
+
+    with pytest.raises(ValueError):
+        rollback(tmp_path, "law", "99")
+    with pytest.raises(ValueError):
+        rollback(tmp_path, "other")
+
+
+def test_generation_changes_on_every_data_change(tmp_path):
+    seen = {alias_generation(tmp_path, "law")}
+    touch_alias(tmp_path, "law")
+    seen.add(alias_generation(tmp_path, "law"))
+    activate_version(tmp_path, "law", "law__v1", 1)
+    seen.add(alias_generation(tmp_path, "law"))
+    touch_alias(tmp_path, "law")
+    seen.add(alias_generation(tmp_path, "law"))
+    rollback(tmp_path, "law")
+    seen.add(alias_generation(tmp_path, "law"))
+    assert len(seen) == 5
+    # touch trước khi có blue/green không làm mất bản legacy
+    assert resolve_alias(tmp_path, "law") == ("law", LEGACY_VERSION)
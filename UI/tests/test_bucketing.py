@@ -0,0 +1,48 @@
+# UI/tests/test_bucketing.py
+import numpy as np
+
+from conftest import FakeEmbedder, FakeTokenizer
+from core.bucketing import encode_bucketed, padded_tokens, plan_batches, token_lengths
+
+
+def _lengths(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    # phần lớn điều ngắn, ít chunk dài (giống pháp điển)
+    return [int(x) for x in np.where(rng.random(n) < 0.8, rng.integers(8, 40, n), rng.integers(150, 256, n))]
+
+
+def test_plan_respects_budget_and_covers_every_index():
+    lengths = _lengths()
+    batches = plan_batches(lengths, token_budget=2048, max_batch=64)
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+    for b in batches:
+        assert len(b) <= 64
+        assert len(b) == 1 or len(b) * max(lengths[i] for i in b) <= 2048
+    # 1 câu dài hơn budget vẫn có batch riêng, không bị bỏ
+    assert plan_batches([5000, 3], token_budget=100) == [[0], [1]]
+
+
+def test_bucketing_cuts_padding_vs_fixed_batches():
+    lengths = _lengths()
+    fixed = [list(range(i, min(i + 32, len(lengths)))) for i in range(0, len(lengths), 32)]
+    bucketed = plan_batches(lengths, token_budget=32 * 64)
+    real = sum(lengths)
+    assert padded_tokens(lengths, bucketed) < padded_tokens(lengths, fixed)
+    assert 1 - real / padded_tokens(lengths, bucketed) < 0.2
+
+
+def test_encode_bucketed_restores_original_order():
+    texts = [" ".join(["từ"] * n) + f" #{i}" for i, n in enumerate([50, 3, 120, 7, 7, 60])]
+    lengths = token_lengths(texts, FakeTokenizer(), 256)
+    assert lengths == [len(t.split()) + 2 for t in texts]
+
+    model, calls = FakeEmbedder(), []
+
+    def encode(batch):
+        calls.append(len(batch))
+        return model.encode(batch)
+
+    out = encode_bucketed(texts, encode, lengths, token_budget=200)
+    assert len(calls) > 1
+    np.testing.assert_allclose(out, model.encode(texts))
+    assert encode_bucketed([], encode, [], token_budget=200).shape == (0, 0)
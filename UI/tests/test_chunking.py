@@ -0,0 +1,85 @@
+# UI/tests/test_chunking.py
+import pytest
+
+from conftest import FakeTokenizer
+from core.chunking import chunk_spans_structure, chunk_text, count_truncated
+
+
+def _law_text(n: int = 40) -> str:
+    return "\n".join(f"{i}. Người có quyền và nghĩa vụ theo quy định tại khoản {i} của Luật này; trừ trường hợp khác." for i in range(1, n + 1))
+
+
+@pytest.mark.parametrize("overlap_tokens", [0, 8])
+def test_token_chunks_fit_model_window(overlap_tokens):
+    tok, text = FakeTokenizer(), _law_text()
+    chunks = chunk_text(text, tokenizer=tok, max_tokens=32, overlap_tokens=overlap_tokens)
+    assert len(chunks) > 1
+    assert count_truncated(chunks, tok, 32) == 0
+    assert all(len(c.split()) + 2 <= 32 for c in chunks)
+    if overlap_tokens == 0:
+        # không overlap => ghép lại đúng nguyên văn (theo từ), không mất chữ nào
+        assert " ".join(chunks).split() == text.split()
+
+
+def test_char_chunks_get_truncated_but_token_chunks_do_not():
+    tok, text = FakeTokenizer(), _law_text()
+    assert count_truncated(chunk_text(text, chunk_size=1200, overlap=120), tok, 32) > 0
+    assert count_truncated(chunk_text(text, tokenizer=tok, max_tokens=32), tok, 32) == 0
+
+
+def test_sentence_longer_than_window_is_split_by_words():
+    tok = FakeTokenizer()
+    text = " ".join(f"từ{i}" for i in range(100))  # 1 câu không có dấu câu
+    chunks = chunk_text(text, tokenizer=tok, max_tokens=16)
+    assert all(len(c.split()) + 2 <= 16 for c in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+_DIEU = """Chương II
+Điều 5. Quyền của công dân
+1. Công dân có quyền khai sinh.
+2. Công dân có quyền:
+a) được cấp giấy tờ tuỳ thân theo quy định của pháp luật hiện hành;
+b) được bảo vệ thông tin cá nhân khi đăng ký hộ tịch và cư trú;
+c) được khiếu nại, tố cáo theo quy định.
+3. Cơ quan đăng ký có trách nhiệm thực hiện đúng thời hạn."""
+
+
+def _check_spans(spans, budget):
+    # không chồng lấn, mỗi chunk vừa giới hạn, ghép lại đủ nội dung
+    assert all(e - s <= budget for s, e, _ in spans)
+    assert all(a[1] <= b[0] for a, b in zip(spans, spans[1:]))
+    assert " ".join(_DIEU[s:e] for s, e, _ in spans).split() == _DIEU.split()
+
+
+def test_structure_fits_whole_article_in_one_chunk():
+    assert chunk_spans_structure(_DIEU, chunk_size=10_000) == [(0, len(_DIEU), "")]
+
+
+def test_structure_splits_at_khoan_then_groups_diem():
+    spans = chunk_spans_structure(_DIEU, chunk_size=120)
+    _check_spans(spans, 120)
+    assert [p for _, _, p in spans] == [
+        "Chương II",
+        "Chương II > Điều 5 > Khoản 1",
+        "Chương II > Điều 5 > Khoản 2 > Điểm a",
+        "Chương II > Điều 5 > Khoản 2 > Điểm b–c",
+        "Chương II > Điều 5 > Khoản 3",
+    ]
+    assert _DIEU[spans[3][0]:].startswith("b) ")
+
+
+def test_structure_falls_back_to_sentences_inside_diem():
+    spans = chunk_spans_structure(_DIEU, chunk_size=60)
+    _check_spans(spans, 60)
+    paths = [p for _, _, p in spans]
+    # điểm a quá dài => cắt theo vế câu nhưng vẫn giữ đường dẫn Điểm a
+    assert paths.count("Chương II > Điều 5 > Khoản 2 > Điểm a") == 2
+    assert "Chương II > Điều 5 > Khoản 2 > Điểm c" in paths
+
+
+def test_structure_with_token_budget():
+    tok = FakeTokenizer()
+    spans = chunk_spans_structure(_DIEU, tok, max_tokens=24)
+    assert count_truncated([_DIEU[s:e] for s, e, _ in spans], tok, 24) == 0
+    assert all(p.startswith("Chương II") for _, _, p in spans)
@@ -0,0 +1,27 @@
+# UI/tests/test_csv_loader.py
+import pandas as pd
+
+from core.csv_loader import iter_law_doc_batches
+
+
+def test_empty_cells_become_empty_strings(tmp_path):
+    path = tmp_path / "law.csv"
+    pd.DataFrame(
+        {
+            "dieu_id": ["d0", None, "d2"],
+            "dieu_ten": ["Điều 1. Phạm vi", None, "Điều 3."],
+            "dieu_noidung": [None, "Nội dung điều 2.", "Nội dung điều 3."],
+            "vbqppl": ["Luật A", "Luật A", None],
+            "chuong_ten": [None, "Chương I", "Chương I"],
+        }
+    ).to_csv(path, index=False)
+
+    docs = [d for batch in iter_law_doc_batches(str(path), chunksize=2) for d in batch]
+    assert [d["id"] for d in docs] == ["d0", "1", "d2"]
+    assert [d["text"] for d in docs] == ["Điều 1. Phạm vi", "Nội dung điều 2.", "Điều 3.\nNội dung điều 3."]
+    assert docs[1]["meta"]["dieu_ten"] == "" and docs[2]["meta"]["vbqppl"] == ""
+    assert docs[0]["meta"]["chuong_ten"] == ""
+    # metadata Chroma chỉ nhận str/int/float/bool, không có NaN
+    for d in docs:
+        assert all(isinstance(v, (str, int)) for v in d["meta"].values())
+    assert [d["meta"]["row_index"] for d in docs] == [0, 1, 2]
@@ -0,0 +1,41 @@
+# UI/tests/test_dedup.py
+import numpy as np
+
+from conftest import FakeEmbedder
+from core.dedup import ChunkDeduper
+
+
+class _Counting:
+    def __init__(self):
+        self.model = FakeEmbedder()
+        self.calls = []
+
+    def __call__(self, texts, keys):
+        self.calls.append(list(texts))
+        return self.model.encode(texts)
+
+
+def test_duplicates_encoded_once_and_fanned_out():
+    enc, dd = _Counting(), ChunkDeduper()
+    texts = ["Điều này được bãi bỏ.", "Khoản 1.", "Điều  này được bãi bỏ. ", "Khoản 1.", "Khoản 2."]
+    out = dd.encode(texts, enc)
+
+    # chuẩn hoá khoảng trắng => dòng 0 và 2 là cùng 1 text
+    assert enc.calls == [["Điều này được bãi bỏ.", "Khoản 1.", "Khoản 2."]]
+    np.testing.assert_array_equal(out[0], out[2])
+    np.testing.assert_array_equal(out[1], out[3])
+    np.testing.assert_allclose(out[[0, 1, 4]], FakeEmbedder().encode(enc.calls[0]))
+    assert dd.ratio == 1 - 3 / 5
+
+
+def test_memo_across_batches_survives_eviction():
+    enc, dd = _Counting(), ChunkDeduper(max_memo=2)
+    dd.encode(["A", "B"], enc)
+    # A lấy từ memo, C + D mới đẩy A khỏi memo ngay trong batch này
+    out = dd.encode(["A", "C", "D", "A"], enc)
+    assert enc.calls[1] == ["C", "D"]
+    np.testing.assert_allclose(out, FakeEmbedder().encode(["A", "C", "D", "A"]))
+
+    # batch toàn text đã nhớ => không gọi encode
+    out = dd.encode(["D", "C"], enc)
+    assert len(enc.calls) == 2 and out.shape == (2, 16)
@@ -0,0 +1,32 @@
+# UI/tests/test_embed_cache.py
+import numpy as np
+
+from conftest import FakeEmbedder
+from core.embed_cache import EmbeddingCache, text_key
+
+
+def test_batch_larger_than_capacity_keeps_last_entries(tmp_path):
+    cache = EmbeddingCache(tmp_path, "m", max_entries=3, dtype="float32")
+    texts = [f"câu {i}" for i in range(5)]
+    keys = [text_key(t) for t in texts]
+    vecs = FakeEmbedder().encode(texts)
+
+    cache.put_many(keys, vecs)
+    found, got = cache.get_many(keys)
+    assert found == [2, 3, 4]
+    np.testing.assert_allclose(got, vecs[2:], atol=1e-6)
+
+
+def test_lru_evicts_oldest(tmp_path):
+    cache = EmbeddingCache(tmp_path, "m", max_entries=3, dtype="float32")
+    keys = [text_key(f"câu {i}") for i in range(4)]
+    vecs = FakeEmbedder().encode([f"câu {i}" for i in range(4)])
+    cache.put_many(keys[:3], vecs[:3])
+    cache.get_many(keys[:1])  # key 0 vừa dùng => key 1 là cũ nhất
+    cache.put_many(keys[3:], vecs[3:])
+    found, _ = cache.get_many(keys)
+    assert found == [0, 2, 3] and cache.evictions == 1
+
+    # mở lại từ đĩa vẫn đúng
+    reopened = EmbeddingCache(tmp_path, "m", max_entries=3, dtype="float32")
+    assert reopened.get_many(keys)[0] == [0, 2, 3]
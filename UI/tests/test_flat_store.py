@@ -0,0 +1,37 @@
+# UI/tests/test_flat_store.py
+import numpy as np
+
+from conftest import exact_topk, write_flat_export
+from core.flat_store import FlatStore, read_blob, write_blob
+
+
+def test_flat_search_is_exact(tmp_path, corpus):
+    vecs, queries = corpus
+    ids = write_flat_export(tmp_path, "law", vecs)
+    store = FlatStore(tmp_path, "law", quant="none", index="flat")
+
+    res = store._search(queries, 10)
+    want = exact_topk(vecs, queries, 10)
+    assert res.ids == [[ids[j] for j in row] for row in want]
+    # distance cùng thang L2 bình phương của Chroma: 2 - 2cos
+    cos = np.take_along_axis(queries @ vecs.T, want, axis=1)
+    np.testing.assert_allclose(res.distances, 2 - 2 * cos, atol=1e-5)
+    assert res.metas[0][0]["source_id"] == f"d{int(want[0][0]) // 3}"
+    assert store.count() == len(vecs)
+
+
+def test_flat_search_pads_when_corpus_smaller_than_top_k(tmp_path, corpus):
+    vecs, queries = corpus
+    write_flat_export(tmp_path, "law", vecs[:3])
+    res = FlatStore(tmp_path, "law", quant="none", index="flat")._search(queries[:2], 5)
+    assert [len(r) for r in res.ids] == [3, 3]
+    assert np.isinf(res.distances[:, 3:]).all()
+
+
+def test_blob_column_roundtrip(tmp_path):
+    values = ["Điều 1", "", "khoản 2 — điểm a"]
+    write_blob(tmp_path, "docs", values, len(values))
+    col = read_blob(tmp_path, "docs")
+    assert len(col) == 3
+    assert list(col) == values
+    assert col[1:] == values[1:]
@@ -0,0 +1,77 @@
+# UI/tests/test_incremental.py
+import pandas as pd
+import pytest
+
+from conftest import FakeEmbedder, FakeTokenizer
+
+chromadb = pytest.importorskip("chromadb")
+pytest.importorskip("torch")
+
+from core import embedding_runner  # noqa: E402
+
+
+def _write_csv(path, bodies):
+    pd.DataFrame(
+        {
+            "dieu_id": [f"d{i}" for i in range(len(bodies))],
+            "dieu_ten": [f"Điều {i}." for i in range(len(bodies))],
+            "dieu_noidung": bodies,
+            "vbqppl": "Luật X",
+            "vbqppl_link": "",
+            "chuong_ten": "Chương I",
+        }
+    ).to_csv(path, index=False)
+
+
+@pytest.fixture(autouse=True)
+def stub_model(monkeypatch):
+    monkeypatch.setattr(embedding_runner, "get_embedder", lambda *a, **k: FakeEmbedder())
+    monkeypatch.setattr(embedding_runner, "get_tokenizer", lambda *a, **k: (FakeTokenizer(), 256))
+
+
+def _ids(chroma_dir):
+    return set(chromadb.PersistentClient(path=str(chroma_dir)).get_collection("law").get()["ids"])
+
+
+def test_incremental_deletes_only_removed_chunks(tmp_path):
+    bodies = [f"Nội dung điều {i}. " * (20 + 10 * i) for i in range(6)]
+    csv1, csv2 = tmp_path / "v1.csv", tmp_path / "v2.csv"
+    _write_csv(csv1, bodies)
+    # v2: sửa điều 2, bỏ điều cuối
+    _write_csv(csv2, bodies[:2] + ["Điều 2 đã sửa ngắn gọn."] + bodies[3:5])
+    kw = dict(chroma_dir=str(tmp_path / "chroma"), collection="law", model_id="m", device="cpu",
+              chunk_size=200, chunk_overlap=20, incremental=True, use_cache=False)
+
+    first = embedding_runner.run_embedding(str(csv1), **kw)
+    before = _ids(tmp_path / "chroma")
+    assert first["embedded"] == len(before) > len(bodies)
+
+    second = embedding_runner.run_embedding(str(csv2), **kw)
+    after = _ids(tmp_path / "chroma")
+
+    removed = {i for i in before if i.startswith(("d2__r2__", "d5__r5__"))}
+    kept = before - removed
+    assert removed and kept
+    assert second["deleted"] == len(removed)
+    assert before - after == removed
+    assert kept <= after
+    # chỉ điều 2 (mới) được encode, phần còn lại bỏ qua
+    assert second["skipped"] == len(kept)
+    assert after - kept == {i for i in after if i.startswith("d2__r2__")}
+    assert second["embedded"] == len(after - kept)
+
+
+def test_direct_run_writes_to_collection_alias_points_to(tmp_path):
+    bodies = [f"Nội dung điều {i}. " * 30 for i in range(3)]
+    csv1, csv2 = tmp_path / "v1.csv", tmp_path / "v2.csv"
+    _write_csv(csv1, bodies)
+    _write_csv(csv2, bodies + ["Điều mới."])
+    kw = dict(chroma_dir=str(tmp_path / "chroma"), collection="law", model_id="m", device="cpu", use_cache=False)
+
+    embedding_runner.run_embedding(str(csv1), version=1, **kw)
+    # tắt blue/green: ghi vào law__v1 đang phục vụ, không tạo lại collection "law" mồ côi
+    out = embedding_runner.run_embedding(str(csv2), incremental=True, **kw)
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    assert out["collection"] == "law__v1"
+    assert [c.name if hasattr(c, "name") else c for c in client.list_collections()] == ["law__v1"]
+    assert any(i.startswith("d3__r3__") for i in client.get_collection("law__v1").get()["ids"])
@@ -0,0 +1,56 @@
+# UI/tests/test_ivf.py
+import json
+
+import numpy as np
+
+from conftest import clustered_vectors, exact_topk, recall, write_flat_export
+from core.flat_store import FlatStore
+from core.ivf import IVFLists, load_lists, load_or_build, save_lists
+
+
+def test_ivf_recall_rises_with_nprobe_and_matches_exact_when_probing_all(tmp_path, corpus):
+    vecs, queries = corpus
+    ids = write_flat_export(tmp_path, "law", vecs)
+    want = exact_topk(vecs, queries, 10)
+    store = FlatStore(tmp_path, "law", quant="none", index="ivf")
+    n_lists = store.ivf_stats()["n_lists"]
+    assert 1 < n_lists < len(vecs)
+
+    recalls = [recall(store._search(queries, 10, nprobe=p).ids, want, ids) for p in (1, 4, 16, n_lists)]
+    assert recalls == sorted(recalls)
+    assert recalls[-1] == 1.0
+    assert recalls[2] >= 0.9
+
+
+def test_ivf_with_int8_rescore(tmp_path, corpus):
+    vecs, queries = corpus
+    ids = write_flat_export(tmp_path, "law", vecs)
+    want = exact_topk(vecs, queries, 10)
+    store = FlatStore(tmp_path, "law", quant="int8", rescore_factor=4, index="ivf")
+    assert recall(store._search(queries, 10, nprobe=store.ivf_stats()["n_lists"]).ids, want, ids) >= 0.99
+
+
+def test_centroids_reused_across_exports(tmp_path):
+    vecs = clustered_vectors(2000, 16, 20)
+    a, b = tmp_path / "v1", tmp_path / "v2"
+    a.mkdir()
+    b.mkdir()
+    first = load_or_build(a, vecs[:1500], tmp_path, "law", 16)
+    trained = json.loads((tmp_path / "flat" / "law.ivf.json").read_text(encoding="utf-8"))
+    # corpus lớn thêm < 2 lần => chỉ gán list, không train lại
+    second = load_or_build(b, vecs, tmp_path, "law", 16)
+    assert json.loads((tmp_path / "flat" / "law.ivf.json").read_text(encoding="utf-8")) == trained
+    np.testing.assert_array_equal(first.centroids, second.centroids)
+    assert int(second.offsets[-1]) == len(vecs)
+
+
+def test_save_and_load_lists(tmp_path):
+    vecs = clustered_vectors(500, 16, 8)
+    lists = load_or_build(tmp_path, vecs, tmp_path, "law", 8)
+    save_lists(tmp_path, lists)
+    loaded = load_lists(tmp_path)
+    assert isinstance(loaded, IVFLists) and isinstance(loaded.order, np.memmap)
+    np.testing.assert_array_equal(loaded.order, lists.order)
+    np.testing.assert_array_equal(loaded.offsets, lists.offsets)
+    q = vecs[0]
+    np.testing.assert_array_equal(np.sort(loaded.probe(q, 2)), np.sort(lists.probe(q, 2)))
@@ -0,0 +1,66 @@
+# UI/tests/test_pipeline.py
+import itertools
+import threading
+
+import pytest
+
+from core.pipeline import run_pipeline
+
+
+def _run(**kw):
+    """run_pipeline trong thread riêng, có timeout => test fail thay vì treo nếu deadlock."""
+    box = {}
+
+    def target():
+        try:
+            box["total"] = run_pipeline(**kw)
+        except BaseException as e:
+            box["error"] = e
+
+    t = threading.Thread(target=target, name="Thread-encode", daemon=True)
+    t.start()
+    t.join(timeout=10)
+    assert not t.is_alive(), "pipeline bị treo"
+    return box
+
+
+def test_writes_in_order_and_reports_progress():
+    written, progress, enc_threads = [], [], set()
+
+    def encode(b):
+        enc_threads.add(threading.current_thread().name)
+        return [x * 10 for x in b]
+
+    def write(enc):
+        written.extend(enc)
+        return len(enc)
+
+    batches = ([i, i + 1] for i in range(0, 20, 2))
+    box = _run(batches=batches, encode_fn=encode, write_fn=write, on_written=progress.append)
+    assert box["total"] == 20
+    assert written == [x * 10 for x in range(20)]
+    assert progress[-1] == 20 and progress == sorted(progress)
+    assert enc_threads == {"Thread-encode"}
+
+
+@pytest.mark.parametrize("stage", ["produce", "encode", "write"])
+def test_error_in_any_stage_propagates(stage):
+    def batches():
+        for i in itertools.count():  # vô hạn: pipeline phải tự dừng tầng chuẩn bị
+            if stage == "produce" and i == 3:
+                raise ValueError("produce")
+            yield [i]
+
+    def encode(b):
+        if stage == "encode" and b[0] == 3:
+            raise ValueError("encode")
+        return b
+
+    def write(enc):
+        if stage == "write" and enc[0] == 3:
+            raise ValueError("write")
+        return len(enc)
+
+    box = _run(batches=batches(), encode_fn=encode, write_fn=write)
+    assert isinstance(box.get("error"), ValueError) and str(box["error"]) == stage
+    assert not [t for t in threading.enumerate() if t.name in ("ingest-prepare", "ingest-write")]
@@ -0,0 +1,45 @@
+# UI/tests/test_quant.py
+import numpy as np
+import pytest
+
+from conftest import exact_topk, recall, write_flat_export
+from core.flat_store import FlatStore
+from core.quant import approx_scores, load_codes
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_quantized_scan_with_rescore_keeps_recall(tmp_path, corpus, mode):
+    vecs, queries = corpus
+    ids = write_flat_export(tmp_path, "law", vecs)
+    want = exact_topk(vecs, queries, 10)
+
+    store = FlatStore(tmp_path, "law", quant=mode, rescore_factor=4, index="flat")
+    res = store._search(queries, 10)
+    assert recall(res.ids, want, ids) >= 0.99
+    # re-score bằng float32 => distance đúng như exact
+    cos = np.take_along_axis(queries @ vecs.T, want, axis=1)
+    np.testing.assert_allclose(np.sort(res.distances, axis=1), np.sort(2 - 2 * cos, axis=1), atol=1e-4)
+
+
+def test_int8_codes_and_memory(tmp_path, corpus):
+    vecs, queries = corpus
+    codes, scale = load_codes(tmp_path, vecs, "int8")
+    assert codes.dtype == np.int8 and codes.nbytes * 4 == vecs.nbytes
+    # lần sau đọc lại file, không lượng tử hoá lại
+    codes2, scale2 = load_codes(tmp_path, vecs, "int8")
+    np.testing.assert_array_equal(codes, codes2)
+    np.testing.assert_array_equal(scale, scale2)
+    err = np.abs(approx_scores(queries, codes, scale) - queries @ vecs.T).max()
+    assert err < 0.05
+
+
+def test_rescore_improves_on_approx_only(tmp_path, corpus):
+    vecs, queries = corpus
+    ids = write_flat_export(tmp_path, "law", vecs)
+    want = exact_topk(vecs, queries, 10)
+    store = FlatStore(tmp_path, "law", quant="int8", index="flat")
+    no_rescore = store._scan(store._resolve(), queries, 10, exact=False, rescore_factor=1)[0]
+    with_rescore = store._scan(store._resolve(), queries, 10, exact=False, rescore_factor=4)[0]
+    r1 = recall([[ids[j] for j in row] for row in no_rescore], want, ids)
+    r4 = recall([[ids[j] for j in row] for row in with_rescore], want, ids)
+    assert r4 >= r1 and r4 >= 0.99
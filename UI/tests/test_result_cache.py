@@ -0,0 +1,71 @@
+# UI/tests/test_result_cache.py
+import pytest
+
+from core import rag
+from core.rag import ResultCache
+from core.vectorstore import Hit
+
+
+class _Store:
+    def __init__(self):
+        self.generation = "1@0"
+        self.queries = 0
+
+    def current_generation(self):
+        return self.generation
+
+    def query(self, question, top_k=5):
+        self.queries += 1
+        return [Hit(id=f"d{i}", doc=f"Nội dung {i} ({self.generation})", meta={"dieu_ten": f"Điều {i}"}, distance=0.1 * i) for i in range(top_k)]
+
+
+@pytest.fixture
+def store(monkeypatch):
+    s = _Store()
+    monkeypatch.setattr(rag, "get_store", lambda *a, **k: s)
+    monkeypatch.setattr(rag, "_result_cache", ResultCache(max_entries=16, ttl_s=3600))
+    return s
+
+
+def test_repeat_question_served_from_cache(store):
+    first = rag.answer_with_citations("Đăng ký khai sinh ở đâu?", top_k=3)
+    # chuẩn hoá: hoa/thường + khoảng trắng thừa vẫn trúng
+    again = rag.answer_with_citations("  đăng ký   KHAI SINH ở đâu?", top_k=3)
+    assert store.queries == 1 and again == first
+    # top_k khác => key khác
+    rag.answer_with_citations("Đăng ký khai sinh ở đâu?", top_k=5)
+    assert store.queries == 2
+
+    # caller sửa kết quả không làm hỏng bản trong cache
+    again["hits"][0][0]["dieu_ten"] = "sửa"
+    assert rag.answer_with_citations("Đăng ký khai sinh ở đâu?", top_k=3) == first
+
+
+def test_generation_change_invalidates(store):
+    rag.answer_with_citations("Đăng ký khai sinh ở đâu?", top_k=3)
+    store.generation = "2@1"
+    out = rag.answer_with_citations("Đăng ký khai sinh ở đâu?", top_k=3)
+    assert store.queries == 2 and "(2@1)" in out["answer"]
+    assert rag.result_cache_stats()["entries"] == 1
+
+
+def test_lru_ttl_and_stale_put():
+    cache = ResultCache(max_entries=2, ttl_s=3600)
+    out = {"answer": "a", "hits": []}
+    assert cache.get(("q1", 5, "g1")) is None  # generation g1 bắt đầu
+    cache.put(("q1", 5, "g1"), out)
+    cache.put(("q2", 5, "g1"), out)
+    cache.get(("q1", 5, "g1"))
+    cache.put(("q3", 5, "g1"), out)  # q2 cũ nhất => bị đẩy
+    assert cache.get(("q2", 5, "g1")) is None and cache.get(("q1", 5, "g1")) is out
+    assert cache.evictions == 1
+
+    # kết quả tính xong sau khi generation đã đổi => không được ghi vào cache
+    cache.get(("q1", 5, "g2"))
+    cache.put(("q4", 5, "g1"), out)
+    assert cache.stats()["entries"] == 0
+
+    expired = ResultCache(max_entries=2, ttl_s=1e-9)
+    expired.get(("q", 5, "g"))
+    expired.put(("q", 5, "g"), out)
+    assert expired.get(("q", 5, "g")) is None
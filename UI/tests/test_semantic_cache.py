@@ -0,0 +1,45 @@
+# UI/tests/test_semantic_cache.py
+import numpy as np
+
+from core.semantic_cache import SemanticCache
+
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_near_duplicate_hits_until_generation_changes():
+    cache = SemanticCache(max_entries=4, threshold=0.95)
+    q = _unit([1, 0, 0, 0])
+    near = _unit([1, 0.1, 0, 0])  # cos ~0.995
+    far = _unit([1, 1, 0, 0])  # cos ~0.71
+
+    assert cache.lookup("mức phạt vượt đèn đỏ", q, 5, "g1") is None
+    cache.add("mức phạt vượt đèn đỏ", q, 5, ["d1", "d2"], "g1")
+
+    result, cos, matched = cache.lookup("phạt vượt đèn đỏ bao nhiêu", near, 5, "g1")
+    assert result == ["d1", "d2"] and matched == "mức phạt vượt đèn đỏ" and cos > 0.99
+    assert cache.lookup("thủ tục ly hôn", far, 5, "g1") is None
+    # câu cũ chỉ có top 5 => hỏi top 10 không dùng lại được
+    assert cache.lookup("phạt vượt đèn đỏ bao nhiêu", near, 10, "g1") is None
+
+    # collection đổi => bỏ hết, add muộn của generation cũ cũng bị bỏ qua
+    assert cache.lookup("phạt vượt đèn đỏ bao nhiêu", near, 5, "g2") is None
+    cache.add("mức phạt vượt đèn đỏ", q, 5, ["cũ"], "g1")
+    assert cache.lookup("mức phạt vượt đèn đỏ", q, 5, "g2") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_full_cache_evicts_least_recently_used():
+    cache = SemanticCache(max_entries=2, threshold=0.95)
+    vecs = np.eye(3, dtype=np.float32)
+    cache.lookup("q0", vecs[0], 5, "g")
+    cache.add("q0", vecs[0], 5, "r0", "g")
+    cache.add("q1", vecs[1], 5, "r1", "g")
+    cache.lookup("q0", vecs[0], 5, "g")  # q0 vừa dùng => q1 bị đẩy
+    cache.add("q2", vecs[2], 5, "r2", "g")
+    assert cache.evictions == 1
+    assert cache.lookup("q1", vecs[1], 5, "g") is None
+    assert cache.lookup("q0", vecs[0], 5, "g")[0] == "r0"
+    assert cache.lookup("q2", vecs[2], 5, "g")[0] == "r2"
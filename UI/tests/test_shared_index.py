@@ -0,0 +1,56 @@
+# UI/tests/test_shared_index.py
+import dataclasses
+
+import numpy as np
+import pytest
+
+from conftest import exact_topk, write_flat_export
+from core import shared_index
+from core.flat_store import FlatStore
+from core.shared_index import SharedIndexStore, publish
+
+
+@pytest.fixture
+def loader_settings(monkeypatch):
+    # loader publish kèm bản nén + IVF
+    monkeypatch.setattr(
+        shared_index, "settings", dataclasses.replace(shared_index.settings, VECTOR_QUANT="int8", VECTOR_INDEX="ivf")
+    )
+
+
+def _files(d):
+    return {p.name: p.stat().st_mtime_ns for p in d.iterdir()}
+
+
+def test_worker_attaches_prebuilt_segment_read_only(tmp_path, corpus, loader_settings):
+    vecs, queries = corpus
+    write_flat_export(tmp_path / "chroma", "law", vecs)
+    source = FlatStore(tmp_path / "chroma", "law", quant="none", index="flat")
+    meta = publish(source, root=tmp_path / "shm")
+    seg = tmp_path / "shm" / "law" / meta["segment"]
+    assert meta["ivf_lists"] > 0 and {"ivf.order.npy", "ivf.offsets.npy", "vectors.int8.npy"} <= set(_files(seg))
+    before = _files(seg)
+
+    store = SharedIndexStore("law", root=tmp_path / "shm", quant="int8", index="ivf")
+    data = store._resolve()
+    # mọi mảng là mmap của segment, không phải bản sao riêng của worker
+    assert isinstance(data.vecs, np.memmap) and isinstance(data.codes, np.memmap)
+    assert isinstance(data.ivf.order, np.memmap) and data.ivf.n_lists == meta["ivf_lists"]
+    res = store._search(queries, 5, nprobe=meta["ivf_lists"])
+    assert res.ids == [[f"c{j}" for j in row] for row in exact_topk(vecs, queries, 5)]
+    assert _files(seg) == before
+
+
+def test_worker_follows_republish(tmp_path, corpus):
+    vecs, queries = corpus
+    write_flat_export(tmp_path / "chroma", "law", vecs[:100])
+    source = FlatStore(tmp_path / "chroma", "law", quant="none", index="flat")
+    first = publish(source, root=tmp_path / "shm")
+    store = SharedIndexStore("law", root=tmp_path / "shm", quant="none", index="flat")
+    assert store.count() == 100
+
+    write_flat_export(tmp_path / "chroma2", "law", vecs)
+    second = publish(FlatStore(tmp_path / "chroma2", "law", quant="none", index="flat"), root=tmp_path / "shm")
+    assert second["segment"] != first["segment"]
+    assert store.count() == len(vecs)
+    assert store.segment_info()["segment"] == second["segment"]
@@ -0,0 +1,80 @@
+# UI/tests/test_snapshot.py
+import os
+
+import numpy as np
+import pytest
+
+from conftest import clustered_vectors, exact_topk
+
+chromadb = pytest.importorskip("chromadb")
+
+from core.snapshot import SnapshotStore, export_snapshot, verify_snapshot  # noqa: E402
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    vecs = clustered_vectors(400, 16, 10)
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    col = client.get_or_create_collection(name="law")
+    col.upsert(
+        ids=[f"c{i}" for i in range(len(vecs))],
+        embeddings=vecs.tolist(),
+        documents=[f"Điều {i}" for i in range(len(vecs))],
+        # key chỉ có ở 1 số hàng => cột meta có null
+        metadatas=[{"source_id": f"d{i}", **({"hierarchy": "Khoản 1"} if i % 2 else {})} for i in range(len(vecs))],
+    )
+    out = tmp_path / "snap"
+    export_snapshot(out, chroma_dir=str(tmp_path / "chroma"), alias="law", model_id="m", quant="int8", index="ivf")
+    return out, vecs
+
+
+def _files(d):
+    return {p.name: p.stat().st_mtime_ns for p in d.iterdir()}
+
+
+def test_snapshot_store_reads_without_writing(snapshot_dir):
+    out, vecs = snapshot_dir
+    manifest = verify_snapshot(out)
+    assert manifest["count"] == len(vecs) and manifest["quant"] == "int8" and manifest["ivf_lists"] > 0
+    assert {"vectors.int8.npy", "ivf.order.npy"} <= set(manifest["files"])
+
+    before = _files(out)
+    q = vecs[:5]
+    for quant, index in (("int8", "ivf"), ("float16", "flat")):
+        store = SnapshotStore(out, model_id="m", quant=quant, index=index)
+        res = store._search(q, 3, nprobe=10_000)
+        assert res.ids == [[f"c{j}" for j in row] for row in exact_topk(vecs, q, 3)]
+        assert res.metas[0][0] == {"source_id": "d0"}
+        assert res.metas[1][0] == {"source_id": "d1", "hierarchy": "Khoản 1"}
+    # float16 không có sẵn => dựng vào SNAPSHOT_CACHE_DIR, snapshot giữ nguyên
+    assert _files(out) == before
+
+
+@pytest.mark.parametrize("name", ["vectors.npy", "vectors.int8.npy", "ids.bin", "meta.0.bin", "ivf.order.npy"])
+def test_verify_detects_tampered_file(snapshot_dir, name):
+    out, _ = snapshot_dir
+    path = out / name
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="sai checksum"):
+        verify_snapshot(out, full=True)
+    if not name.startswith("vectors."):
+        # kiểm nhanh (bỏ qua vectors*.npy) vẫn bắt được
+        with pytest.raises(ValueError):
+            verify_snapshot(out, full=False)
+
+
+def test_verify_detects_edited_manifest(snapshot_dir):
+    out, _ = snapshot_dir
+    manifest = out / "snapshot.json"
+    manifest.write_text(manifest.read_text(encoding="utf-8").replace('"vectors.npy": "', '"vectors.npy": "0'), encoding="utf-8")
+    with pytest.raises(ValueError, match="checksum manifest"):
+        verify_snapshot(out, full=False)
+
+
+def test_verify_detects_missing_file(snapshot_dir):
+    out, _ = snapshot_dir
+    os.remove(out / "docs.bin")
+    with pytest.raises(OSError):
+        verify_snapshot(out, full=False)